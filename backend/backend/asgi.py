@@ -13,4 +13,10 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
+# Под ASGI запросы ORM выполняются в потоках исполнителя sync_to_async:
+# постоянное соединение осталось бы открытым в потоке, который больше не
+# получит запросов, и соединения PostgreSQL были бы исчерпаны. Поэтому
+# соединение закрывается в конце каждого запроса
+os.environ['SQL_CONN_MAX_AGE'] = '0'
+
 application = get_asgi_application()
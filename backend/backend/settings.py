@@ -107,6 +107,18 @@ else:  # prod, dev
             'PASSWORD': os.environ.get('SQL_PASSWORD'),
             'HOST': os.environ.get('SQL_HOST'),
             'PORT': os.environ.get('SQL_PORT'),
+            # Постоянные соединения: соединение переиспользуется
+            # запросами воркера SQL_CONN_MAX_AGE секунд, перед повторным
+            # использованием проверяется его работоспособность. Под ASGI
+            # backend/asgi.py принудительно задает 0
+            'CONN_MAX_AGE': int(os.getenv('SQL_CONN_MAX_AGE', 60)),
+            'CONN_HEALTH_CHECKS':
+                os.getenv('SQL_CONN_HEALTH_CHECKS', 'True') == 'True',
+            # Через пул транзакций (PgBouncer, pool_mode = transaction)
+            # серверные курсоры не работают: большие выборки читаются
+            # пакетами отдельных запросов (deviceapp.db.chunked_iterator)
+            'DISABLE_SERVER_SIDE_CURSORS':
+                os.getenv('SQL_POOLER') == 'pgbouncer',
         }
     }
 
@@ -155,6 +167,63 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Таблица замыкания иерархии изделий (Device.part_of). При отключении
+# запросы предков/потомков выполняются обходом иерархии
+
+DEVICE_CLOSURE_ENABLED = os.getenv('DEVICE_CLOSURE_ENABLED', 'True') == 'True'
+
+# Инкрементальная синхронизация (/api/devices/changes/). Отметки об
+# удалении изделий хранятся DEVICE_TOMBSTONE_RETENTION_DAYS дней;
+# DEVICE_SYNC_LAG - запас в секундах на транзакции, зафиксированные
+# позже своей отметки времени
+
+DEVICE_TOMBSTONE_RETENTION_DAYS = int(
+    os.getenv('DEVICE_TOMBSTONE_RETENTION_DAYS', 90)
+)
+DEVICE_SYNC_LAG = int(os.getenv('DEVICE_SYNC_LAG', 60))
+
+# Срок в секундах, по истечении которого номер, зарезервированный кнопкой
+# "Выделить номер" и не присвоенный изделию, снова считается свободным
+
+DECIMAL_NUMBER_RESERVATION_TTL = int(
+    os.getenv('DECIMAL_NUMBER_RESERVATION_TTL', 3600)
+)
+
+# Cache
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+# locmem хранит кэш в памяти процесса; при нескольких воркерах сброс
+# кэша не виден соседним процессам, поэтому для них нужен файловый кэш
+# (CACHE_BACKEND=file). В docker-compose CACHE_LOCATION - общий том
+# контейнеров backend и backend-async
+
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem')
+
+if CACHE_BACKEND == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.getenv('CACHE_LOCATION',
+                                  BASE_DIR / 'var' / 'cache'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'lab_db',
+        }
+    }
+
+# Время жизни кэшированных ответов API изделий, секунд
+API_CACHE_TIMEOUT = int(os.getenv('API_CACHE_TIMEOUT', 300))
+
+# Кэш ответов API изделий. С locmem сброс после изменения виден только
+# воркеру, выполнившему запись, поэтому вне режима отладки кэш ответов
+# по умолчанию выключен; ETag и 304 работают и без него
+API_CACHE_ENABLED = os.getenv(
+    'API_CACHE_ENABLED', str(CACHE_BACKEND != 'locmem' or DEBUG)
+) == 'True'
+
 # Rest Framework
 
 if not DEBUG:
@@ -170,6 +239,19 @@ LOG_PATH = BASE_DIR / "var" / "log"
 if not os.path.exists(BASE_DIR / "var" / "log"):
     os.makedirs(LOG_PATH)
 ERROR_LOG_FILE = LOG_PATH / "main.log"
+PERF_LOG_FILE = LOG_PATH / "perf.log"
+
+# Метрики производительности запросов (deviceapp.middleware): число и
+# время SQL-запросов, время рендеринга, размер ответа. Пишутся в
+# PERF_LOG_FILE, отчет по представлениям - manage.py perf_report.
+# Запрос одной формы, повторенный PERF_N_PLUS_ONE_THRESHOLD раз,
+# считается признаком N+1
+
+PERF_MONITORING = os.getenv('PERF_MONITORING', 'False') == 'True'
+PERF_N_PLUS_ONE_THRESHOLD = int(os.getenv('PERF_N_PLUS_ONE_THRESHOLD', 5))
+
+if PERF_MONITORING:
+    MIDDLEWARE.insert(0, 'deviceapp.middleware.PerformanceMiddleware')
 
 LOGGING = {
     'version': 1,
@@ -193,6 +275,15 @@ LOGGING = {
             'backupCount': 2,
 
         },
+        # Запись - строка JSON со временем и pid процесса (perf_report)
+        'perf_log': {
+            'formatter': 'simple',
+            'level': 'INFO',
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': PERF_LOG_FILE,
+            'maxBytes': 50 * 1024 * 1024,
+            'backupCount': 2,
+        },
         'verbose_output': {
             'formatter': 'simple',
             'level': 'DEBUG',
@@ -207,6 +298,12 @@ LOGGING = {
                 'verbose_output',
             ],
         },
+        'deviceapp.perf': {
+            'level': 'INFO',
+            'handlers': [
+                'perf_log',
+            ],
+        },
     },
     'root': {
         'level': 'INFO',
@@ -19,12 +19,23 @@ from django.urls import path, include
 
 from rest_framework.routers import DefaultRouter
 
-from deviceapp.views import DeviceModelViewSet
+from deviceapp import async_views
+from deviceapp.views import DeviceModelViewSet, DecimalNumberAllocateView
 
 router = DefaultRouter()
 router.register('devices', DeviceModelViewSet)
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('api/decimal-numbers/allocate/',
+         DecimalNumberAllocateView.as_view(),
+         name='decimal-number-allocate'),
+    # Асинхронные представления, обслуживаются ASGI-воркером
+    path('api/async/devices/',
+         async_views.device_list,
+         name='async-device-list'),
+    path('api/async/devices/<int:pk>/',
+         async_views.device_detail,
+         name='async-device-detail'),
     path('api/', include(router.urls)),
 ]
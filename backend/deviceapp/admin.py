@@ -1,192 +1,145 @@
+import codecs
 import re
 
-from django import forms
 from django.contrib import admin, messages
 from django.contrib.admin import ModelAdmin
 from django.contrib.admin.decorators import action, display
-from django.core.validators import RegexValidator
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
+from django.core.exceptions import PermissionDenied
 from django.db import transaction, IntegrityError
-from django.db.models import Q
-from django.utils.html import format_html
-from django.utils.safestring import mark_safe
+from django.db.models import Exists, OuterRef, Prefetch
+from django.utils.html import format_html, format_html_join
 
+from django.http import JsonResponse
 from django.urls import path, reverse
 from django.shortcuts import render, redirect
-
+from django.views.decorators.http import require_POST
+
+from deviceapp.forms import (
+    DeviceTypeForm,
+    DeviceForm,
+    DecimalNumForm,
+    OrgCodeForm,
+    DeviceAdminDeviceParseForm,
+    DeviceAdminDeviceParsedDataForm,  # noqa: F401 (импортируется из admin)
+    DeviceAdminForm,
+    DeviceAdminAssignThemeActionForm,
+    DeviceImportForm,
+)
+from deviceapp.allocator import (
+    AllocationError,
+    NoFreeDecimalNumber,
+    reserve_decimal_number,
+)
+from deviceapp.export import CSV, JSONL, XLSX, export_response
+from deviceapp.hierarchy import COMPONENTS, filter_hierarchy
+from deviceapp.importer import import_devices
 from deviceapp.models import Device, OrgCode, DecimalNumber, Theme, DeviceType
+from deviceapp.reference_cache import device_types, org_codes, themes
 
 admin.site.register(OrgCode)
-admin.site.register(Theme)
-admin.site.register(DeviceType)
-
-
-class DeviceTypeForm(forms.ModelForm):
-    class Meta:
-        model = DeviceType
-        fields = ['name']
-
-    def clean(self):
-        cleaned_data = super().clean()
-        name = cleaned_data.get('name')
-
-        if name:
-            try:
-                existing_object = DeviceType.objects.get(name=name)
-                self.instance = existing_object
-            except DeviceType.DoesNotExist:
-                pass
-
-        return cleaned_data
-
-
-class DeviceForm(forms.ModelForm):
-    class Meta:
-        model = Device
-        fields = ['index']
-
-
-class DecimalNumForm(forms.ModelForm):
-    class Meta:
-        model = DecimalNumber
-        fields = ['number']
-
-
-class OrgCodeForm(forms.ModelForm):
-    class Meta:
-        model = OrgCode
-        fields = ['code']
-
-    def clean(self):
-        cleaned_data = super().clean()
-        code = cleaned_data.get('code')
-
-        if code:
-            try:
-                existing_object = OrgCode.objects.get(code=code)
-                self.instance = existing_object
-            except OrgCode.DoesNotExist:
-                pass
-
-        return cleaned_data
-
-
-class DeviceAdminDeviceParseForm(forms.Form):
-    template_name = 'parse_form_snippet.html'
-    parse_regex = re.compile(
-        r'^([а-яА-я-\s]*[а-яА-я])\s*'
-        r'((?:[А-Я]{2}\d{3}|[А-Я]-\d{3})(?:-\d{1,2})?)?\s?'
-        r'([А-Я]{4}).([0-9]{6}.[0-9]{3}(?:-[0-9]{2})?)$'
-    )
-
-    input = forms.CharField(
-        label='Полное наименование изделия',
-        max_length=100,
-        help_text='Формат: Наименование изделия АБВГ.123456.789',
-        validators=[
-            RegexValidator(
-                regex=parse_regex,
-                message='Неверный формат строки',
-                code='invalid_code',
-            ),
-        ],
-    )
 
 
-class DeviceAdminDeviceParsedDataForm(forms.Form):
-    template_name = 'parse_form_snippet.html'
-
-    device_type = forms.CharField(
-        label='Тип изделия',
-        max_length=64,
-    )
-    device_index = forms.CharField(
-        label='Индекс изделия',
-        required=False,
-    )
-    org_code = forms.CharField(
-        label='Код организации-разработчика',
-        max_length=4,
-        help_text='Формат: АБВГ',
-        required=True,
-        validators=[
-            RegexValidator(
-                regex='^[а-яА-Я]{4}$',
-                message='Код должен состоять из четырех кириллических букв',
-                code='invalid_code',
-            )
-        ]
-    )
-    decimal_num = forms.CharField(
-        label='Цифровая часть децимального номера',
-        max_length=13,
-        help_text='Формат: 123456.789 или 123456.789-01',
-        validators=[
-            RegexValidator(
-                regex=r'^[0-9]{6}\.[0-9]{3}(-[0-9]{2})?$',
-                message='Неверный формат номера'
-            ),
-        ]
-    )
+@admin.register(Theme)
+class ThemeAdmin(ModelAdmin):
+    search_fields = ('^name',)
+    ordering = ('name',)
 
 
-class DeviceAdminForm(forms.ModelForm):
+@admin.register(DeviceType)
+class DeviceTypeAdmin(ModelAdmin):
+    search_fields = ('^name',)
+    ordering = ('name',)
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        if self.instance.decimal_num:
-            self.fields['decimal_num'].queryset = DecimalNumber.objects.filter(
-                Q(pk=self.instance.decimal_num.id) |
-                Q(is_used=False)
-            )
-        else:
-            self.fields['decimal_num'].queryset = DecimalNumber.objects.filter(
-                is_used=False
-            )
 
+class TopLevelAssemblyListFilter(admin.SimpleListFilter):
+    title = 'Входит в состав изделия'
+    parameter_name = 'assembly'
 
-class DeviceAdminAssignThemeActionForm(forms.Form):
-    themes = forms.ChoiceField(label='Тема')
+    def lookups(self, request, model_admin):
+        # Изделия верхнего уровня: имеют составные части и сами никуда
+        # не входят
+        through = Device.part_of.through.objects
+        return Device.objects \
+            .filter(Exists(through.filter(to_device_id=OuterRef('pk')))) \
+            .exclude(Exists(through.filter(from_device_id=OuterRef('pk')))) \
+            .order_by('full_designation') \
+            .values_list('pk', 'full_designation')
 
-    def __init__(self, *args, **kwargs):
-        super(DeviceAdminAssignThemeActionForm, self).__init__(*args, **kwargs)
-        self.fields['themes'].choices = [
-            (theme.id, theme.name) for theme in Theme.objects.all()
-        ]
+    def queryset(self, request, queryset):
+        if self.value() is None:
+            return queryset
+        if not self.value().isdigit():
+            return queryset.none()
+        return filter_hierarchy(queryset, int(self.value()), COMPONENTS)
 
 
 @admin.register(Device)
 class DeviceAdmin(ModelAdmin):
     form = DeviceAdminForm
     list_display = ('__str__', 'is_part_of', 'get_themes')
-    list_filter = ('type', 'theme')
-    filter_horizontal = ('part_of', 'theme')
+    list_filter = ('type', 'theme', TopLevelAssemblyListFilter)
+    search_fields = ('^index', '^full_designation')
+    autocomplete_fields = ('type', 'decimal_num', 'part_of', 'theme')
     change_list_template = 'admin/deviceapp/device/change_list.html'
-    actions = ('action_assign_theme',)
+    actions = (
+        'action_assign_theme',
+        'action_export_csv',
+        'action_export_jsonl',
+        'action_export_xlsx',
+    )
     list_per_page = 50
     ordering = ('type', 'decimal_num')
+    action_preview_size = 100
+
+    class Media:
+        js = ('admin/js/decimal_num_allocate.js',)
 
     @display(description='Темы')
     def get_themes(self, obj):
-        themes = []
-        for theme in obj.theme.all():
-            a_tag = mark_safe('<a href="{}">{}</a>'.format(
-                reverse('admin:deviceapp_theme_change', args=(theme.id,)),
-                theme.name
-            ))
-            themes.append(
-                '''
-                <span class="{}"
-                      style="display: block; margin-bottom: 4px;">{}
-                </span>
-                '''.format('thm-elem', a_tag)
+        # reverse() разбирает URLconf на каждом вызове, поэтому адрес
+        # строится один раз с заглушкой вместо id темы
+        url = reverse('admin:deviceapp_theme_change', args=('__id__',))
+        return format_html_join(
+            '',
+            '''
+            <span class="thm-elem"
+                  style="display: block; margin-bottom: 4px;"><a href="{}">{}</a>
+            </span>
+            ''',
+            (
+                (url.replace('__id__', str(theme.id)), theme.name)
+                for theme in obj.theme.all()
             )
-        return mark_safe(''.join(themes))
+        )
 
-    @display(description='Входимость', boolean=True)
+    @display(description='Входимость', boolean=True,
+             ordering='has_parents')
     def is_part_of(self, obj):
-        if obj.part_of.count() > 0:
-            return True
-        return False
+        if hasattr(obj, 'has_parents'):
+            return obj.has_parents
+        return obj.part_of.exists()
+
+    def get_queryset(self, request):
+        queryset = super(DeviceAdmin, self).get_queryset(request)
+        parents = Device.part_of.through.objects.filter(
+            from_device_id=OuterRef('pk'),
+        )
+        return queryset \
+            .select_related('type', 'decimal_num__org_code') \
+            .prefetch_related(
+                Prefetch('theme', queryset=Theme.objects.only('id', 'name'))
+            ) \
+            .annotate(has_parents=Exists(parents))
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        # Чужие зарезервированные номера пользователю не предлагаются
+        if db_field.name == 'decimal_num':
+            kwargs['queryset'] = DecimalNumber.objects \
+                .available_to(request.user)
+        return super(DeviceAdmin, self).formfield_for_foreignkey(
+            db_field, request, **kwargs
+        )
 
     def get_form(self, request, obj=None, change=False, **kwargs):
         if obj is not None:
@@ -207,13 +160,34 @@ class DeviceAdmin(ModelAdmin):
             path('save_parsed_data/',
                  self.admin_site.admin_view(self.save_parsed_data),
                  name='device_save_parsed_data'),
+            path('import/',
+                 self.admin_site.admin_view(self.import_file),
+                 name='device_import'),
+            path('allocate_decimal_num/',
+                 self.admin_site.admin_view(
+                     require_POST(self.allocate_decimal_num)
+                 ),
+                 name='device_allocate_decimal_num'),
         ]
         return my_urls + urls
 
+    def changeform_view(self, request, object_id=None, form_url='',
+                        extra_context=None):
+        extra_context = {
+            **(extra_context or {}),
+            'url_allocate_decimal_num': reverse(
+                'admin:device_allocate_decimal_num'
+            ),
+        }
+        return super(DeviceAdmin, self).changeform_view(
+            request, object_id, form_url, extra_context
+        )
+
     def changelist_view(self, request, extra_context=None):
         extra_context = {
             'url_parse': reverse('admin:device_parse'),
             'url_parsed_save': reverse('admin:device_save_parsed_data'),
+            'url_import': reverse('admin:device_import'),
         }
         return super(DeviceAdmin, self).changelist_view(request, extra_context)
 
@@ -290,11 +264,10 @@ class DeviceAdmin(ModelAdmin):
 
                 try:
                     with transaction.atomic():
-                        device_type_obj, _ = DeviceType \
-                            .objects.get_or_create(name=device_type)
+                        device_type_obj, _ = device_types \
+                            .get_or_create(device_type)
 
-                        org_code_obj, _ = OrgCode \
-                            .objects.get_or_create(code=org_code)
+                        org_code_obj, _ = org_codes.get_or_create(org_code)
 
                         decimal_number_obj, created = DecimalNumber \
                             .objects.get_or_create(org_code=org_code_obj,
@@ -358,77 +331,194 @@ class DeviceAdmin(ModelAdmin):
 
         return redirect('admin:deviceapp_device_changelist')
 
+    def allocate_decimal_num(self, request):
+        if not (self.has_add_permission(request)
+                or self.has_change_permission(request)):
+            raise PermissionDenied
+
+        # Строка вида "АБВГ" или "АБВГ.4612": код организации и префикс
+        org_code, _, prefix = request.POST.get('query', '').strip() \
+            .partition('.')
+        try:
+            decimal_num = reserve_decimal_number(org_code, prefix,
+                                                 user=request.user)
+        except NoFreeDecimalNumber as e:
+            return JsonResponse({'error': str(e)}, status=409)
+        except AllocationError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        return JsonResponse({'id': decimal_num.pk, 'text': str(decimal_num)})
+
+    def import_file(self, request):
+        report = None
+        if request.method == 'POST':
+            form = DeviceImportForm(request.POST, request.FILES)
+            if form.is_valid():
+                lines = codecs.iterdecode(form.cleaned_data['file'],
+                                          'utf-8-sig')
+                try:
+                    report = import_devices(lines)
+                except UnicodeDecodeError:
+                    form.add_error('file', 'Файл должен быть в кодировке '
+                                           'UTF-8')
+        else:
+            form = DeviceImportForm()
+
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Импорт изделий из файла',
+            'form': form,
+            'report': report,
+        }
+        return render(
+            request,
+            'admin/deviceapp/device/device_import.html',
+            context,
+        )
+
     def delete_queryset(self, request, queryset):
-        for each in queryset:
-            each.delete()
+        # DeviceQuerySet.delete освобождает номера одним запросом
+        queryset.delete()
 
-    @action(description='Присвоить тему')
+    @action(description='Присвоить/снять темы')
     def action_assign_theme(self, request, queryset):
-        form = DeviceAdminAssignThemeActionForm()
         device_count = queryset.count()
         if 'apply' in request.POST:
-            with transaction.atomic():
+            form = DeviceAdminAssignThemeActionForm(request.POST)
+            if form.is_valid():
+                theme_ids = form.cleaned_data['themes']
+                theme_names = ', '.join(
+                    f'"{themes.get_by_pk(pk)}"' for pk in theme_ids
+                )
                 try:
-                    theme = Theme.objects.get(pk=request.POST['themes'])
-                    for device in queryset:
-                        device.theme.add(theme)
+                    if form.cleaned_data['operation'] == form.REMOVE:
+                        removed = queryset.remove_themes(theme_ids)
+                        message = 'Темы {} сняты, удалено связей: {}'.format(
+                            theme_names, removed
+                        )
+                    else:
+                        created, existing = queryset.add_themes(theme_ids)
+                        message = 'Темы {} присвоены изделиям в количестве ' \
+                                  '{} шт. Новых связей: {}, уже были ' \
+                                  'присвоены: {}'.format(theme_names,
+                                                         device_count,
+                                                         created,
+                                                         existing)
                 except IntegrityError:
                     self.message_user(
                         request,
-                        'Не удалось присвоить тему "{}"'.format(theme.name),
+                        'Не удалось изменить темы {}'.format(theme_names),
                         messages.ERROR
                     )
                 else:
-                    self.message_user(
-                        request,
-                        'Тема "{}" успешно присвоена изделиям '
-                        'в количестве {} шт'.format(theme.name, device_count),
-                        messages.SUCCESS
-                    )
+                    self.message_user(request, message, messages.SUCCESS)
                 return None
+        else:
+            form = DeviceAdminAssignThemeActionForm()
 
+        # При выборе всех изделий по фильтру список не передается
+        # поштучно, а повторно вычисляется админкой по select_across
+        select_across = request.POST.get('select_across') == '1'
         context = {
             'form': form,
-            'devices': queryset,
+            'devices': queryset[:self.action_preview_size],
             'device_count': device_count,
+            'hidden_count': max(device_count - self.action_preview_size, 0),
+            'select_across': select_across,
+            'selected_ids': [] if select_across else
+            request.POST.getlist(ACTION_CHECKBOX_NAME),
         }
         return render(request,
                       'admin/deviceapp/device/assign_theme.html',
                       context)
 
+    # Выгрузка учитывает фильтры и поиск списка: при выборе всех изделий
+    # по фильтру админка передает в действие отфильтрованную выборку
+
+    @action(description='Выгрузить в CSV')
+    def action_export_csv(self, request, queryset):
+        return export_response(queryset, CSV)
+
+    @action(description='Выгрузить в JSON Lines')
+    def action_export_jsonl(self, request, queryset):
+        return export_response(queryset, JSONL)
+
+    @action(description='Выгрузить в XLSX')
+    def action_export_xlsx(self, request, queryset):
+        return export_response(queryset, XLSX)
+
 
 @admin.register(DecimalNumber)
 class DecimalNumberAdmin(ModelAdmin):
     fieldsets = (
         (None, {
-            'fields': ('org_code', 'number', 'is_used')
+            'fields': ('org_code', 'number', 'is_used', 'reserved_by',
+                       'reserved_at')
         }),
     )
     list_display = ('__str__', 'is_used', 'get_devices')
     list_filter = ('org_code', 'is_used')
-    readonly_fields = ['is_used']
+    list_select_related = ('org_code', 'device', 'device__type')
+    readonly_fields = ['is_used', 'reserved_by', 'reserved_at']
+    search_fields = ('^number',)
+    ordering = ('org_code', 'number')
+
+    def get_queryset(self, request):
+        # Нужен и автодополнению (DecimalNumber.__str__ читает org_code).
+        # ChangeList не применяет list_select_related, если связи уже заданы
+        return super(DecimalNumberAdmin, self) \
+            .get_queryset(request) \
+            .select_related(*self.list_select_related)
+
+    def get_search_results(self, request, queryset, search_term):
+        # Для поля decimal_num изделия предлагаются только свободные номера
+        # и номера, зарезервированные самим пользователем
+        if request.GET.get('model_name') == Device._meta.model_name \
+                and request.GET.get('field_name') == 'decimal_num':
+            queryset = queryset.available_to(request.user)
+
+        # Строка вида "АБВГ.4612": код организации и префикс номера
+        org_code, dot, prefix = search_term.strip().partition('.')
+        if dot and len(org_code) == 4 and org_code.isalpha():
+            return queryset.filter(
+                org_code__code__iexact=org_code,
+                number__startswith=prefix,
+            ), False
+
+        return super(DecimalNumberAdmin, self).get_search_results(
+            request, queryset, search_term
+        )
+
+    @staticmethod
+    def get_device(obj):
+        try:
+            return obj.device
+        except Device.DoesNotExist:
+            return None
 
     def get_devices(self, obj):
-        device = Device.objects.get(decimal_num=obj)
+        device = self.get_device(obj)
+        if device is None:
+            return '-'
         return format_html(
             '<a href={}>{} {}</a>',
             reverse('admin:deviceapp_device_change', args=(device.id,)),
             device.type,
-            device.index
+            device.index or ''
         )
 
     get_devices.short_description = 'Чему присвоен'
 
     def get_form(self, request, obj=None, change=False, **kwargs):
         if obj is not None:
-            if obj.is_used:
-                device = Device.objects.get(decimal_num=obj)
+            device = self.get_device(obj)
+            if device is not None:
                 help_texts = {'is_used': format_html(
                     'Присвоен: <a href={}>{} {}</a>',
                     reverse('admin:deviceapp_device_change',
                             args=(device.id,)),
                     device.type,
-                    device.index
+                    device.index or ''
                 )}
                 kwargs.update({'help_texts': help_texts})
         return super(DecimalNumberAdmin, self).get_form(request, obj, **kwargs)
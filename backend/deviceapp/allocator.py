@@ -0,0 +1,78 @@
+import re
+
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from deviceapp.models import DecimalNumber, OrgCode
+
+
+class AllocationError(Exception):
+    pass
+
+
+class NoFreeDecimalNumber(AllocationError):
+    pass
+
+
+prefix_regex = re.compile(r'^[0-9.\-]*$')
+
+
+def reserve_decimal_number(org_code, prefix='', user=None, attempts=5):
+    """
+    Резервирует за пользователем user следующий по порядку свободный
+    децимальный номер организации org_code (OrgCode или четырехбуквенный
+    код), цифровая часть которого начинается с prefix (классификационная
+    характеристика). Резерв, не привязанный к изделию, освобождается по
+    истечении DECIMAL_NUMBER_RESERVATION_TTL.
+
+    На PostgreSQL кандидат выбирается через SELECT ... FOR UPDATE
+    SKIP LOCKED: номера, которые в этот момент резервируют другие
+    пользователи, пропускаются без ожидания. На СУБД без SKIP LOCKED
+    (SQLite) номер занимается условным UPDATE ... WHERE is_used = false,
+    и при проигранной гонке берется следующий кандидат.
+    """
+    if not prefix_regex.match(prefix):
+        raise AllocationError('Префикс может содержать только цифры, '
+                              'точку и дефис')
+
+    if not isinstance(org_code, OrgCode):
+        try:
+            org_code = OrgCode.objects.get(code__iexact=org_code)
+        except OrgCode.DoesNotExist:
+            raise AllocationError(f'Код организации {org_code} не найден')
+
+    db = router.db_for_write(DecimalNumber)
+    DecimalNumber.objects.using(db).release_stale_reservations()
+
+    free_numbers = DecimalNumber.objects \
+        .using(db) \
+        .filter(org_code=org_code, is_used=False, number__startswith=prefix) \
+        .order_by('number')
+
+    reserved_by = user if user is not None and user.is_authenticated \
+        else None
+    now = timezone.now()
+
+    with transaction.atomic(using=db):
+        if connections[db].features.has_select_for_update_skip_locked:
+            candidates = free_numbers \
+                .select_for_update(skip_locked=True) \
+                .values_list('pk', flat=True)[:1]
+        else:
+            candidates = free_numbers.values_list('pk', flat=True)[:attempts]
+
+        for pk in candidates:
+            claimed = DecimalNumber.objects \
+                .using(db) \
+                .filter(pk=pk, is_used=False) \
+                .update(is_used=True, reserved_by=reserved_by,
+                        reserved_at=now, updated_at=now)
+            if claimed:
+                return DecimalNumber.objects \
+                    .using(db) \
+                    .select_related('org_code') \
+                    .get(pk=pk)
+
+    raise NoFreeDecimalNumber(
+        f'Нет свободных номеров {org_code}.{prefix}'
+    )
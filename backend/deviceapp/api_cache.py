@@ -0,0 +1,98 @@
+import hashlib
+import json
+import random
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.utils.encoders import JSONEncoder
+
+KEY_PREFIX = 'deviceapp:api'
+LIST_GENERATION_KEY = f'{KEY_PREFIX}:list_gen'
+OBJECT_GENERATION_KEY = f'{KEY_PREFIX}:obj_gen'
+
+# Режимы сериализации DeviceModelViewSet (?simple=1)
+SERIALIZER_MODES = ('full', 'simple')
+
+
+def _new_generation():
+    # Счетчик начинается со случайного значения: если ключ поколения
+    # вытеснен из кэша (cull FileBasedCache), записи старых поколений не
+    # станут снова действительными
+    return random.getrandbits(48)
+
+
+def _get_generation(key):
+    generation = cache.get(key)
+    if generation is None:
+        generation = _new_generation()
+        cache.add(key, generation, None)
+        generation = cache.get(key, generation)
+    return generation
+
+
+def _bump_generation(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, _new_generation(), None)
+
+
+def list_key(url):
+    """Ключ ответа-списка: текущее поколение списков и полный URL."""
+    digest = hashlib.md5(url.encode('utf-8')).hexdigest()
+    return f'{KEY_PREFIX}:list:{_get_generation(LIST_GENERATION_KEY)}:{digest}'
+
+
+def object_key(pk, mode):
+    generation = _get_generation(OBJECT_GENERATION_KEY)
+    return f'{KEY_PREFIX}:obj:{generation}:{pk}:{mode}'
+
+
+def make_etag(data):
+    content = json.dumps(data, cls=JSONEncoder, sort_keys=True,
+                         ensure_ascii=False)
+    return '"%s"' % hashlib.md5(content.encode('utf-8')).hexdigest()
+
+
+def get_entry(key):
+    """
+    Возвращает пару (etag, данные ответа) или None. При выключенном
+    API_CACHE_ENABLED всегда None.
+    """
+    if not settings.API_CACHE_ENABLED:
+        return None
+    return cache.get(key)
+
+
+def set_entry(key, data):
+    etag = make_etag(data)
+    if settings.API_CACHE_ENABLED:
+        cache.set(key, (etag, data), settings.API_CACHE_TIMEOUT)
+    return etag
+
+
+def _invalidate(device_ids, everything):
+    if everything:
+        _bump_generation(OBJECT_GENERATION_KEY)
+    elif device_ids:
+        cache.delete_many([
+            object_key(pk, mode)
+            for pk in device_ids for mode in SERIALIZER_MODES
+        ])
+    # Любое изменение может затронуть состав и порядок страниц списка
+    _bump_generation(LIST_GENERATION_KEY)
+
+
+def invalidate_devices(device_ids=(), using=None, everything=False):
+    """
+    Сбрасывает кэш ответов API для изделий device_ids и все кэшированные
+    списки. everything=True сбрасывает ответы по всем изделиям.
+
+    Сброс выполняется сразу и повторно после фиксации транзакции: ответ,
+    собранный параллельным запросом до фиксации, не переживет ее.
+    """
+    device_ids = {pk for pk in device_ids if pk is not None}
+    _invalidate(device_ids, everything)
+    transaction.on_commit(lambda: _invalidate(device_ids, everything),
+                          using=using)
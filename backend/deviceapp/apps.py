@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class DeviceappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'deviceapp'
+
+    def ready(self):
+        from deviceapp import signals  # noqa: F401
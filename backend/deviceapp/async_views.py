@@ -0,0 +1,114 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, HttpResponseNotAllowed
+from rest_framework.exceptions import APIException
+from rest_framework.pagination import Cursor
+from rest_framework.request import Request
+from rest_framework.utils.encoders import JSONEncoder
+
+from .fast_serializers import FULL, SIMPLE, amap_rows, device_values
+from .models import Device
+from .pagination import DeviceCursorPagination
+from .views import DeviceModelViewSet
+
+# Асинхронные представления реестра изделий для ASGI-воркера (uvicorn).
+# Пока запрос ждет ответа БД, процесс обслуживает другие запросы.
+# Представление записи совпадает с /api/devices/
+
+
+def _json_response(data, status=200):
+    # Те же параметры, что у JSONRenderer DRF
+    content = json.dumps(data, cls=JSONEncoder, ensure_ascii=False,
+                         separators=(',', ':'))
+    return HttpResponse(content.encode('utf-8'), status=status,
+                        content_type='application/json')
+
+
+def _get_mode(request):
+    return SIMPLE if request.GET.get('simple') == '1' else FULL
+
+
+def _get_page_size(request):
+    try:
+        page_size = int(request.GET['page_size'])
+    except (KeyError, ValueError):
+        return DeviceCursorPagination.page_size
+    return min(max(page_size, 1), DeviceCursorPagination.max_page_size)
+
+
+def _filter_queryset(request):
+    # Поиск и фильтры те же, что у DeviceModelViewSet. Выполняется в
+    # потоке: без таблицы замыкания фильтр иерархии обращается к БД
+    drf_request = Request(request)
+    queryset = Device.objects.all()
+    for backend in DeviceModelViewSet.filter_backends:
+        queryset = backend().filter_queryset(drf_request, queryset,
+                                             DeviceModelViewSet)
+    return queryset
+
+
+async def device_list(request):
+    """
+    Список изделий с теми же поиском, фильтрами, page_size и курсором
+    (?cursor=, ссылка next), что у /api/devices/: курсор одного списка
+    принимается другим. Записи всегда упорядочены по id, ссылка previous
+    не выдается, а курсор обратного направления отклоняется.
+    """
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+
+    paginator = DeviceCursorPagination()
+    paginator.base_url = request.build_absolute_uri()
+    try:
+        cursor = paginator.decode_cursor(Request(request))
+        queryset = await sync_to_async(_filter_queryset)(request)
+    except APIException as e:
+        return _json_response(
+            e.detail if isinstance(e.detail, dict) else {'detail': e.detail},
+            status=e.status_code,
+        )
+    if cursor is not None:
+        if cursor.reverse:
+            return _json_response(
+                {'detail': 'Курсор обратного направления не поддерживается'},
+                status=400,
+            )
+        if cursor.position is not None:
+            if not cursor.position.isdigit():
+                return _json_response({'detail': 'Неверный курсор'},
+                                      status=404)
+            queryset = queryset.filter(pk__gt=int(cursor.position))
+
+    mode = _get_mode(request)
+    page_size = _get_page_size(request)
+    rows = [
+        row async for row in
+        device_values(queryset.order_by('id'), mode)[:page_size + 1]
+        .aiterator()
+    ]
+
+    next_url = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_url = paginator.encode_cursor(
+            Cursor(offset=0, reverse=False, position=str(rows[-1]['id']))
+        )
+    return _json_response({
+        'next': next_url,
+        'results': await amap_rows(rows, mode, queryset.db),
+    })
+
+
+async def device_detail(request, pk):
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+
+    mode = _get_mode(request)
+    try:
+        row = await device_values(Device.objects.filter(pk=pk), mode).aget()
+    except Device.DoesNotExist:
+        return _json_response({'detail': 'Страница не найдена.'},
+                              status=404)
+    rows = await amap_rows([row], mode)
+    return _json_response(rows[0])
@@ -0,0 +1,56 @@
+from django.db import connections
+
+
+def server_side_cursors_enabled(using):
+    """
+    False, если для БД отключены серверные курсоры: соединение идет через
+    пул транзакций (PgBouncer), где курсор не переживает транзакцию.
+    """
+    return not connections[using].settings_dict \
+        .get('DISABLE_SERVER_SIDE_CURSORS', False)
+
+
+def chunked_iterator(queryset, chunk_size=2000):
+    """
+    Замена queryset.iterator(chunk_size) для больших выборок.
+
+    Без серверных курсоров iterator() загружает в память весь результат
+    запроса. В этом случае выборка читается отдельными запросами по
+    chunk_size записей: пакеты первичных ключей выбираются по ключу
+    (pk > последнего прочитанного), а при сортировке не по pk - из
+    списка ключей в порядке выборки.
+    """
+    if server_side_cursors_enabled(queryset.db) or queryset.query.is_sliced:
+        yield from queryset.iterator(chunk_size=chunk_size)
+        return
+
+    if not queryset.ordered:
+        queryset = queryset.order_by('pk')
+    for pks in _pk_chunks(queryset, chunk_size):
+        yield from queryset.filter(pk__in=pks)
+
+
+def _pk_chunks(queryset, chunk_size):
+    pk_queryset = queryset.values_list('pk', flat=True)
+    if not _ordered_by_pk(queryset):
+        pks = list(pk_queryset)
+        for start in range(0, len(pks), chunk_size):
+            yield pks[start:start + chunk_size]
+        return
+
+    last_pk = None
+    while True:
+        chunk_queryset = pk_queryset if last_pk is None \
+            else pk_queryset.filter(pk__gt=last_pk)
+        pks = list(chunk_queryset[:chunk_size])
+        if not pks:
+            return
+        yield pks
+        last_pk = pks[-1]
+
+
+def _ordered_by_pk(queryset):
+    query = queryset.query
+    ordering = query.order_by or \
+        (query.default_ordering and queryset.model._meta.ordering)
+    return list(ordering) in (['pk'], [queryset.model._meta.pk.attname])
@@ -0,0 +1,244 @@
+import csv
+import json
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
+
+from deviceapp.db import chunked_iterator
+from deviceapp.fast_serializers import FULL, iter_device_chunks
+from deviceapp.models import Device
+
+# Выгрузка реестра изделий. Записи читаются из БД пакетами и сразу
+# отправляются клиенту: память воркера не зависит от размера выгрузки
+
+CSV = 'csv'
+JSONL = 'jsonl'
+XLSX = 'xlsx'
+
+COLUMNS = (
+    'ID',
+    'Тип изделия',
+    'Индекс',
+    'Децимальный номер',
+    'Полное обозначение',
+    'Темы',
+    'Входит в',
+    'Изменено',
+)
+
+_FIELDS = (
+    'id',
+    'type__name',
+    'index',
+    'decimal_num__org_code__code',
+    'decimal_num__number',
+    'full_designation',
+    'updated_at',
+)
+
+
+def iter_table_chunks(queryset, chunk_size=2000):
+    """
+    Пакеты строк таблицы выгрузки (значения в порядке COLUMNS). Темы и
+    изделия, в которые входит изделие, подгружаются двумя запросами на
+    пакет.
+    """
+    rows = []
+    for row in chunked_iterator(queryset.values_list(*_FIELDS), chunk_size):
+        rows.append(row)
+        if len(rows) >= chunk_size:
+            yield _table_rows(rows, queryset.db)
+            rows = []
+    if rows:
+        yield _table_rows(rows, queryset.db)
+
+
+def _table_rows(rows, using):
+    ids = [row[0] for row in rows]
+    themes = {}
+    for device_id, name in Device.theme.through.objects \
+            .using(using) \
+            .filter(device_id__in=ids) \
+            .order_by('theme__name') \
+            .values_list('device_id', 'theme__name'):
+        themes.setdefault(device_id, []).append(name)
+    parents = {}
+    for device_id, designation in Device.part_of.through.objects \
+            .using(using) \
+            .filter(from_device_id__in=ids) \
+            .order_by('to_device__full_designation') \
+            .values_list('from_device_id', 'to_device__full_designation'):
+        parents.setdefault(device_id, []).append(designation)
+
+    return [
+        (
+            device_id,
+            type_name or '',
+            index or '',
+            f'{code.upper()}.{number}' if code else '',
+            full_designation,
+            '; '.join(themes.get(device_id, ())),
+            '; '.join(parents.get(device_id, ())),
+            timezone.localtime(updated_at).strftime('%Y-%m-%d %H:%M:%S'),
+        )
+        for device_id, type_name, index, code, number, full_designation,
+        updated_at in rows
+    ]
+
+
+class _Echo:
+    """Файловый объект, возвращающий записанное значение (для csv)."""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(queryset, chunk_size=2000):
+    # BOM и ";" - чтобы файл без настройки импорта открывался в Excel
+    writer = csv.writer(_Echo(), delimiter=';')
+    yield ('\ufeff' + writer.writerow(COLUMNS)).encode('utf-8')
+    for rows in iter_table_chunks(queryset, chunk_size):
+        yield ''.join(writer.writerow(row) for row in rows).encode('utf-8')
+
+
+def iter_jsonl(queryset, chunk_size=2000):
+    # Строка JSON Lines совпадает с полным представлением изделия в API
+    for rows in iter_device_chunks(queryset, FULL, chunk_size):
+        yield ''.join(
+            json.dumps(row, cls=JSONEncoder, ensure_ascii=False) + '\n'
+            for row in rows
+        ).encode('utf-8')
+
+
+class _ZipSink:
+    """
+    Приемник для zipfile без перемотки: накопленные байты забираются
+    методом pop и сразу отправляются клиенту.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+_XLSX_PARTS = {
+    '[Content_Types].xml':
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/'
+        'content-types">'
+        '<Default Extension="rels" ContentType="application/'
+        'vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/'
+        'vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/'
+        'vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>',
+    '_rels/.rels':
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/'
+        '2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/'
+        'officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>',
+    'xl/workbook.xml':
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/'
+        'spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/'
+        'relationships">'
+        '<sheets><sheet name="Изделия" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>',
+    'xl/_rels/workbook.xml.rels':
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/'
+        '2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/'
+        'officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>',
+}
+
+_SHEET_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/'
+    '2006/main"><sheetData>'
+)
+_SHEET_FOOTER = '</sheetData></worksheet>'
+
+# Управляющие символы недопустимы в XML 1.0
+_xml_illegal_regex = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def _xlsx_row(values):
+    cells = []
+    for value in values:
+        if isinstance(value, int):
+            cells.append(f'<c><v>{value}</v></c>')
+        else:
+            text = escape(_xml_illegal_regex.sub('', value))
+            cells.append(f'<c t="inlineStr"><is><t xml:space="preserve">'
+                         f'{text}</t></is></c>')
+    return f'<row>{"".join(cells)}</row>'
+
+
+def iter_xlsx(queryset, chunk_size=2000):
+    """
+    Книга XLSX из одного листа. Строки записываются в лист как inline
+    строки (без таблицы sharedStrings), архив пишется потоком: каждый
+    пакет строк сжимается и отдается клиенту сразу.
+    """
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) \
+            as archive:
+        for name, content in _XLSX_PARTS.items():
+            archive.writestr(name, content)
+        with archive.open('xl/worksheets/sheet1.xml', 'w',
+                          force_zip64=True) as sheet:
+            sheet.write((_SHEET_HEADER + _xlsx_row(COLUMNS)).encode('utf-8'))
+            yield sink.pop()
+            for rows in iter_table_chunks(queryset, chunk_size):
+                sheet.write(
+                    ''.join(_xlsx_row(row) for row in rows).encode('utf-8')
+                )
+                yield sink.pop()
+            sheet.write(_SHEET_FOOTER.encode('utf-8'))
+    yield sink.pop()
+
+
+EXPORT_FORMATS = {
+    CSV: (iter_csv, 'text/csv; charset=utf-8'),
+    JSONL: (iter_jsonl, 'application/x-ndjson; charset=utf-8'),
+    XLSX: (iter_xlsx, 'application/vnd.openxmlformats-officedocument.'
+                      'spreadsheetml.sheet'),
+}
+
+
+def export_response(queryset, file_format, chunk_size=2000):
+    """Потоковый ответ с выгрузкой изделий queryset в формате file_format."""
+    iter_content, content_type = EXPORT_FORMATS[file_format]
+    # Связи загружаются пакетами в iter_*, prefetch выборки не нужен
+    queryset = queryset.prefetch_related(None)
+    response = StreamingHttpResponse(iter_content(queryset, chunk_size),
+                                     content_type=content_type)
+    filename = f'devices_{timezone.localtime():%Y%m%d_%H%M}.{file_format}'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response['X-Accel-Buffering'] = 'no'
+    return response
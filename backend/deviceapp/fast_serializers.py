@@ -0,0 +1,153 @@
+from asgiref.sync import sync_to_async
+from rest_framework.fields import DateTimeField
+
+from deviceapp.db import chunked_iterator
+from deviceapp.models import Device
+
+# Быстрая сериализация изделий для массового чтения: строки выбираются
+# через values() с явными соединениями и собираются в словари без
+# создания экземпляров моделей и полей DRF. Результат совпадает с
+# DeviceSerializer и SimpleDeviceSerializer вплоть до порядка ключей
+
+FULL = 'full'
+SIMPLE = 'simple'
+
+_FIELDS = {
+    SIMPLE: (
+        'id',
+        'type__name',
+        'index',
+        'decimal_num__org_code__code',
+        'decimal_num__number',
+    ),
+    FULL: (
+        'id',
+        'type_id',
+        'type__name',
+        'decimal_num_id',
+        'decimal_num__org_code_id',
+        'decimal_num__org_code__code',
+        'decimal_num__number',
+        'decimal_num__is_used',
+        'index',
+        'full_designation',
+        'updated_at',
+    ),
+}
+
+_datetime_field = DateTimeField()
+
+
+def device_values(queryset, mode=FULL):
+    """
+    values()-выборка полей для режима mode. Аннотации выборки
+    (например, ранг поиска) сохраняются: по ним может сортировать
+    пагинация.
+    """
+    return queryset.values(*_FIELDS[mode], *queryset.query.annotations)
+
+
+def map_rows(rows, mode=FULL, using=None):
+    """
+    Преобразует строки device_values в представление API. Для режима FULL
+    темы и part_of всех строк подгружаются двумя запросами.
+    """
+    if mode == SIMPLE:
+        return [_simple_row(row) for row in rows]
+
+    themes_queryset, parents_queryset = _relation_querysets(rows, using)
+    themes = {}
+    for device_id, theme_id, name in themes_queryset:
+        themes.setdefault(device_id, []).append({'id': theme_id,
+                                                 'name': name})
+    parents = {}
+    for device_id, parent_id in parents_queryset:
+        parents.setdefault(device_id, []).append(parent_id)
+
+    return [_full_row(row, themes, parents) for row in rows]
+
+
+async def amap_rows(rows, mode=FULL, using=None):
+    """Асинхронный вариант map_rows для ASGI-представлений."""
+    if mode == SIMPLE:
+        return [_simple_row(row) for row in rows]
+
+    # values_list() с несколькими полями в Django 4.1 выполняет запрос
+    # при создании итератора, поэтому aiterator() для него неприменим
+    themes_queryset, parents_queryset = _relation_querysets(rows, using)
+    themes = {}
+    for device_id, theme_id, name in \
+            await sync_to_async(list)(themes_queryset):
+        themes.setdefault(device_id, []).append({'id': theme_id,
+                                                 'name': name})
+    parents = {}
+    for device_id, parent_id in await sync_to_async(list)(parents_queryset):
+        parents.setdefault(device_id, []).append(parent_id)
+
+    return [_full_row(row, themes, parents) for row in rows]
+
+
+def _relation_querysets(rows, using):
+    ids = [row['id'] for row in rows]
+    themes = Device.theme.through.objects \
+        .using(using) \
+        .filter(device_id__in=ids) \
+        .order_by('theme_id') \
+        .values_list('device_id', 'theme_id', 'theme__name')
+    parents = Device.part_of.through.objects \
+        .using(using) \
+        .filter(from_device_id__in=ids) \
+        .order_by('to_device_id') \
+        .values_list('from_device_id', 'to_device_id')
+    return themes, parents
+
+
+def iter_device_chunks(queryset, mode=FULL, chunk_size=2000):
+    """
+    Читает выборку с сервера БД пакетами по chunk_size и отдает каждый
+    пакет уже в представлении API.
+    """
+    rows = []
+    for row in chunked_iterator(device_values(queryset, mode), chunk_size):
+        rows.append(row)
+        if len(rows) >= chunk_size:
+            yield map_rows(rows, mode, queryset.db)
+            rows = []
+    if rows:
+        yield map_rows(rows, mode, queryset.db)
+
+
+def _simple_row(row):
+    code = row['decimal_num__org_code__code']
+    return {
+        'type': row['type__name'],
+        'index': row['index'],
+        'decimal_num': None if code is None
+        else f'{code.upper()}.{row["decimal_num__number"]}',
+    }
+
+
+def _full_row(row, themes, parents):
+    device_id = row['id']
+    decimal_num_id = row['decimal_num_id']
+    return {
+        'id': device_id,
+        'type': {
+            'id': row['type_id'],
+            'name': row['type__name'],
+        },
+        'decimal_num': None if decimal_num_id is None else {
+            'id': decimal_num_id,
+            'org_code': {
+                'id': row['decimal_num__org_code_id'],
+                'code': row['decimal_num__org_code__code'],
+            },
+            'number': row['decimal_num__number'],
+            'is_used': row['decimal_num__is_used'],
+        },
+        'theme': themes.get(device_id, []),
+        'index': row['index'],
+        'full_designation': row['full_designation'],
+        'updated_at': _datetime_field.to_representation(row['updated_at']),
+        'part_of': parents.get(device_id, []),
+    }
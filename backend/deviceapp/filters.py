@@ -0,0 +1,114 @@
+import re
+
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend, SearchFilter
+
+from .hierarchy import COMPONENTS, WHERE_USED, filter_hierarchy
+
+
+class DeviceSearchFilter(SearchFilter):
+    """
+    Поиск изделий по полному обозначению.
+
+    На PostgreSQL подстроки ищутся по GIN-индексу pg_trgm, результаты
+    ранжируются по триграммному сходству. На прочих СУБД (SQLite в
+    dev-local) используется стандартный SearchFilter.
+
+    Строка вида "АБВГ.4612" считается префиксом децимального номера и
+    ищется диапазонным сканированием индекса по номеру.
+    """
+    search_field = 'full_designation'
+    rank_annotation = 'search_rank'
+    decimal_prefix_regex = re.compile(
+        r'^([а-яА-ЯёЁ]{4})\.(\d{1,6}(?:\.\d{0,3}(?:-\d{0,2})?)?)$'
+    )
+
+    def filter_queryset(self, request, queryset, view):
+        search_terms = self.get_search_terms(request)
+        if not search_terms:
+            return queryset
+
+        decimal_prefix = self.get_decimal_prefix(search_terms)
+        if decimal_prefix is not None:
+            org_code, number = decimal_prefix
+            return queryset.filter(
+                decimal_num__org_code__code__iexact=org_code,
+                decimal_num__number__startswith=number,
+            )
+
+        if self.use_ranking(queryset):
+            conditions = Q()
+            for term in search_terms:
+                conditions &= Q(**{f'{self.search_field}__icontains': term})
+            return queryset.filter(conditions).annotate(**{
+                self.rank_annotation: TrigramSimilarity(
+                    self.search_field, ' '.join(search_terms)
+                ),
+            })
+
+        return super(DeviceSearchFilter, self).filter_queryset(
+            request, queryset, view
+        )
+
+    def get_ordering(self, request, queryset, view):
+        # Используется CursorPagination: при ранжированном поиске записи
+        # упорядочиваются по релевантности
+        search_terms = self.get_search_terms(request)
+        if search_terms and self.use_ranking(queryset) \
+                and self.get_decimal_prefix(search_terms) is None:
+            return ('-' + self.rank_annotation, 'id')
+        return view.pagination_class.ordering
+
+    def get_decimal_prefix(self, search_terms):
+        if len(search_terms) != 1:
+            return None
+        match = self.decimal_prefix_regex.match(search_terms[0])
+        return match.groups() if match else None
+
+    @staticmethod
+    def use_ranking(queryset):
+        return connections[queryset.db].vendor == 'postgresql'
+
+
+class DeviceCatalogueFilter(BaseFilterBackend):
+    """
+    ?type=<id> - изделия типа id; ?theme=<id> - изделия с темой id.
+    Соответствуют фильтрам списка изделий в админке.
+    """
+    params = ('type', 'theme')
+
+    def filter_queryset(self, request, queryset, view):
+        for param in self.params:
+            value = request.query_params.get(param)
+            if value is None:
+                continue
+            if not value.isdigit():
+                raise ValidationError({param: 'Ожидается id'})
+            queryset = queryset.filter(**{param: int(value)})
+        return queryset
+
+
+class DeviceHierarchyFilter(BaseFilterBackend):
+    """
+    ?ancestor=<id> - все изделия, входящие в состав изделия id;
+    ?descendant=<id> - все изделия, в состав которых входит изделие id.
+    """
+    params = (
+        ('ancestor', COMPONENTS),
+        ('descendant', WHERE_USED),
+    )
+
+    def filter_queryset(self, request, queryset, view):
+        for param, direction in self.params:
+            value = request.query_params.get(param)
+            if value is None:
+                continue
+            try:
+                device_id = int(value)
+            except ValueError:
+                raise ValidationError({param: 'Ожидается id изделия'})
+            queryset = filter_hierarchy(queryset, device_id, direction)
+        return queryset
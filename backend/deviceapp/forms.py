@@ -0,0 +1,160 @@
+import re
+
+from django import forms
+from django.core.validators import RegexValidator
+
+from deviceapp.models import Device, OrgCode, DecimalNumber, DeviceType
+from deviceapp.reference_cache import device_types, org_codes, themes
+
+
+class DeviceTypeForm(forms.ModelForm):
+    class Meta:
+        model = DeviceType
+        fields = ['name']
+
+    def clean(self):
+        cleaned_data = super().clean()
+        name = cleaned_data.get('name')
+
+        if name:
+            existing_object = device_types.get(name)
+            if existing_object is not None:
+                self.instance = existing_object
+
+        return cleaned_data
+
+
+class DeviceForm(forms.ModelForm):
+    class Meta:
+        model = Device
+        fields = ['index']
+
+
+class DecimalNumForm(forms.ModelForm):
+    class Meta:
+        model = DecimalNumber
+        fields = ['number']
+
+
+class OrgCodeForm(forms.ModelForm):
+    class Meta:
+        model = OrgCode
+        fields = ['code']
+
+    def clean(self):
+        cleaned_data = super().clean()
+        code = cleaned_data.get('code')
+
+        if code:
+            existing_object = org_codes.get(code)
+            if existing_object is not None:
+                self.instance = existing_object
+
+        return cleaned_data
+
+
+class DeviceAdminDeviceParseForm(forms.Form):
+    template_name = 'parse_form_snippet.html'
+    parse_regex = re.compile(
+        r'^([а-яА-я-\s]*[а-яА-я])\s*'
+        r'((?:[А-Я]{2}\d{3}|[А-Я]-\d{3})(?:-\d{1,2})?)?\s?'
+        r'([А-Я]{4}).([0-9]{6}.[0-9]{3}(?:-[0-9]{2})?)$'
+    )
+
+    input = forms.CharField(
+        label='Полное наименование изделия',
+        max_length=100,
+        help_text='Формат: Наименование изделия АБВГ.123456.789',
+        validators=[
+            RegexValidator(
+                regex=parse_regex,
+                message='Неверный формат строки',
+                code='invalid_code',
+            ),
+        ],
+    )
+
+
+class DeviceAdminDeviceParsedDataForm(forms.Form):
+    template_name = 'parse_form_snippet.html'
+
+    device_type = forms.CharField(
+        label='Тип изделия',
+        max_length=64,
+    )
+    device_index = forms.CharField(
+        label='Индекс изделия',
+        required=False,
+    )
+    org_code = forms.CharField(
+        label='Код организации-разработчика',
+        max_length=4,
+        help_text='Формат: АБВГ',
+        required=True,
+        validators=[
+            RegexValidator(
+                regex='^[а-яА-Я]{4}$',
+                message='Код должен состоять из четырех кириллических букв',
+                code='invalid_code',
+            )
+        ]
+    )
+    decimal_num = forms.CharField(
+        label='Цифровая часть децимального номера',
+        max_length=13,
+        help_text='Формат: 123456.789 или 123456.789-01',
+        validators=[
+            RegexValidator(
+                regex=r'^[0-9]{6}\.[0-9]{3}(-[0-9]{2})?$',
+                message='Неверный формат номера'
+            ),
+        ]
+    )
+
+
+class DeviceAdminForm(forms.ModelForm):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Кроме номеров, доступных пользователю (DeviceAdmin
+        # .formfield_for_foreignkey), можно оставить текущий номер изделия
+        if self.instance.decimal_num_id:
+            field = self.fields['decimal_num']
+            field.queryset = field.queryset | DecimalNumber.objects.filter(
+                pk=self.instance.decimal_num_id
+            )
+
+
+class DeviceAdminAssignThemeActionForm(forms.Form):
+    ASSIGN = 'assign'
+    REMOVE = 'remove'
+
+    themes = forms.TypedMultipleChoiceField(
+        label='Темы',
+        coerce=int,
+        widget=forms.CheckboxSelectMultiple,
+    )
+    operation = forms.ChoiceField(
+        label='Действие',
+        choices=[
+            (ASSIGN, 'Присвоить'),
+            (REMOVE, 'Снять'),
+        ],
+        initial=ASSIGN,
+        widget=forms.RadioSelect,
+    )
+
+    def __init__(self, *args, **kwargs):
+        super(DeviceAdminAssignThemeActionForm, self).__init__(*args, **kwargs)
+        self.fields['themes'].choices = [
+            (theme.id, theme.name) for theme in themes.all()
+        ]
+
+
+class DeviceImportForm(forms.Form):
+    file = forms.FileField(
+        label='Файл',
+        help_text='Текстовый или CSV-файл в кодировке UTF-8, по одному '
+                  'изделию в строке. Формат строки: '
+                  'Наименование изделия АБВГ.123456.789',
+    )
@@ -0,0 +1,168 @@
+from django.conf import settings
+from django.db import connections, router
+
+from deviceapp.models import Device
+
+# Направления обхода Device.part_of: строка промежуточной таблицы
+# (from_device, to_device) означает "from_device входит в to_device"
+COMPONENTS = 'components'
+WHERE_USED = 'used_in'
+
+MAX_DEPTH = 50
+
+
+def _fields(direction):
+    through_meta = Device.part_of.through._meta
+    from_field = through_meta.get_field('from_device')
+    to_field = through_meta.get_field('to_device')
+    if direction == COMPONENTS:
+        return to_field, from_field
+    return from_field, to_field
+
+
+def get_edges(device_id, direction, max_depth):
+    """
+    Возвращает ребра иерархии, достижимые от device_id не глубже
+    max_depth уровней: {узел: [смежные узлы]}.
+
+    На PostgreSQL иерархия разворачивается одним рекурсивным CTE, на
+    прочих СУБД - итеративно, одним запросом на уровень.
+    """
+    db = router.db_for_read(Device)
+    if connections[db].vendor == 'postgresql':
+        edges = _get_edges_cte(db, device_id, direction, max_depth)
+    else:
+        edges = _get_edges_batched(db, device_id, direction, max_depth)
+
+    adjacency = {}
+    for source, target in sorted(edges):
+        adjacency.setdefault(source, []).append(target)
+    return adjacency
+
+
+def _get_edges_cte(db, device_id, direction, max_depth):
+    source_field, target_field = _fields(direction)
+    source_column, target_column = source_field.column, target_field.column
+    table = Device.part_of.through._meta.db_table
+    connection = connections[db]
+    qn = connection.ops.quote_name
+    # UNION отбрасывает повторные строки: каждое ребро попадает в
+    # рекурсию не более одного раза на каждой глубине, поэтому общие
+    # составные части и циклы не размножают строки по числу путей
+    sql = f'''
+        WITH RECURSIVE hierarchy (source, target, depth) AS (
+            SELECT e.{qn(source_column)}, e.{qn(target_column)}, 1
+            FROM {qn(table)} e
+            WHERE e.{qn(source_column)} = %s
+          UNION
+            SELECT e.{qn(source_column)}, e.{qn(target_column)}, h.depth + 1
+            FROM {qn(table)} e
+            JOIN hierarchy h ON e.{qn(source_column)} = h.target
+            WHERE h.depth < %s
+        )
+        SELECT DISTINCT source, target FROM hierarchy
+    '''
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [device_id, max_depth])
+        return cursor.fetchall()
+
+
+def _get_edges_batched(db, device_id, direction, max_depth):
+    source_field, target_field = (field.attname
+                                  for field in _fields(direction))
+    through = Device.part_of.through.objects.using(db)
+
+    edges = set()
+    visited = {device_id}
+    frontier = {device_id}
+    for _ in range(max_depth):
+        if not frontier:
+            break
+        level = through \
+            .filter(**{f'{source_field}__in': frontier}) \
+            .values_list(source_field, target_field)
+        frontier = set()
+        for source, target in level:
+            edges.add((source, target))
+            if target not in visited:
+                visited.add(target)
+                frontier.add(target)
+    return edges
+
+
+def build_tree(device, direction, max_depth=MAX_DEPTH):
+    """
+    Строит вложенное дерево состава (COMPONENTS) или применяемости
+    (WHERE_USED) изделия. Узел, замыкающий цикл, отмечается cycle=True,
+    узел с неразвернутыми из-за ограничения глубины связями -
+    truncated=True. Общая составная часть разворачивается один раз, на
+    ближайшем к корню уровне; остальные вхождения отмечаются
+    repeated=True и ссылаются на нее по id.
+    """
+    # Ребра берутся на уровень глубже, чтобы отметить усеченные узлы
+    adjacency = get_edges(device.pk, direction, max_depth + 1)
+    ids = {device.pk, *adjacency}
+    for targets in adjacency.values():
+        ids.update(targets)
+    designations = dict(
+        Device.objects.filter(pk__in=ids).values_list('pk',
+                                                      'full_designation')
+    )
+
+    # Наименьшая глубина каждого узла (обход в ширину)
+    depths = {device.pk: 0}
+    frontier = [device.pk]
+    while frontier:
+        next_frontier = []
+        for node_id in frontier:
+            for target in adjacency.get(node_id, []):
+                if target not in depths:
+                    depths[target] = depths[node_id] + 1
+                    next_frontier.append(target)
+        frontier = next_frontier
+    expanded = set()
+
+    def reference(node_id, flag):
+        return {'id': node_id, 'designation': designations.get(node_id),
+                flag: True}
+
+    def build(node_id, depth, path):
+        node = {'id': node_id, 'designation': designations.get(node_id)}
+        targets = adjacency.get(node_id, [])
+        if depth >= max_depth:
+            if targets:
+                node['truncated'] = True
+            return node
+
+        expanded.add(node_id)
+        children = []
+        for target in targets:
+            if target in path:
+                children.append(reference(target, 'cycle'))
+            elif target in expanded or depths[target] <= depth:
+                children.append(reference(target, 'repeated'))
+            else:
+                children.append(build(target, depth + 1, path | {target}))
+        node[direction] = children
+        return node
+
+    return build(device.pk, 0, {device.pk})
+
+
+def filter_hierarchy(queryset, device_id, direction):
+    """
+    Оставляет в queryset все изделия из состава (COMPONENTS) или из
+    применяемости (WHERE_USED) изделия device_id на любой глубине.
+    При включенной таблице замыкания - одним соединением с ней.
+    """
+    if settings.DEVICE_CLOSURE_ENABLED:
+        if direction == COMPONENTS:
+            return queryset.filter(ancestor_links__ancestor_id=device_id)
+        return queryset.filter(descendant_links__descendant_id=device_id)
+
+    adjacency = get_edges(device_id, direction, MAX_DEPTH)
+    related_ids = {
+        target for targets in adjacency.values() for target in targets
+    }
+    related_ids.discard(device_id)
+    return queryset.filter(pk__in=related_ids)
@@ -0,0 +1,223 @@
+import csv
+import re
+from dataclasses import dataclass, field
+
+from django.db import IntegrityError, transaction
+
+from deviceapp.api_cache import invalidate_devices
+from deviceapp.forms import DeviceAdminDeviceParseForm
+from deviceapp.models import (
+    Device,
+    DeviceType,
+    OrgCode,
+    DecimalNumber,
+    compose_full_designation,
+)
+from deviceapp.reference_cache import REFERENCE_CACHES
+
+
+@dataclass
+class ImportLineError:
+    line_no: int
+    line: str
+    message: str
+
+
+@dataclass
+class ImportReport:
+    total: int = 0
+    created: int = 0
+    errors: list = field(default_factory=list)
+
+    def add_error(self, line_no, line, message):
+        self.errors.append(ImportLineError(line_no, line, message))
+
+
+@dataclass
+class _ParsedLine:
+    line_no: int
+    line: str
+    device_type: str
+    index: str
+    org_code: str
+    number: str
+
+
+class DeviceImporter:
+    """
+    Массовый импорт изделий из строк вида
+    "Наименование АА000 АБВГ.123456.789".
+
+    Строки читаются потоком и обрабатываются пакетами по batch_size:
+    справочники (типы, коды организаций, номера) дедуплицируются в памяти,
+    запись выполняется через bulk_create в одной транзакции. Ошибки
+    собираются в отчет построчно и не прерывают импорт.
+    """
+    parse_regex = DeviceAdminDeviceParseForm.parse_regex
+
+    def __init__(self, batch_size=500, delimiter=';'):
+        self.batch_size = batch_size
+        self.delimiter = delimiter
+        self.report = ImportReport()
+        self._device_types = REFERENCE_CACHES[DeviceType].pk_map()
+        self._org_codes = REFERENCE_CACHES[OrgCode].pk_map()
+        self._numbers = set()
+        self._indexes = set()
+
+    def run(self, lines):
+        with transaction.atomic():
+            batch = []
+            for parsed in self._parse(lines):
+                batch.append(parsed)
+                if len(batch) >= self.batch_size:
+                    self._save_batch(batch)
+                    batch = []
+            if batch:
+                self._save_batch(batch)
+        self.report.errors.sort(key=lambda error: error.line_no)
+        return self.report
+
+    def _parse(self, lines):
+        for line_no, row in enumerate(
+                csv.reader(lines, delimiter=self.delimiter), start=1):
+            line = next((cell.strip() for cell in row if cell.strip()), '')
+            if not line:
+                continue
+            self.report.total += 1
+
+            prepared_string = re.sub(pattern=' {2,}', repl=' ', string=line)
+            match = self.parse_regex.match(prepared_string)
+            if match is None:
+                self.report.add_error(line_no, line, 'Неверный формат строки')
+                continue
+
+            device_type, index, org_code, number = \
+                (group.strip() if group else '' for group in match.groups())
+            yield _ParsedLine(line_no, line, device_type, index,
+                              org_code, number)
+
+    def _save_batch(self, batch):
+        batch = self._validate(batch)
+        if not batch:
+            return
+        if self._try_bulk_save(batch):
+            return
+        # Конфликт с параллельной записью: сохраняем построчно, чтобы
+        # выявить конкретные строки с ошибкой
+        for parsed in batch:
+            if not self._try_bulk_save([parsed]):
+                self.report.add_error(parsed.line_no, parsed.line,
+                                      'Ошибка при сохранении')
+
+    def _try_bulk_save(self, batch):
+        device_types = self._device_types.copy()
+        org_codes = self._org_codes.copy()
+        try:
+            with transaction.atomic():
+                self._bulk_save(batch)
+        except IntegrityError:
+            # Идентификаторы из отмененной точки сохранения недействительны
+            self._device_types = device_types
+            self._org_codes = org_codes
+            return False
+        return True
+
+    def _validate(self, batch):
+        existing_indexes = set(
+            Device.objects
+            .filter(index__in={p.index for p in batch if p.index})
+            .values_list('index', flat=True)
+        )
+        existing_numbers = {
+            number: (org_code, is_used)
+            for number, org_code, is_used in DecimalNumber.objects
+            .filter(number__in={p.number for p in batch})
+            .values_list('number', 'org_code__code', 'is_used')
+        }
+
+        valid = []
+        for parsed in batch:
+            if parsed.index and (parsed.index in existing_indexes
+                                 or parsed.index in self._indexes):
+                message = f'Изделие с индексом {parsed.index} уже существует'
+            elif parsed.number in self._numbers:
+                message = f'Номер {parsed.number} повторяется в файле'
+            elif parsed.number in existing_numbers and \
+                    existing_numbers[parsed.number][0].upper() \
+                    != parsed.org_code.upper():
+                message = f'Номер {parsed.number} принадлежит другой ' \
+                          f'организации'
+            elif existing_numbers.get(parsed.number, (None, False))[1]:
+                message = f'Номер {parsed.number} уже присвоен'
+            else:
+                if parsed.index:
+                    self._indexes.add(parsed.index)
+                self._numbers.add(parsed.number)
+                valid.append(parsed)
+                continue
+            self.report.add_error(parsed.line_no, parsed.line, message)
+        return valid
+
+    def _bulk_save(self, batch):
+        device_types = self._get_or_create(
+            DeviceType, 'name', self._device_types,
+            {p.device_type for p in batch},
+        )
+        org_codes = self._get_or_create(
+            OrgCode, 'code', self._org_codes,
+            {p.org_code for p in batch},
+        )
+
+        existing_numbers = dict(
+            DecimalNumber.objects
+            .filter(number__in=[p.number for p in batch])
+            .values_list('number', 'pk')
+        )
+        DecimalNumber.objects.bulk_create([
+            DecimalNumber(org_code_id=org_codes[p.org_code],
+                          number=p.number,
+                          is_used=True)
+            for p in batch if p.number not in existing_numbers
+        ])
+        DecimalNumber.objects.switch_use(used_ids=existing_numbers.values())
+        numbers = dict(
+            DecimalNumber.objects
+            .filter(number__in=[p.number for p in batch])
+            .values_list('number', 'pk')
+        )
+
+        Device.objects.bulk_create([
+            Device(
+                type_id=device_types[p.device_type],
+                index=p.index or None,
+                decimal_num_id=numbers[p.number],
+                full_designation=compose_full_designation(
+                    p.device_type, p.index, p.org_code, p.number,
+                ),
+            )
+            for p in batch
+        ])
+        # bulk_create не отправляет post_save: сбрасываем кэш списков
+        invalidate_devices()
+        self.report.created += len(batch)
+
+    @staticmethod
+    def _get_or_create(model, field_name, cache, values):
+        missing = values - cache.keys()
+        if missing:
+            model.objects.bulk_create(
+                [model(**{field_name: value}) for value in missing],
+                ignore_conflicts=True,
+            )
+            # bulk_create не отправляет post_save
+            REFERENCE_CACHES[model].invalidate()
+            cache.update(
+                model.objects
+                .filter(**{f'{field_name}__in': missing})
+                .values_list(field_name, 'pk')
+            )
+        return cache
+
+
+def import_devices(lines, batch_size=500, delimiter=';'):
+    return DeviceImporter(batch_size, delimiter).run(lines)
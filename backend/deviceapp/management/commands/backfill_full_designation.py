@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from deviceapp.models import Device
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает полное обозначение (full_designation) изделий'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Количество изделий, обновляемых одним запросом',
+        )
+
+    def handle(self, *args, **options):
+        updated = Device.objects.all().refresh_full_designation(
+            batch_size=options['batch_size'],
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f'Обновлено изделий: {updated}')
+        )
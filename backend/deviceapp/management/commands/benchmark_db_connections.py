@@ -0,0 +1,132 @@
+import time
+from io import BytesIO
+from urllib.parse import urlsplit
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.signals import connection_created
+
+
+class Command(BaseCommand):
+    help = 'Время обработки запроса к API с постоянными соединениями с БД ' \
+           '(CONN_MAX_AGE) и без них. Запросы проходят через WSGI-обработчик ' \
+           'Django так же, как в воркере gunicorn. К каждому запросу ' \
+           'добавляется параметр _bench=<n>, чтобы ответ не брался из кэша'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            default='/api/devices/?simple=1',
+            help='Путь запроса',
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=500,
+            help='Количество запросов в каждом замере',
+        )
+        parser.add_argument(
+            '--conn-max-age',
+            type=int,
+            default=60,
+            help='CONN_MAX_AGE для замера с постоянными соединениями',
+        )
+        parser.add_argument(
+            '--host',
+            default='localhost',
+            help='Заголовок Host (должен входить в ALLOWED_HOSTS)',
+        )
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError('--requests должно быть больше нуля')
+        handler = WSGIHandler()
+        connection = connections[DEFAULT_DB_ALIAS]
+        settings_dict = connection.settings_dict
+        saved = settings_dict['CONN_MAX_AGE'], \
+            settings_dict['CONN_HEALTH_CHECKS']
+        try:
+            for title, conn_max_age, health_checks in (
+                    ('без постоянных соединений', 0, False),
+                    ('CONN_MAX_AGE', options['conn_max_age'], False),
+                    ('CONN_MAX_AGE + CONN_HEALTH_CHECKS',
+                     options['conn_max_age'], True),
+            ):
+                # Параметры применяются при открытии соединения
+                connection.close()
+                settings_dict['CONN_MAX_AGE'] = conn_max_age
+                settings_dict['CONN_HEALTH_CHECKS'] = health_checks
+                timings, connects, errors = self.measure(handler, options)
+                self.report(title, timings, connects, errors)
+        finally:
+            connection.close()
+            settings_dict['CONN_MAX_AGE'], \
+                settings_dict['CONN_HEALTH_CHECKS'] = saved
+
+    def measure(self, handler, options):
+        connects = 0
+
+        def count_connection(**kwargs):
+            nonlocal connects
+            connects += 1
+
+        statuses = []
+
+        def start_response(status, headers, exc_info=None):
+            statuses.append(int(status.split()[0]))
+
+        timings = []
+        connection_created.connect(count_connection)
+        try:
+            for number in range(options['requests']):
+                environ = self.environ(options['path'], options['host'],
+                                       number)
+                started = time.perf_counter()
+                response = handler(environ, start_response)
+                for _ in response:
+                    pass
+                # Как WSGI-сервер: request_finished закрывает устаревшие
+                # соединения
+                response.close()
+                timings.append(time.perf_counter() - started)
+        finally:
+            connection_created.disconnect(count_connection)
+        errors = sum(status != 200 for status in statuses)
+        return timings, connects, errors
+
+    @staticmethod
+    def environ(path, host, number):
+        parts = urlsplit(path)
+        query = f'{parts.query}&_bench={number}' if parts.query \
+            else f'_bench={number}'
+        return {
+            'REQUEST_METHOD': 'GET',
+            'PATH_INFO': parts.path,
+            'QUERY_STRING': query,
+            'SCRIPT_NAME': '',
+            'SERVER_NAME': host,
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'HTTP_HOST': host,
+            'HTTP_ACCEPT': 'application/json',
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': BytesIO(),
+            'wsgi.errors': BytesIO(),
+        }
+
+    def report(self, title, timings, connects, errors):
+        timings.sort()
+        count = len(timings)
+        mean = sum(timings) / count * 1000
+        p50 = timings[count // 2] * 1000
+        p95 = timings[min(count - 1, count * 95 // 100)] * 1000
+        self.stdout.write(
+            f'{title}: {count} запросов, среднее {mean:.2f} мс, '
+            f'p50 {p50:.2f} мс, p95 {p95:.2f} мс, '
+            f'новых соединений: {connects}'
+        )
+        if errors:
+            self.stdout.write(self.style.ERROR(
+                f'  ответов с ошибкой: {errors}'
+            ))
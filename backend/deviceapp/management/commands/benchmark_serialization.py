@@ -0,0 +1,109 @@
+import hashlib
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from deviceapp.db import chunked_iterator
+from deviceapp.fast_serializers import FULL, SIMPLE, iter_device_chunks
+from deviceapp.models import Device
+from deviceapp.serializers import (
+    DeviceSerializer,
+    SimpleDeviceSerializer,
+    apply_eager_loading,
+)
+
+SERIALIZERS = {
+    FULL: DeviceSerializer,
+    SIMPLE: SimpleDeviceSerializer,
+}
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает скорость сериализации изделий через ModelSerializer ' \
+           'и через values() (fast_serializers) и проверяет совпадение JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=100000,
+            help='Количество изделий в замере',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Количество изделий, читаемых из БД одним пакетом',
+        )
+        parser.add_argument(
+            '--mode',
+            choices=[FULL, SIMPLE, 'both'],
+            default='both',
+            help='Представление: полное, простое (?simple=1) или оба',
+        )
+
+    def handle(self, *args, **options):
+        ids = list(
+            Device.objects
+            .order_by('id')
+            .values_list('id', flat=True)[:options['limit']]
+        )
+        if not ids:
+            self.stderr.write('В базе нет изделий')
+            return
+        queryset = Device.objects \
+            .filter(id__range=(ids[0], ids[-1])) \
+            .order_by('id')
+        modes = [FULL, SIMPLE] if options['mode'] == 'both' \
+            else [options['mode']]
+
+        for mode in modes:
+            model_time, model_digest = self.measure(
+                self.iter_model_chunks(queryset, mode, options['chunk_size'])
+            )
+            fast_time, fast_digest = self.measure(
+                iter_device_chunks(queryset, mode, options['chunk_size'])
+            )
+            self.report(mode, 'ModelSerializer', len(ids), model_time)
+            self.report(mode, 'values()', len(ids), fast_time)
+            self.stdout.write(f'[{mode}] ускорение: '
+                              f'{model_time / fast_time:.1f}x')
+            if model_digest == fast_digest:
+                self.stdout.write(self.style.SUCCESS(
+                    f'[{mode}] JSON совпадает побайтно'
+                ))
+            else:
+                self.stdout.write(self.style.ERROR(
+                    f'[{mode}] JSON различается'
+                ))
+
+    @staticmethod
+    def iter_model_chunks(queryset, mode, chunk_size):
+        serializer_class = SERIALIZERS[mode]
+        chunk = []
+        for obj in chunked_iterator(
+                apply_eager_loading(queryset, serializer_class), chunk_size):
+            chunk.append(obj)
+            if len(chunk) >= chunk_size:
+                yield serializer_class(chunk, many=True).data
+                chunk = []
+        if chunk:
+            yield serializer_class(chunk, many=True).data
+
+    @staticmethod
+    def measure(chunks):
+        # Замер включает чтение из БД, сериализацию и рендеринг JSON
+        renderer = JSONRenderer()
+        digest = hashlib.md5()
+        started = time.perf_counter()
+        for rows in chunks:
+            for row in rows:
+                digest.update(renderer.render(row))
+        return time.perf_counter() - started, digest.hexdigest()
+
+    def report(self, mode, name, count, seconds):
+        self.stdout.write(
+            f'[{mode}] {name}: {count} изделий за {seconds:.2f} с, '
+            f'{count / seconds:.0f} изделий/с'
+        )
@@ -0,0 +1,97 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from deviceapp.models import Device, DecimalNumber
+from deviceapp.synthetic import clear_registry, generate_registry
+
+
+class Command(BaseCommand):
+    help = 'Заполняет реестр синтетическими изделиями, номерами, ' \
+           'справочниками и иерархией состава (для замеров и отладки)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--devices',
+            type=int,
+            default=1000,
+            help='Количество изделий',
+        )
+        parser.add_argument(
+            '--org-codes',
+            type=int,
+            default=10,
+            help='Количество кодов организаций',
+        )
+        parser.add_argument(
+            '--device-types',
+            type=int,
+            default=20,
+            help='Количество типов изделий',
+        )
+        parser.add_argument(
+            '--themes',
+            type=int,
+            default=30,
+            help='Количество тем',
+        )
+        parser.add_argument(
+            '--depth',
+            type=int,
+            default=4,
+            help='Количество уровней иерархии состава',
+        )
+        parser.add_argument(
+            '--free-numbers',
+            type=float,
+            default=0.1,
+            help='Доля свободных децимальных номеров от числа изделий',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Начальное значение генератора случайных чисел',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Количество строк, вставляемых одним запросом',
+        )
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Удалить существующие изделия и справочники',
+        )
+
+    def handle(self, *args, **options):
+        if options['devices'] < 1 or options['org_codes'] < 1 \
+                or options['device_types'] < 1 or options['depth'] < 1:
+            raise CommandError('Количество изделий, кодов организаций, '
+                               'типов и уровней должно быть больше нуля')
+        if options['clear']:
+            clear_registry()
+        elif Device.objects.exists() or DecimalNumber.objects.exists():
+            raise CommandError('Реестр не пуст: используйте --clear')
+
+        started = time.perf_counter()
+        result = generate_registry(
+            devices=options['devices'],
+            org_codes=options['org_codes'],
+            device_types=options['device_types'],
+            themes=options['themes'],
+            depth=options['depth'],
+            free_numbers=options['free_numbers'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано за {time.perf_counter() - started:.1f} с: '
+            f'изделий {result.devices}, '
+            f'децимальных номеров {result.decimal_numbers}, '
+            f'кодов организаций {result.org_codes}, '
+            f'типов {result.device_types}, тем {result.themes}, '
+            f'связей состава {result.part_of}, '
+            f'связей с темами {result.theme_links}'
+        ))
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+
+from deviceapp.importer import import_devices
+
+
+class Command(BaseCommand):
+    help = 'Импортирует изделия из текстового или CSV-файла ' \
+           '(по одному изделию "Наименование АБВГ.123456.789" в строке)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к файлу')
+        parser.add_argument(
+            '--encoding',
+            default='utf-8-sig',
+            help='Кодировка файла',
+        )
+        parser.add_argument(
+            '--delimiter',
+            default=';',
+            help='Разделитель столбцов CSV (используется первый столбец)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Количество строк, сохраняемых одним пакетом',
+        )
+
+    def handle(self, *args, **options):
+        with open(options['path'], encoding=options['encoding'],
+                  newline='') as file:
+            report = import_devices(file,
+                                    batch_size=options['batch_size'],
+                                    delimiter=options['delimiter'])
+
+        for error in report.errors:
+            self.stderr.write(
+                f'Строка {error.line_no}: {error.message} ({error.line})'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано строк: {report.total}, '
+            f'добавлено изделий: {report.created}, '
+            f'ошибок: {len(report.errors)}'
+        ))
@@ -0,0 +1,124 @@
+import asyncio
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Нагрузочный тест API: GET-запросы к каждому url с заданным ' \
+           'числом одновременных клиентов. Например, сравнение ' \
+           'синхронного /api/devices/ и асинхронного /api/async/devices/'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'urls',
+            nargs='+',
+            help='Адреса вида http://host:port/path?query',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=100,
+            help='Количество одновременных клиентов',
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=1000,
+            help='Общее количество запросов к каждому url',
+        )
+        parser.add_argument(
+            '--timeout',
+            type=float,
+            default=30,
+            help='Таймаут одного запроса, секунд',
+        )
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1 or options['requests'] < 1:
+            raise CommandError('--concurrency и --requests должны быть '
+                               'больше нуля')
+        for url in options['urls']:
+            parts = urlsplit(url)
+            if parts.scheme != 'http' or not parts.hostname:
+                raise CommandError(f'Поддерживаются только адреса http://: '
+                                   f'{url}')
+            started = time.perf_counter()
+            timings, errors = asyncio.run(self.run(parts, options))
+            self.report(url, timings, errors,
+                        time.perf_counter() - started)
+
+    async def run(self, parts, options):
+        remaining = options['requests']
+        timings = []
+        errors = []
+
+        async def client():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                started = time.perf_counter()
+                try:
+                    status = await asyncio.wait_for(
+                        self.get(parts), options['timeout']
+                    )
+                except (OSError, ValueError, asyncio.TimeoutError) as e:
+                    errors.append(type(e).__name__)
+                    continue
+                if status == 200:
+                    timings.append(time.perf_counter() - started)
+                else:
+                    errors.append(f'HTTP {status}')
+
+        await asyncio.gather(*(client()
+                               for _ in range(options['concurrency'])))
+        return timings, errors
+
+    @staticmethod
+    async def get(parts):
+        """
+        GET-запрос по HTTP/1.0, возвращает код ответа. Тело читается
+        полностью: время ответа включает его передачу.
+        """
+        path = parts.path or '/'
+        if parts.query:
+            path = f'{path}?{parts.query}'
+        reader, writer = await asyncio.open_connection(parts.hostname,
+                                                       parts.port or 80)
+        try:
+            writer.write(
+                f'GET {path} HTTP/1.0\r\n'
+                f'Host: {parts.netloc}\r\n'
+                f'Accept: application/json\r\n\r\n'.encode('ascii')
+            )
+            await writer.drain()
+            status_line = (await reader.readline()).split()
+            await reader.read()
+        finally:
+            writer.close()
+        if len(status_line) < 2:
+            raise ValueError('Некорректный ответ сервера')
+        return int(status_line[1])
+
+    def report(self, url, timings, errors, seconds):
+        self.stdout.write(url)
+        total = len(timings) + len(errors)
+        self.stdout.write(f'  запросов: {total} за {seconds:.2f} с, '
+                          f'{total / seconds:.0f} запросов/с')
+        if timings:
+            timings.sort()
+            percentiles = ', '.join(
+                f'p{p}={self.percentile(timings, p) * 1000:.0f} мс'
+                for p in (50, 95, 99)
+            )
+            self.stdout.write(f'  время ответа: {percentiles}')
+        if errors:
+            kinds = ', '.join(sorted(set(errors)))
+            self.stdout.write(self.style.ERROR(
+                f'  ошибок: {len(errors)} ({kinds})'
+            ))
+
+    @staticmethod
+    def percentile(timings, p):
+        return timings[min(len(timings) - 1, len(timings) * p // 100)]
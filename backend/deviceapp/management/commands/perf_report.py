@@ -0,0 +1,146 @@
+import argparse
+import json
+from datetime import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+SORT_KEYS = {
+    'total': lambda stats: stats['total_ms'] * stats['requests'],
+    'p95': lambda stats: stats['p95_ms'],
+    'queries': lambda stats: stats['queries'],
+    'db': lambda stats: stats['db_ms'],
+}
+
+
+def parse_time(value, strict=True):
+    """
+    Момент времени ISO 8601; время без часового пояса считается
+    локальным. При strict=False неверное значение дает None.
+    """
+    try:
+        time = datetime.fromisoformat(value)
+    except ValueError:
+        if not strict:
+            return None
+        raise argparse.ArgumentTypeError(f'Неверная дата и время: {value}')
+    return time if time.tzinfo else time.astimezone()
+
+
+class Command(BaseCommand):
+    help = 'Отчет по журналу PerformanceMiddleware: запросы, время и число ' \
+           'SQL-запросов по представлениям, признаки N+1'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'files',
+            nargs='*',
+            help='Файлы журнала (по умолчанию PERF_LOG_FILE)',
+        )
+        parser.add_argument(
+            '--sort',
+            choices=list(SORT_KEYS),
+            default='total',
+            help='Сортировка: суммарное время, p95, среднее число '
+                 'SQL-запросов или среднее время в БД',
+        )
+        parser.add_argument(
+            '--since',
+            type=parse_time,
+            help='Учитывать записи не раньше этого момента (ISO 8601)',
+        )
+        parser.add_argument(
+            '--until',
+            type=parse_time,
+            help='Учитывать записи раньше этого момента (ISO 8601)',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=20,
+            help='Количество представлений в отчете',
+        )
+
+    def handle(self, *args, **options):
+        views = {}
+        for path in options['files'] or [settings.PERF_LOG_FILE]:
+            try:
+                with open(path, encoding='utf-8') as file:
+                    for line in file:
+                        self.add_record(views, line, options['since'],
+                                        options['until'])
+            except OSError as e:
+                raise CommandError(f'Не удалось прочитать {path}: {e}')
+
+        if not views:
+            self.stdout.write('В журнале нет записей')
+            return
+
+        report = sorted(
+            (self.summarize(view, records) for view, records in views.items()),
+            key=SORT_KEYS[options['sort']],
+            reverse=True,
+        )
+        self.stdout.write(
+            f'{"Представление":<48} {"запросов":>8} {"ср. мс":>8} '
+            f'{"p95 мс":>8} {"SQL":>6} {"макс. SQL":>9} {"БД мс":>8} '
+            f'{"рендер мс":>9} {"размер":>9} {"N+1":>5}'
+        )
+        for stats in report[:options['limit']]:
+            line = (
+                f'{stats["view"][:48]:<48} {stats["requests"]:>8} '
+                f'{stats["total_ms"]:>8.1f} {stats["p95_ms"]:>8.1f} '
+                f'{stats["queries"]:>6.1f} {stats["max_queries"]:>9} '
+                f'{stats["db_ms"]:>8.1f} {stats["render_ms"]:>9.1f} '
+                f'{stats["size"]:>9.0f} {stats["n_plus_one"]:>5}'
+            )
+            if stats['n_plus_one']:
+                line = self.style.WARNING(line)
+            self.stdout.write(line)
+            for sql, count in stats['repeated']:
+                self.stdout.write(f'    {count}x {sql[:120]}')
+
+    @staticmethod
+    def add_record(views, line, since=None, until=None):
+        try:
+            record = json.loads(line)
+        except ValueError:
+            return
+        if not isinstance(record, dict) or 'total_ms' not in record:
+            return
+        if since or until:
+            time = parse_time(record.get('time') or '', strict=False)
+            if time is None or (since and time < since) \
+                    or (until and time >= until):
+                return
+        view = record.get('view') or record.get('path') or '-'
+        views.setdefault(f'{record.get("method", "")} {view}'.strip(), []) \
+            .append(record)
+
+    @staticmethod
+    def summarize(view, records):
+        count = len(records)
+        timings = sorted(record['total_ms'] for record in records)
+        sizes = [record['size'] for record in records
+                 if record.get('size') is not None]
+        # Для каждой формы - наибольшее число повторов за один вызов
+        repeated = {}
+        for record in records:
+            for item in record.get('n_plus_one') or ():
+                repeated[item['sql']] = max(repeated.get(item['sql'], 0),
+                                            item['count'])
+        return {
+            'view': view,
+            'requests': count,
+            'total_ms': sum(timings) / count,
+            'p95_ms': timings[min(count - 1, count * 95 // 100)],
+            'queries': sum(record['queries'] for record in records) / count,
+            'max_queries': max(record['queries'] for record in records),
+            'db_ms': sum(record['db_ms'] for record in records) / count,
+            'render_ms': sum(record['render_ms'] for record in records)
+            / count,
+            'size': sum(sizes) / len(sizes) if sizes else 0,
+            'n_plus_one': sum(bool(record.get('n_plus_one'))
+                              for record in records),
+            'repeated': sorted(repeated.items(), key=lambda item: -item[1])[:3],
+        }
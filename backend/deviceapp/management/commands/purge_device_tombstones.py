@@ -0,0 +1,27 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from deviceapp.models import DeviceTombstone
+
+
+class Command(BaseCommand):
+    help = 'Удаляет устаревшие отметки об удалении изделий'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.DEVICE_TOMBSTONE_RETENTION_DAYS,
+            help='Срок хранения отметок, дней',
+        )
+
+    def handle(self, *args, **options):
+        deleted, _ = DeviceTombstone.objects.filter(
+            deleted_at__lt=timezone.now() - timedelta(days=options['days'])
+        ).delete()
+        self.stdout.write(
+            self.style.SUCCESS(f'Удалено отметок: {deleted}')
+        )
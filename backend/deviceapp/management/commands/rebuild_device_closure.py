@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from deviceapp.models import DeviceClosure
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает таблицу замыкания иерархии изделий (part_of)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Количество строк, вставляемых одним запросом',
+        )
+
+    def handle(self, *args, **options):
+        count = DeviceClosure.objects.rebuild(
+            batch_size=options['batch_size'],
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f'Записей в таблице замыкания: {count}')
+        )
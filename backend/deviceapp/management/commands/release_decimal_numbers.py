@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from deviceapp.models import DecimalNumber
+
+
+class Command(BaseCommand):
+    help = 'Освобождает зарезервированные децимальные номера, так и не ' \
+           'присвоенные изделиям'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ttl',
+            type=int,
+            default=settings.DECIMAL_NUMBER_RESERVATION_TTL,
+            help='Срок резерва, секунд',
+        )
+
+    def handle(self, *args, **options):
+        released = DecimalNumber.objects \
+            .release_stale_reservations(options['ttl'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Освобождено номеров: {released}')
+        )
@@ -0,0 +1,154 @@
+import json
+import logging
+import os
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+from datetime import datetime
+
+from asgiref.sync import (
+    iscoroutinefunction,
+    markcoroutinefunction,
+    sync_to_async,
+)
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('deviceapp.perf')
+
+_in_list_regex = re.compile(r'IN \((?:%s, )*%s\)')
+
+
+def sql_shape(sql):
+    """
+    Форма запроса: SQL с параметрами-заполнителями, списки IN (...)
+    любой длины сведены к одному виду.
+    """
+    return _in_list_regex.sub('IN (...)', sql)
+
+
+class QueryRecorder:
+    """Обертка выполнения SQL: число запросов, время и формы запросов."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.shapes[sql_shape(sql)] += 1
+
+    def repeated(self, threshold):
+        """Формы запросов, выполненные не менее threshold раз (N+1)."""
+        return [
+            {'sql': shape, 'count': count}
+            for shape, count in self.shapes.most_common()
+            if count >= threshold
+        ]
+
+
+class PerformanceMiddleware:
+    """
+    Метрики запроса: число SQL-запросов, время в БД, время рендеринга
+    ответа (сериализация JSON в DRF, шаблон в админке), общее время и
+    размер ответа. Метрики пишутся строкой JSON в журнал deviceapp.perf
+    и отдаются клиенту в заголовке Server-Timing. Повторяющиеся запросы
+    одной формы (N+1) записываются в журнал с уровнем WARNING.
+
+    Включается настройкой PERF_MONITORING. Для потоковых ответов
+    запросы, выполненные при отдаче тела, не учитываются.
+
+    Работает и под WSGI, и под ASGI. В асинхронном режиме обертка SQL
+    ставится на соединения потока, в котором sync_to_async выполняет
+    запросы ORM этого HTTP-запроса.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            self.record_queries(stack, recorder)
+            response = self.get_response(request)
+        return self.finish(request, response, recorder,
+                           time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        stack = ExitStack()
+        await sync_to_async(self.record_queries)(stack, recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        return self.finish(request, response, recorder,
+                           time.perf_counter() - started)
+
+    @staticmethod
+    def record_queries(stack, recorder):
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+
+    def finish(self, request, response, recorder, total):
+        render = getattr(request, '_perf_render_time', 0.0)
+        response['Server-Timing'] = ', '.join((
+            f'db;desc="{recorder.count} SQL";'
+            f'dur={recorder.duration * 1000:.1f}',
+            f'render;dur={render * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ))
+        self.log(request, response, recorder, total, render)
+        return response
+
+    def process_template_response(self, request, response):
+        # Вызывается перед рендерингом ответа: DRF Response и
+        # TemplateResponse админки рендерятся после выполнения view
+        started = time.perf_counter()
+
+        def rendered(response):
+            request._perf_render_time = time.perf_counter() - started
+
+        response.add_post_render_callback(rendered)
+        return response
+
+    @staticmethod
+    def log(request, response, recorder, total, render):
+        match = request.resolver_match
+        repeated = recorder.repeated(settings.PERF_N_PLUS_ONE_THRESHOLD)
+        record = {
+            # Время и процесс - для выборки по периоду и сопоставления
+            # с основным журналом
+            'time': datetime.now().astimezone().isoformat(
+                timespec='milliseconds'
+            ),
+            'pid': os.getpid(),
+            'view': (match.view_name or match._func_path) if match else None,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': recorder.count,
+            'db_ms': round(recorder.duration * 1000, 2),
+            'render_ms': round(render * 1000, 2),
+            'total_ms': round(total * 1000, 2),
+            'size': None if response.streaming else len(response.content),
+            'n_plus_one': repeated,
+        }
+        logger.log(logging.WARNING if repeated else logging.INFO,
+                   json.dumps(record, ensure_ascii=False))
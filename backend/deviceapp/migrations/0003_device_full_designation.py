@@ -0,0 +1,39 @@
+# Generated by Django 4.1.7 on 2026-10-18 03:08
+
+from django.db import migrations, models
+
+
+def fill_full_designation(apps, schema_editor):
+    Device = apps.get_model('deviceapp', 'Device')
+    devices = Device.objects \
+        .using(schema_editor.connection.alias) \
+        .select_related('type', 'decimal_num__org_code')
+
+    changed = []
+    for device in devices.iterator(chunk_size=1000):
+        type_name = device.type.name or ''
+        designation = f'{type_name} {device.index}' \
+            if device.index else type_name
+        if device.decimal_num:
+            designation += f' {device.decimal_num.org_code.code.upper()}' \
+                           f'.{device.decimal_num.number}'
+        device.full_designation = designation
+        changed.append(device)
+    Device.objects.bulk_update(changed, ['full_designation'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deviceapp', '0002_alter_decimalnumber_number_alter_device_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='device',
+            name='full_designation',
+            field=models.CharField(blank=True, editable=False, help_text='Тип, индекс и децимальный номер изделия', max_length=160, verbose_name='Полное обозначение'),
+        ),
+        migrations.RunPython(fill_full_designation,
+                             migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+# Поиск в API (full_designation__icontains) выполняется как
+# UPPER(full_designation::text) LIKE UPPER('%...%'): индекс строится по
+# тому же выражению. Префикс номера ищется по индексу _like, который
+# Django создает для уникального DecimalNumber.number
+
+INDEXES = (
+    (
+        'deviceapp_device_full_designation_trgm',
+        'CREATE INDEX IF NOT EXISTS deviceapp_device_full_designation_trgm '
+        'ON deviceapp_device '
+        'USING gin (UPPER(full_designation::text) gin_trgm_ops)',
+    ),
+)
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for _, sql in INDEXES:
+        schema_editor.execute(sql)
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _ in INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deviceapp', '0003_device_full_designation'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.1.7 on 2026-10-18 03:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deviceapp', '0004_device_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='decimalnumber',
+            index=models.Index(condition=models.Q(('is_used', False)), fields=['org_code', 'number'], name='decimalnumber_free_idx'),
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 4.1.7 on 2026-10-18 03:18
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_closure(apps, schema_editor):
+    Device = apps.get_model('deviceapp', 'Device')
+    DeviceClosure = apps.get_model('deviceapp', 'DeviceClosure')
+    db = schema_editor.connection.alias
+
+    parents_of = {}
+    edges = Device.part_of.through.objects \
+        .using(db) \
+        .values_list('from_device_id', 'to_device_id')
+    for child_id, parent_id in edges:
+        parents_of.setdefault(child_id, []).append(parent_id)
+
+    rows = []
+    for device_id in parents_of:
+        seen = {device_id}
+        frontier = [device_id]
+        depth = 0
+        while frontier:
+            depth += 1
+            next_frontier = []
+            for node in frontier:
+                for parent in parents_of.get(node, ()):
+                    if parent not in seen:
+                        seen.add(parent)
+                        next_frontier.append(parent)
+                        rows.append(DeviceClosure(ancestor_id=parent,
+                                                  descendant_id=device_id,
+                                                  depth=depth))
+            frontier = next_frontier
+    DeviceClosure.objects.using(db).bulk_create(rows, batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deviceapp', '0005_decimalnumber_free_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeviceClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveIntegerField(verbose_name='Глубина вложенности')),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='deviceapp.device', verbose_name='Изделие-предок')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='deviceapp.device', verbose_name='Изделие-потомок')),
+            ],
+            options={
+                'verbose_name': 'Связь состава изделий',
+                'verbose_name_plural': 'Связи состава изделий',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='deviceclosure',
+            index=models.Index(fields=['descendant', 'depth'], name='deviceclosure_descendant_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='deviceclosure',
+            constraint=models.UniqueConstraint(fields=('ancestor', 'descendant'), name='deviceclosure_unique_pair'),
+        ),
+        migrations.RunPython(fill_closure, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 4.1.7 on 2026-10-18 09:40
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deviceapp', '0006_deviceclosure'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeviceTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('device_id', models.BigIntegerField(db_index=True, verbose_name='Идентификатор изделия')),
+                ('deleted_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Удалено')),
+            ],
+            options={
+                'verbose_name': 'Удаленное изделие',
+                'verbose_name_plural': 'Удаленные изделия',
+            },
+        ),
+        migrations.AddField(
+            model_name='decimalnumber',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now, verbose_name='Изменено'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='device',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now, verbose_name='Изменено'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='devicetype',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now, verbose_name='Изменено'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='orgcode',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now, verbose_name='Изменено'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='theme',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now, verbose_name='Изменено'),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.1.7 on 2026-10-18 03:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deviceapp', '0007_updated_at_devicetombstone'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='device',
+            index=models.Index(fields=['type', 'decimal_num', '-id'], name='device_type_decimal_num_idx'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+from django.db import migrations
+
+# Поиск в админке (^index, ^full_designation, ^number) выполняется через
+# istartswith: UPPER(поле::text) LIKE UPPER('...%'). Индекс по тому же
+# выражению с text_pattern_ops позволяет искать диапазонным сканированием
+# при любой локали БД
+
+INDEXES = (
+    (
+        'deviceapp_device_index_upper',
+        'CREATE INDEX IF NOT EXISTS deviceapp_device_index_upper '
+        'ON deviceapp_device (UPPER("index"::text) text_pattern_ops)',
+    ),
+    (
+        'deviceapp_device_full_designation_upper',
+        'CREATE INDEX IF NOT EXISTS deviceapp_device_full_designation_upper '
+        'ON deviceapp_device (UPPER(full_designation::text) text_pattern_ops)',
+    ),
+    (
+        'deviceapp_decimalnumber_number_upper',
+        'CREATE INDEX IF NOT EXISTS deviceapp_decimalnumber_number_upper '
+        'ON deviceapp_decimalnumber (UPPER(number::text) text_pattern_ops)',
+    ),
+)
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for _, sql in INDEXES:
+        schema_editor.execute(sql)
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _ in INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deviceapp', '0008_admin_search_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
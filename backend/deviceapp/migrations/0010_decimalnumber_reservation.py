@@ -0,0 +1,26 @@
+# Generated by Django 4.1.7 on 2026-10-18 03:56
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('deviceapp', '0009_case_insensitive_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='decimalnumber',
+            name='reserved_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='Зарезервирован'),
+        ),
+        migrations.AddField(
+            model_name='decimalnumber',
+            name='reserved_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Зарезервировал'),
+        ),
+    ]
@@ -1,5 +1,13 @@
+from datetime import timedelta
+
+from django.conf import settings
 from django.db import models, transaction
+from django.db.models import Case, Value, When
 from django.core.validators import RegexValidator
+from django.utils import timezone
+
+from deviceapp.api_cache import invalidate_devices
+from deviceapp.db import chunked_iterator
 
 
 class Theme(models.Model):
@@ -9,6 +17,12 @@ class Theme(models.Model):
         verbose_name='Название темы',
     )
 
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        db_index=True,
+        verbose_name='Изменено',
+    )
+
     def __str__(self):
         return self.name
 
@@ -30,14 +44,85 @@ class OrgCode(models.Model):
             )
         ])
 
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        db_index=True,
+        verbose_name='Изменено',
+    )
+
     def __str__(self):
         return self.code.upper()
 
+    def save(self, *args, **kwargs):
+        super(OrgCode, self).save(*args, **kwargs)
+        Device.objects \
+            .filter(decimal_num__org_code=self) \
+            .refresh_full_designation()
+
     class Meta:
         verbose_name = 'Код организации-разработчика'
         verbose_name_plural = 'Коды организаций-разработчиков'
 
 
+class DecimalNumberQuerySet(models.QuerySet):
+    def switch_use(self, used_ids=(), unused_ids=()):
+        """
+        Одним UPDATE отмечает номера used_ids присвоенными, а unused_ids -
+        свободными, и снимает с них резерв. Строки, флаг которых уже
+        совпадает и которые не зарезервированы, не переписываются.
+        UPDATE блокирует затронутые строки до конца транзакции.
+        """
+        used_ids = {pk for pk in used_ids if pk is not None}
+        unused_ids = {pk for pk in unused_ids if pk is not None} - used_ids
+        if not used_ids and not unused_ids:
+            return 0
+
+        return self.filter(
+            models.Q(pk__in=used_ids, is_used=False) |
+            models.Q(pk__in=unused_ids, is_used=True) |
+            models.Q(pk__in=used_ids | unused_ids, reserved_at__isnull=False)
+        ).update(
+            is_used=Case(
+                When(pk__in=used_ids, then=Value(True)),
+                default=Value(False),
+            ),
+            reserved_by=None,
+            reserved_at=None,
+            updated_at=timezone.now(),
+        )
+
+    def available_to(self, user):
+        """
+        Номера, которые пользователь может присвоить изделию: свободные и
+        зарезервированные им самим, но еще не привязанные к изделию.
+        """
+        if user is None or not user.is_authenticated:
+            return self.filter(is_used=False)
+        return self.filter(
+            models.Q(is_used=False) |
+            models.Q(reserved_by=user, device__isnull=True)
+        )
+
+    def release_stale_reservations(self, ttl=None):
+        """
+        Освобождает номера, зарезервированные раньше ttl секунд назад
+        (по умолчанию DECIMAL_NUMBER_RESERVATION_TTL) и так и не
+        привязанные к изделию. Возвращает число освобожденных номеров.
+        """
+        if ttl is None:
+            ttl = settings.DECIMAL_NUMBER_RESERVATION_TTL
+        now = timezone.now()
+        return self.filter(
+            reserved_at__lt=now - timedelta(seconds=ttl),
+            device__isnull=True,
+        ).update(
+            is_used=False,
+            reserved_by=None,
+            reserved_at=None,
+            updated_at=now,
+        )
+
+
 class DecimalNumber(models.Model):
     org_code = models.ForeignKey(
         OrgCode,
@@ -63,12 +148,50 @@ class DecimalNumber(models.Model):
         verbose_name='Присвоен',
     )
 
+    # Резерв кнопкой "Выделить номер": номер отмечен присвоенным, но еще
+    # не привязан к изделию
+    reserved_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='+',
+        verbose_name='Зарезервировал',
+    )
+
+    reserved_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        db_index=True,
+        verbose_name='Зарезервирован',
+    )
+
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        db_index=True,
+        verbose_name='Изменено',
+    )
+
+    objects = DecimalNumberQuerySet.as_manager()
+
     def __str__(self):
         return f'{self.org_code}.{self.number}'
 
+    def save(self, *args, **kwargs):
+        super(DecimalNumber, self).save(*args, **kwargs)
+        Device.objects.filter(decimal_num=self).refresh_full_designation()
+
     class Meta:
         verbose_name = 'Децимальный номер'
         verbose_name_plural = 'Децимальные номера'
+        indexes = [
+            # Пул свободных номеров для выделения следующего номера
+            models.Index(
+                fields=['org_code', 'number'],
+                condition=models.Q(is_used=False),
+                name='decimalnumber_free_idx',
+            ),
+        ]
 
 
 class DeviceType(models.Model):
@@ -81,20 +204,242 @@ class DeviceType(models.Model):
         help_text='Аппарат, Блок, Комплекс, Ячейка и т.п.',
     )
 
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        db_index=True,
+        verbose_name='Изменено',
+    )
+
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        super(DeviceType, self).save(*args, **kwargs)
+        Device.objects.filter(type=self).refresh_full_designation()
+
     class Meta:
         verbose_name = 'Тип изделия'
         verbose_name_plural = 'Типы изделий'
 
 
+_DEFERRED = object()
+
+
+def compose_full_designation(type_name, index, org_code, number):
+    designation = f'{type_name or ""} {index}' if index else type_name or ''
+    if number:
+        designation += f' {org_code.upper()}.{number}'
+    return designation
+
+
+class DeviceQuerySet(models.QuerySet):
+    def refresh_full_designation(self, batch_size=1000):
+        """
+        Пересчитывает full_designation у изделий выборки и сохраняет
+        только изменившиеся значения пакетами по batch_size.
+        """
+        queryset = self \
+            .select_related('type', 'decimal_num__org_code') \
+            .only('full_designation', 'index', 'type__name',
+                  'decimal_num__number', 'decimal_num__org_code__code') \
+            .order_by()
+
+        changed = []
+        updated = 0
+        now = timezone.now()
+        for device in chunked_iterator(queryset, batch_size):
+            designation = device.get_full_designation()
+            if device.full_designation != designation:
+                device.full_designation = designation
+                device.updated_at = now
+                changed.append(device)
+            if len(changed) >= batch_size:
+                updated += self._save_full_designation(changed)
+                changed = []
+        if changed:
+            updated += self._save_full_designation(changed)
+        return updated
+
+    def _save_full_designation(self, devices):
+        # bulk_update не отправляет post_save
+        invalidate_devices((device.pk for device in devices), self.db)
+        return self.bulk_update(devices, ['full_designation', 'updated_at'])
+
+    def delete(self):
+        """
+        Удаляет изделия выборки вместе со связями M2M и одним UPDATE
+        освобождает их децимальные номера.
+        """
+        with transaction.atomic(using=self.db):
+            num_ids = list(
+                self.exclude(decimal_num=None)
+                .values_list('decimal_num_id', flat=True)
+            )
+            orphan_ids = DeviceClosure.objects \
+                .using(self.db) \
+                .descendants_of(self.values('pk'))
+            child_ids = Device.objects \
+                .using(self.db) \
+                .child_ids_of(self.values('pk'))
+            deleted_ids = list(self.values_list('pk', flat=True))
+            result = super(DeviceQuerySet, self).delete()
+            DecimalNumber.objects.using(self.db).switch_use(
+                unused_ids=num_ids,
+            )
+            DeviceClosure.objects.using(self.db).refresh(orphan_ids)
+            DeviceTombstone.objects.using(self.db).bulk_create(
+                DeviceTombstone(device_id=pk) for pk in deleted_ids
+            )
+            # У входивших в удаленные изделия меняется список part_of
+            Device.objects.using(self.db).filter(pk__in=child_ids).touch()
+            invalidate_devices(child_ids, self.db)
+        return result
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+    def touch(self):
+        """
+        Отмечает изделия выборки измененными. Нужен там, где данные
+        изделия меняются в обход Device.save (связи M2M, справочники).
+        """
+        return self.update(updated_at=timezone.now())
+
+    def child_ids_of(self, device_ids):
+        """Изделия, непосредственно входящие в изделия device_ids."""
+        return set(
+            Device.part_of.through.objects
+            .using(self.db)
+            .filter(to_device_id__in=device_ids)
+            .values_list('from_device_id', flat=True)
+        )
+
+    def add_themes(self, theme_ids, batch_size=5000):
+        """
+        Присваивает темы всем изделиям выборки вставкой в промежуточную
+        таблицу. Возвращает пару (новых связей, уже существовавших).
+        """
+        theme_ids = set(theme_ids)
+        through = Device.theme.through
+        device_ids = list(self.values_list('pk', flat=True))
+        if not device_ids or not theme_ids:
+            return 0, 0
+
+        with transaction.atomic(using=self.db):
+            existing = through.objects.using(self.db).filter(
+                device_id__in=self.values('pk'),
+                theme_id__in=theme_ids,
+            ).count()
+            through.objects.using(self.db).bulk_create(
+                [
+                    through(device_id=device_id, theme_id=theme_id)
+                    for device_id in device_ids
+                    for theme_id in theme_ids
+                ],
+                batch_size=batch_size,
+                ignore_conflicts=True,
+            )
+            # Вставка в промежуточную таблицу не отправляет m2m_changed
+            self.touch()
+            invalidate_devices(device_ids, self.db)
+        return len(device_ids) * len(theme_ids) - existing, existing
+
+    def remove_themes(self, theme_ids):
+        """Снимает темы со всех изделий выборки одним DELETE."""
+        through = Device.theme.through
+        links = through.objects.using(self.db).filter(
+            device_id__in=self.values('pk'),
+            theme_id__in=set(theme_ids),
+        )
+        with transaction.atomic(using=self.db):
+            device_ids = set(links.values_list('device_id', flat=True))
+            Device.objects \
+                .using(self.db) \
+                .filter(pk__in=device_ids) \
+                .touch()
+            invalidate_devices(device_ids, self.db)
+            deleted, _ = links.delete()
+        return deleted
+
+    def reassign_decimal_numbers(self, assignments):
+        """
+        Массово переназначает децимальные номера изделиям.
+        assignments: {pk изделия: pk номера или None}.
+        Число запросов не зависит от количества изделий (при больших
+        объемах bulk_update разбивает запрос на пакеты по batch_size).
+        """
+        assignments = dict(assignments)
+        if not assignments:
+            return 0
+
+        with transaction.atomic(using=self.db):
+            current = dict(
+                self.select_for_update()
+                .filter(pk__in=assignments)
+                .values_list('pk', 'decimal_num_id')
+            )
+            changed = {
+                pk: num_id for pk, num_id in assignments.items()
+                if pk in current and current[pk] != num_id
+            }
+            if not changed:
+                return 0
+
+            # Сначала освобождаем связи, чтобы обмен номерами между
+            # изделиями не нарушал уникальность decimal_num
+            self.filter(pk__in=changed).update(decimal_num=None,
+                                               updated_at=timezone.now())
+            devices = [
+                Device(pk=pk, decimal_num_id=num_id)
+                for pk, num_id in changed.items() if num_id is not None
+            ]
+            self.bulk_update(devices, ['decimal_num'], batch_size=5000)
+
+            DecimalNumber.objects.using(self.db).switch_use(
+                used_ids=changed.values(),
+                unused_ids=(current[pk] for pk in changed),
+            )
+            self.filter(pk__in=changed).refresh_full_designation()
+            invalidate_devices(changed, self.db)
+        return len(changed)
+
+
 class Device(models.Model):
     def __init__(self, *args, **kwargs):
         super(Device, self).__init__(*args, **kwargs)
-        self.__current_decimal_num_id = self.decimal_num.id \
-            if self.decimal_num \
-            else None
+        # Номер, сохраненный в БД. Для нового объекта его еще нет
+        self.__current_decimal_num_id = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(Device, cls).from_db(db, field_names, values)
+        instance.__remember_decimal_num()
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None):
+        super(Device, self).refresh_from_db(using, fields)
+        if fields is None or 'decimal_num' in fields \
+                or 'decimal_num_id' in fields:
+            self.__remember_decimal_num()
+
+    def __remember_decimal_num(self):
+        # Снимок берется по сырому decimal_num_id без обращения к БД.
+        # Если поле отложено (defer/only), значение неизвестно
+        attname = self._meta.get_field('decimal_num').attname
+        if attname in self.__dict__:
+            self.__current_decimal_num_id = self.__dict__[attname]
+        else:
+            self.__current_decimal_num_id = _DEFERRED
+
+    def __get_current_decimal_num_id(self):
+        if self.__current_decimal_num_id is not _DEFERRED:
+            return self.__current_decimal_num_id
+        if self.pk is None:
+            return None
+        return Device.objects \
+            .filter(pk=self.pk) \
+            .values_list('decimal_num_id', flat=True) \
+            .first()
 
     type = models.ForeignKey(
         DeviceType,
@@ -131,34 +476,48 @@ class Device(models.Model):
         verbose_name='Тема',
     )
 
+    # Поиск по полному обозначению идет по выражению UPPER(...):
+    # индексы по нему создаются миграциями 0004 (триграммы, подстрока) и
+    # 0009 (text_pattern_ops, префикс)
+    full_designation = models.CharField(
+        max_length=160,
+        blank=True,
+        editable=False,
+        verbose_name='Полное обозначение',
+        help_text='Тип, индекс и децимальный номер изделия',
+    )
+
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        db_index=True,
+        verbose_name='Изменено',
+    )
+
+    objects = DeviceQuerySet.as_manager()
+
     def __str__(self):
-        string = f'{self.type} {self.index}' if self.index else str(self.type)
-        return string + f' {self.decimal_num}' if self.decimal_num else string
+        return self.full_designation or self.get_full_designation()
+
+    def get_full_designation(self):
+        decimal_num = self.decimal_num
+        return compose_full_designation(
+            self.type.name,
+            self.index,
+            decimal_num.org_code.code if decimal_num else None,
+            decimal_num.number if decimal_num else None,
+        )
 
     class Meta:
         verbose_name = 'Изделие'
         verbose_name_plural = 'Изделия'
-
-    def __make_unused(self):
-        orig_num_obj = DecimalNumber.objects.get(
-            pk=self.__current_decimal_num_id
-        )
-        orig_num_obj.is_used = False
-        orig_num_obj.save()
-
-    def __make_used(self):
-        new_num_obj = DecimalNumber.objects.get(pk=self.decimal_num.id)
-        new_num_obj.is_used = True
-        new_num_obj.save()
-
-    def __manage_use(self, action):
-        if action == 'set':
-            self.__make_used()
-        elif action == 'clean':
-            self.__make_unused()
-        elif action == 'update':
-            self.__make_unused()
-            self.__make_used()
+        indexes = [
+            # Сортировка и фильтр по типу в админке (ChangeList добавляет
+            # к сортировке -pk, так как decimal_num допускает NULL)
+            models.Index(
+                fields=['type', 'decimal_num', '-id'],
+                name='device_type_decimal_num_idx',
+            ),
+        ]
 
     def save(self,
              force_insert=False,
@@ -167,27 +526,207 @@ class Device(models.Model):
              update_fields=None,
              commit=True):
 
-        curr_num_id = self.__current_decimal_num_id
-        new_num_obj = self.decimal_num
-        if curr_num_id is not None:
-            if new_num_obj is not None:
-                if curr_num_id != new_num_obj.id:
-                    self.__manage_use('update')
-            else:
-                self.__manage_use('clean')
-        else:
-            if new_num_obj is not None:
-                self.__manage_use('set')
+        attname = self._meta.get_field('decimal_num').attname
+        # Отложенное и не измененное поле номера не трогаем
+        track_num = attname in self.__dict__ and (
+            update_fields is None
+            or 'decimal_num' in update_fields
+            or attname in update_fields
+        )
 
-        super(Device, self).save(force_insert,
-                                 force_update,
-                                 using,
-                                 update_fields)
+        if update_fields is not None and \
+                {'type', 'index', 'decimal_num'} & set(update_fields):
+            update_fields = {*update_fields, 'full_designation'}
+        if update_fields is None or 'full_designation' in update_fields:
+            self.full_designation = self.get_full_designation()
+        if update_fields is not None:
+            update_fields = {*update_fields, 'updated_at'}
+
+        with transaction.atomic(using=using):
+            if track_num:
+                curr_num_id = self.__get_current_decimal_num_id()
+                new_num_id = self.decimal_num_id
+                if curr_num_id != new_num_id:
+                    DecimalNumber.objects.using(using).switch_use(
+                        used_ids=[new_num_id],
+                        unused_ids=[curr_num_id],
+                    )
+
+            super(Device, self).save(force_insert,
+                                     force_update,
+                                     using,
+                                     update_fields)
+        self.__remember_decimal_num()
 
     def delete(self, using=None, keep_parents=False):
-        current_decimal_num = self.decimal_num
+        curr_num_id = self.__get_current_decimal_num_id()
+
+        with transaction.atomic(using=using):
+            orphan_ids = DeviceClosure.objects \
+                .using(using) \
+                .descendants_of([self.pk])
+            child_ids = Device.objects.using(using).child_ids_of([self.pk])
+            pk = self.pk
+            result = super(Device, self).delete(using, keep_parents)
+            DecimalNumber.objects.using(using).switch_use(
+                unused_ids=[curr_num_id],
+            )
+            DeviceClosure.objects.using(using).refresh(orphan_ids)
+            DeviceTombstone.objects.using(using).create(device_id=pk)
+            Device.objects.using(using).filter(pk__in=child_ids).touch()
+            invalidate_devices(child_ids, using)
+        return result
+
+
+def iter_closure(parents_of, device_ids):
+    """
+    Строки таблицы замыкания (предок, потомок, глубина) для device_ids
+    по словарю непосредственных родителей parents_of. Глубина -
+    кратчайшее расстояние, циклы не зацикливают обход.
+    """
+    for device_id in device_ids:
+        seen = {device_id}
+        frontier = [device_id]
+        depth = 0
+        while frontier:
+            depth += 1
+            next_frontier = []
+            for node in frontier:
+                for parent in parents_of.get(node, ()):
+                    if parent not in seen:
+                        seen.add(parent)
+                        next_frontier.append(parent)
+                        yield parent, device_id, depth
+            frontier = next_frontier
+
+
+class DeviceClosureQuerySet(models.QuerySet):
+    def descendants_of(self, device_ids):
+        return set(
+            self.filter(ancestor_id__in=device_ids)
+            .values_list('descendant_id', flat=True)
+        )
+
+    def refresh(self, device_ids, batch_size=5000):
+        """
+        Пересчитывает предков изделий device_ids и всех их потомков.
+        Вызывается при изменении Device.part_of.
+        """
+        if not settings.DEVICE_CLOSURE_ENABLED:
+            return
+        device_ids = set(device_ids)
+        if not device_ids:
+            return
+        device_ids |= self.descendants_of(device_ids)
+
+        # Непосредственные родители подгружаются по уровням
+        through = Device.part_of.through.objects.using(self.db)
+        parents_of = {}
+        frontier = set(device_ids)
+        while frontier:
+            for child_id in frontier:
+                parents_of.setdefault(child_id, [])
+            edges = through \
+                .filter(from_device_id__in=frontier) \
+                .values_list('from_device_id', 'to_device_id')
+            for child_id, parent_id in edges:
+                parents_of[child_id].append(parent_id)
+            frontier = {
+                parent_id for parent_ids in parents_of.values()
+                for parent_id in parent_ids
+            } - parents_of.keys()
+
+        with transaction.atomic(using=self.db):
+            self.filter(descendant_id__in=device_ids).delete()
+            self.bulk_create(
+                (
+                    DeviceClosure(ancestor_id=ancestor_id,
+                                  descendant_id=descendant_id,
+                                  depth=depth)
+                    for ancestor_id, descendant_id, depth
+                    in iter_closure(parents_of, device_ids)
+                ),
+                batch_size=batch_size,
+            )
+
+    def rebuild(self, batch_size=5000):
+        """Полностью перестраивает таблицу замыкания."""
+        through = Device.part_of.through.objects.using(self.db)
+        parents_of = {}
+        for child_id, parent_id in through.values_list('from_device_id',
+                                                       'to_device_id'):
+            parents_of.setdefault(child_id, []).append(parent_id)
+
+        with transaction.atomic(using=self.db):
+            self.all().delete()
+            self.bulk_create(
+                (
+                    DeviceClosure(ancestor_id=ancestor_id,
+                                  descendant_id=descendant_id,
+                                  depth=depth)
+                    for ancestor_id, descendant_id, depth
+                    in iter_closure(parents_of, list(parents_of))
+                ),
+                batch_size=batch_size,
+            )
+        return self.count()
+
+
+class DeviceClosure(models.Model):
+    """
+    Таблица замыкания иерархии Device.part_of: все пары
+    (предок, потомок) с кратчайшей глубиной вложенности.
+    """
+    ancestor = models.ForeignKey(
+        Device,
+        on_delete=models.CASCADE,
+        related_name='descendant_links',
+        verbose_name='Изделие-предок',
+    )
+    descendant = models.ForeignKey(
+        Device,
+        on_delete=models.CASCADE,
+        related_name='ancestor_links',
+        verbose_name='Изделие-потомок',
+    )
+    depth = models.PositiveIntegerField(
+        verbose_name='Глубина вложенности',
+    )
+
+    objects = DeviceClosureQuerySet.as_manager()
 
-        with transaction.atomic():
-            current_decimal_num.is_used = False
-            current_decimal_num.save()
-            super(Device, self).delete(using, keep_parents)
+    class Meta:
+        verbose_name = 'Связь состава изделий'
+        verbose_name_plural = 'Связи состава изделий'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['ancestor', 'descendant'],
+                name='deviceclosure_unique_pair',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['descendant', 'depth'],
+                name='deviceclosure_descendant_idx',
+            ),
+        ]
+
+
+class DeviceTombstone(models.Model):
+    """
+    Отметка об удалении изделия для инкрементальной синхронизации:
+    клиенты получают id удаленных с момента прошлого опроса изделий.
+    """
+    device_id = models.BigIntegerField(
+        db_index=True,
+        verbose_name='Идентификатор изделия',
+    )
+    deleted_at = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        verbose_name='Удалено',
+    )
+
+    class Meta:
+        verbose_name = 'Удаленное изделие'
+        verbose_name_plural = 'Удаленные изделия'
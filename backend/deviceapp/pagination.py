@@ -0,0 +1,50 @@
+import base64
+import json
+
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination
+
+# Поля позиции выдачи /api/devices/changes/, хранящие дату и время
+_CHANGES_DATETIME_FIELDS = ('since', 'until', 'updated_at')
+
+
+class DeviceCursorPagination(CursorPagination):
+    # Keyset-пагинация по первичному ключу: стоимость страницы не зависит
+    # от ее номера, а выдача стабильна при вставке новых записей
+    ordering = 'id'
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+
+def encode_changes_cursor(position):
+    """
+    Токен продолжения выдачи изменений: границы опроса (since, until) и
+    ключ последней отданной записи - (updated_at, id) измененного изделия
+    или deleted_after, id удаленного.
+    """
+    data = {
+        key: value.isoformat() if key in _CHANGES_DATETIME_FIELDS else value
+        for key, value in position.items()
+    }
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).decode()
+
+
+def decode_changes_cursor(token):
+    try:
+        position = json.loads(base64.urlsafe_b64decode(token.encode()))
+        for key in _CHANGES_DATETIME_FIELDS:
+            if key in position:
+                position[key] = parse_datetime(position[key])
+                if position[key] is None:
+                    raise ValueError
+        for key in ('id', 'deleted_after'):
+            if key in position and type(position[key]) is not int:
+                raise ValueError
+        if not {'since', 'until'} <= position.keys() \
+                or ('updated_at' in position) != ('id' in position):
+            raise ValueError
+    except (ValueError, TypeError, AttributeError):
+        raise ValidationError({'cursor': 'Неверный токен продолжения'})
+    return position
@@ -0,0 +1,135 @@
+import random
+import threading
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from deviceapp.models import DeviceType, OrgCode, Theme
+
+
+class ReferenceCache:
+    """
+    Копия небольшого справочника в памяти процесса. Актуальность
+    проверяется по счетчику версии в общем кэше Django: изменение
+    справочника в любом воркере увеличивает счетчик, и остальные процессы
+    перечитывают таблицу при следующем обращении. Поиск по загруженной
+    копии не обращается к БД.
+
+    Копия, прочитанная внутри транзакции, которая изменила справочник,
+    не сохраняется до фиксации: иначе после отката в ней остались бы
+    несуществующие строки. Признак такой транзакции хранится отдельно
+    для каждого потока, как и сама транзакция.
+    """
+
+    def __init__(self, model, key_field):
+        self.model = model
+        self.key_field = key_field
+        self.version_key = f'deviceapp:reference:{model._meta.label_lower}'
+        self._fields = [field.attname for field in model._meta.concrete_fields]
+        self._key_index = self._fields.index(key_field)
+        self._pk_index = self._fields.index(model._meta.pk.attname)
+        self._lock = threading.Lock()
+        self._version = None
+        self._rows = {}
+        self._pks = {}
+        self._local = threading.local()
+
+    def get(self, key):
+        """Объект с key_field == key или None."""
+        return self._build(self._load()[0].get(key))
+
+    def get_by_pk(self, pk):
+        return self._build(self._load()[1].get(pk))
+
+    def all(self):
+        """Все объекты, отсортированные по key_field."""
+        rows, _ = self._load()
+        return [
+            self._build(rows[key])
+            for key in sorted(rows, key=lambda key: (key is None, key or ''))
+        ]
+
+    def pk_map(self):
+        """Словарь {значение key_field: pk}."""
+        rows, _ = self._load()
+        return {key: row[self._pk_index] for key, row in rows.items()}
+
+    def get_or_create(self, key):
+        obj = self.get(key)
+        if obj is not None:
+            return obj, False
+        return self.model.objects.get_or_create(**{self.key_field: key})
+
+    def invalidate(self, using=None):
+        """
+        Сбрасывает копии справочника во всех процессах: сразу и повторно
+        после фиксации транзакции.
+        """
+        with self._lock:
+            self._version = None
+        self._local.pending = connections[using or DEFAULT_DB_ALIAS] \
+            .in_atomic_block
+        self._bump()
+        transaction.on_commit(self._committed, using=using)
+
+    def _committed(self):
+        self._local.pending = False
+        with self._lock:
+            self._version = None
+        self._bump()
+
+    def _bump(self):
+        try:
+            cache.incr(self.version_key)
+        except ValueError:
+            self._current_version()
+
+    def _current_version(self):
+        version = cache.get(self.version_key)
+        if version is None:
+            # Счетчик начинается со случайного значения: после очистки
+            # общего кэша версия не совпадет с версией старых копий
+            cache.add(self.version_key, random.getrandbits(48), None)
+            version = cache.get(self.version_key)
+        return version
+
+    def _load(self):
+        version = self._current_version()
+        pending = getattr(self._local, 'pending', False)
+        if pending and not connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            # Транзакция с изменением завершилась без фиксации
+            self._local.pending = pending = False
+            with self._lock:
+                self._version = None
+        with self._lock:
+            if version == self._version and not pending:
+                return self._rows, self._pks
+
+        rows = {
+            row[self._key_index]: row
+            for row in self.model.objects.values_list(*self._fields)
+        }
+        pks = {row[self._pk_index]: row for row in rows.values()}
+        if not pending:
+            with self._lock:
+                self._rows, self._pks = rows, pks
+                self._version = version
+        return rows, pks
+
+    def _build(self, row):
+        if row is None:
+            return None
+        # Каждый вызов получает свой экземпляр: общие объекты нельзя
+        # отдавать формам и моделям, которые могут их изменить
+        return self.model.from_db(DEFAULT_DB_ALIAS, self._fields, row)
+
+
+org_codes = ReferenceCache(OrgCode, 'code')
+device_types = ReferenceCache(DeviceType, 'name')
+themes = ReferenceCache(Theme, 'name')
+
+REFERENCE_CACHES = {
+    OrgCode: org_codes,
+    DeviceType: device_types,
+    Theme: themes,
+}
@@ -1,4 +1,14 @@
-from rest_framework.serializers import ModelSerializer, StringRelatedField
+from functools import lru_cache
+
+from django.db.models import Prefetch
+from rest_framework.relations import ManyRelatedField, PrimaryKeyRelatedField
+from rest_framework.serializers import (
+    BaseSerializer,
+    ListSerializer,
+    ModelSerializer,
+    RelatedField,
+    StringRelatedField,
+)
 
 from .models import Device, DeviceType, DecimalNumber, Theme, OrgCode
 
@@ -6,13 +16,13 @@ from .models import Device, DeviceType, DecimalNumber, Theme, OrgCode
 class DeviceTypeSerializer(ModelSerializer):
     class Meta:
         model = DeviceType
-        fields = '__all__'
+        exclude = ['updated_at']
 
 
 class OrgCodeSerializer(ModelSerializer):
     class Meta:
         model = OrgCode
-        fields = '__all__'
+        exclude = ['updated_at']
 
 
 class DecimalNumberSerializer(ModelSerializer):
@@ -20,19 +30,19 @@ class DecimalNumberSerializer(ModelSerializer):
 
     class Meta:
         model = DecimalNumber
-        fields = '__all__'
+        exclude = ['updated_at', 'reserved_by', 'reserved_at']
 
 
 class ThemeSerializer(ModelSerializer):
     class Meta:
         model = Theme
-        fields = '__all__'
+        exclude = ['updated_at']
 
 
 class DeviceSerializer(ModelSerializer):
     type = DeviceTypeSerializer()
     decimal_num = DecimalNumberSerializer()
-    theme = ThemeSerializer()
+    theme = ThemeSerializer(many=True)
 
     class Meta:
         model = Device
@@ -50,4 +60,80 @@ class SimpleDeviceSerializer(ModelSerializer):
             'index',
             'decimal_num',
         ]
+        # DecimalNumber.__str__ обращается к org_code
+        select_related = ['decimal_num__org_code']
+
+
+@lru_cache(maxsize=None)
+def get_eager_loading_plan(serializer_class):
+    """
+    Строит по полям сериализатора списки связей для select_related и
+    prefetch_related, чтобы сериализация не порождала запросов на каждую
+    запись. Дополнительные связи (например, нужные для __str__) можно
+    указать в Meta.select_related / Meta.prefetch_related.
+    """
+    select_related = []
+    prefetch_related = []
+    _collect_relations(serializer_class(), '', select_related,
+                       prefetch_related)
+
+    meta = getattr(serializer_class, 'Meta', None)
+    select_related.extend(getattr(meta, 'select_related', ()))
+    prefetch_related.extend(getattr(meta, 'prefetch_related', ()))
+
+    return (
+        tuple(dict.fromkeys(select_related)),
+        tuple(dict.fromkeys(prefetch_related)),
+    )
+
+
+def apply_eager_loading(queryset, serializer_class):
+    """
+    Подгружает связи по плану get_eager_loading_plan. Связи
+    prefetch_related сортируются по первичному ключу, чтобы порядок
+    элементов в списках ответа не зависел от плана запроса СУБД.
+    """
+    select_related, prefetch_related = get_eager_loading_plan(
+        serializer_class
+    )
+    return queryset \
+        .select_related(*select_related) \
+        .prefetch_related(*(
+            Prefetch(
+                lookup,
+                queryset=_get_related_model(queryset.model, lookup)
+                ._default_manager.order_by('pk'),
+            )
+            for lookup in prefetch_related
+        ))
+
+
+def _get_related_model(model, lookup):
+    for name in lookup.split('__'):
+        model = model._meta.get_field(name).related_model
+    return model
+
+
+def _collect_relations(serializer, prefix, select_related, prefetch_related):
+    for field in serializer.fields.values():
+        if field.source == '*' or field.write_only:
+            continue
+        lookup = prefix + field.source.replace('.', '__')
+
+        if isinstance(field, ListSerializer):
+            prefetch_related.append(lookup)
+            # Внутри prefetch связи подгружаются тоже через prefetch
+            _collect_relations(field.child, lookup + '__',
+                               prefetch_related, prefetch_related)
+        elif isinstance(field, BaseSerializer):
+            select_related.append(lookup)
+            _collect_relations(field, lookup + '__',
+                               select_related, prefetch_related)
+        elif isinstance(field, ManyRelatedField):
+            prefetch_related.append(lookup)
+        elif isinstance(field, PrimaryKeyRelatedField):
+            # Значение берется из *_id без обращения к связанному объекту
+            continue
+        elif isinstance(field, RelatedField):
+            select_related.append(lookup)
 
@@ -0,0 +1,154 @@
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+)
+from django.dispatch import receiver
+
+from deviceapp.api_cache import invalidate_devices
+from deviceapp.models import (
+    DecimalNumber,
+    Device,
+    DeviceClosure,
+    DeviceType,
+    OrgCode,
+    Theme,
+)
+from deviceapp.reference_cache import REFERENCE_CACHES
+
+
+@receiver(m2m_changed, sender=Device.part_of.through)
+def device_part_of_changed(sender, instance, action, reverse, pk_set,
+                           using, **kwargs):
+    # При reverse=True instance - изделие, в которое входят pk_set
+    if action == 'pre_clear' and reverse:
+        instance._part_of_cleared_ids = set(
+            instance.device_set.values_list('pk', flat=True)
+        )
+    elif action in ('post_add', 'post_remove'):
+        changed_ids = pk_set if reverse else {instance.pk}
+        DeviceClosure.objects.using(using).refresh(changed_ids)
+        _devices_changed(changed_ids, using)
+    elif action == 'post_clear':
+        changed_ids = instance.__dict__.pop('_part_of_cleared_ids', set()) \
+            if reverse else {instance.pk}
+        DeviceClosure.objects.using(using).refresh(changed_ids)
+        _devices_changed(changed_ids, using)
+
+
+@receiver(m2m_changed, sender=Device.theme.through)
+def device_theme_changed(sender, instance, action, reverse, pk_set,
+                         using, **kwargs):
+    # При reverse=True instance - тема, pk_set - изделия
+    if action == 'pre_clear' and reverse:
+        instance._theme_cleared_ids = set(
+            instance.device_set.values_list('pk', flat=True)
+        )
+    elif action in ('post_add', 'post_remove'):
+        _devices_changed(pk_set if reverse else {instance.pk}, using)
+    elif action == 'post_clear':
+        changed_ids = instance.__dict__.pop('_theme_cleared_ids', set()) \
+            if reverse else {instance.pk}
+        _devices_changed(changed_ids, using)
+
+
+# Изменение справочника отмечает измененными (updated_at) и сбрасывает
+# кэш ответов API только у изделий, которые на него ссылаются
+
+def _devices_changed(device_ids, using):
+    Device.objects.using(using).filter(pk__in=device_ids).touch()
+    invalidate_devices(device_ids, using)
+
+
+@receiver(post_save, sender=Device)
+@receiver(post_delete, sender=Device)
+def device_changed(sender, instance, using, **kwargs):
+    invalidate_devices({instance.pk}, using)
+
+
+def _device_ids(using, **lookup):
+    return set(
+        Device.objects.using(using)
+        .filter(**lookup)
+        .values_list('pk', flat=True)
+    )
+
+
+def _reference_saved(created, using, **lookup):
+    if created:
+        invalidate_devices((), using)
+        return
+    devices = Device.objects.using(using).filter(**lookup)
+    device_ids = set(devices.values_list('pk', flat=True))
+    if device_ids:
+        devices.touch()
+    invalidate_devices(device_ids, using)
+
+
+@receiver(post_save, sender=DecimalNumber)
+def decimal_number_saved(sender, instance, created, using, **kwargs):
+    _reference_saved(created, using, decimal_num=instance)
+
+
+@receiver(post_save, sender=OrgCode)
+def org_code_saved(sender, instance, created, using, **kwargs):
+    _reference_saved(created, using, decimal_num__org_code=instance)
+
+
+@receiver(post_save, sender=DeviceType)
+def device_type_saved(sender, instance, created, using, **kwargs):
+    _reference_saved(created, using, type=instance)
+
+
+@receiver(post_save, sender=Theme)
+def theme_saved(sender, instance, created, using, **kwargs):
+    _reference_saved(created, using, theme=instance)
+
+
+# Ссылки на удаляемые номера и темы снимаются каскадом до post_delete,
+# поэтому изделия запоминаются заранее
+
+@receiver(pre_delete, sender=DecimalNumber)
+def decimal_number_deleting(sender, instance, using, **kwargs):
+    instance._affected_device_ids = _device_ids(using, decimal_num=instance)
+
+
+@receiver(pre_delete, sender=Theme)
+def theme_deleting(sender, instance, using, **kwargs):
+    instance._affected_device_ids = _device_ids(using, theme=instance)
+
+
+@receiver(post_delete, sender=DecimalNumber)
+def decimal_number_deleted(sender, instance, using, **kwargs):
+    # Номер уже снят с изделий (SET_NULL): обозначения пересчитываются
+    # и при удалении одного номера, и при удалении выборки
+    device_ids = instance.__dict__.pop('_affected_device_ids', set())
+    Device.objects \
+        .using(using) \
+        .filter(pk__in=device_ids) \
+        .refresh_full_designation()
+    _devices_changed(device_ids, using)
+
+
+@receiver(post_delete, sender=Theme)
+@receiver(post_delete, sender=OrgCode)
+@receiver(post_delete, sender=DeviceType)
+def reference_deleted(sender, instance, using, **kwargs):
+    # OrgCode и DeviceType защищены PROTECT: изделий на них уже нет
+    _devices_changed(
+        instance.__dict__.pop('_affected_device_ids', set()),
+        using,
+    )
+
+
+# Копии справочников в памяти процессов (reference_cache)
+
+@receiver(post_save, sender=OrgCode)
+@receiver(post_save, sender=DeviceType)
+@receiver(post_save, sender=Theme)
+@receiver(post_delete, sender=OrgCode)
+@receiver(post_delete, sender=DeviceType)
+@receiver(post_delete, sender=Theme)
+def reference_changed(sender, using, **kwargs):
+    REFERENCE_CACHES[sender].invalidate(using)
@@ -0,0 +1,230 @@
+import itertools
+import random
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import transaction
+
+from deviceapp.api_cache import invalidate_devices
+from deviceapp.models import (
+    DecimalNumber,
+    Device,
+    DeviceClosure,
+    DeviceTombstone,
+    DeviceType,
+    OrgCode,
+    Theme,
+    compose_full_designation,
+)
+from deviceapp.reference_cache import REFERENCE_CACHES
+
+# Синтетический реестр изделий для нагрузочных тестов и замеров
+
+TYPE_NAMES = (
+    'Блок',
+    'Ячейка',
+    'Модуль',
+    'Плата',
+    'Аппарат',
+    'Стойка',
+    'Шкаф',
+    'Комплекс',
+)
+
+CODE_LETTERS = 'АБВГДЕЖИКЛМНПРСТ'
+
+
+@dataclass
+class GeneratedRegistry:
+    org_codes: int = 0
+    device_types: int = 0
+    themes: int = 0
+    decimal_numbers: int = 0
+    devices: int = 0
+    part_of: int = 0
+    theme_links: int = 0
+
+
+def generate_registry(devices=1000, org_codes=10, device_types=20,
+                      themes=30, depth=4, free_numbers=0.1, seed=0,
+                      batch_size=5000):
+    """
+    Заполняет пустой реестр синтетическими данными через bulk_create.
+
+    Изделия распределяются по depth уровням иерархии (каждый следующий
+    уровень втрое больше предыдущего), изделие входит в одно-два изделия
+    предыдущего уровня. Около 5% изделий создаются без децимального
+    номера, 10% - без индекса; free_numbers - доля свободных номеров
+    сверх присвоенных.
+    """
+    rng = random.Random(seed)
+    result = GeneratedRegistry()
+    with transaction.atomic():
+        code_pks = _bulk_create_references(
+            OrgCode, 'code', _org_codes(org_codes), batch_size,
+        )
+        type_pks = _bulk_create_references(
+            DeviceType, 'name', _type_names(device_types), batch_size,
+        )
+        theme_pks = list(_bulk_create_references(
+            Theme, 'name', [f'Тема {i:03}' for i in range(1, themes + 1)],
+            batch_size,
+        ).values())
+        result.org_codes = len(code_pks)
+        result.device_types = len(type_pks)
+        result.themes = len(theme_pks)
+
+        # Номер изделия: (код организации, цифровая часть) или None
+        device_numbers = []
+        numbers = _numbers()
+        codes = list(code_pks)
+        for i in range(devices):
+            device_numbers.append(
+                None if i % 20 == 19 else (rng.choice(codes), next(numbers))
+            )
+        free = [(rng.choice(codes), next(numbers))
+                for _ in range(round(devices * free_numbers))]
+        DecimalNumber.objects.bulk_create(
+            itertools.chain(
+                (DecimalNumber(org_code_id=code_pks[code], number=number,
+                               is_used=True)
+                 for code, number in filter(None, device_numbers)),
+                (DecimalNumber(org_code_id=code_pks[code], number=number)
+                 for code, number in free),
+            ),
+            batch_size=batch_size,
+        )
+        number_pks = dict(DecimalNumber.objects.values_list('number', 'pk'))
+        result.decimal_numbers = len(number_pks)
+
+        type_names = list(type_pks)
+        Device.objects.bulk_create(
+            (
+                _device(rng.choice(type_names), type_pks,
+                        None if i % 10 == 9 else _index(i),
+                        device_numbers[i], number_pks)
+                for i in range(devices)
+            ),
+            batch_size=batch_size,
+        )
+        device_pks = list(
+            Device.objects.order_by('pk').values_list('pk', flat=True)
+        )
+        result.devices = len(device_pks)
+
+        result.part_of = len(Device.part_of.through.objects.bulk_create(
+            _part_of_links(rng, device_pks, depth, Device.part_of.through),
+            batch_size=batch_size,
+        ))
+        result.theme_links = len(Device.theme.through.objects.bulk_create(
+            _theme_links(rng, device_pks, theme_pks, Device.theme.through),
+            batch_size=batch_size,
+        ))
+
+        if settings.DEVICE_CLOSURE_ENABLED:
+            DeviceClosure.objects.rebuild(batch_size=batch_size)
+
+    # bulk_create не отправляет сигналы: сбрасываем кэши
+    invalidate_devices()
+    for reference_cache in REFERENCE_CACHES.values():
+        reference_cache.invalidate()
+    return result
+
+
+def clear_registry():
+    """Удаляет все изделия и справочники."""
+    with transaction.atomic():
+        Device.objects.all().delete()
+        DeviceTombstone.objects.all().delete()
+        DecimalNumber.objects.all().delete()
+        OrgCode.objects.all().delete()
+        DeviceType.objects.all().delete()
+        Theme.objects.all().delete()
+    for reference_cache in REFERENCE_CACHES.values():
+        reference_cache.invalidate()
+
+
+def _bulk_create_references(model, field_name, values, batch_size):
+    model.objects.bulk_create(
+        [model(**{field_name: value}) for value in values],
+        batch_size=batch_size,
+    )
+    return dict(model.objects.values_list(field_name, 'pk'))
+
+
+def _org_codes(count):
+    return [
+        ''.join(letters)
+        for letters in itertools.islice(
+            itertools.product(CODE_LETTERS, repeat=4), count
+        )
+    ]
+
+
+def _type_names(count):
+    return [
+        TYPE_NAMES[i % len(TYPE_NAMES)] if i < len(TYPE_NAMES)
+        else f'{TYPE_NAMES[i % len(TYPE_NAMES)]} {i // len(TYPE_NAMES) + 1}'
+        for i in range(count)
+    ]
+
+
+def _index(i):
+    # АА000, ..., ТТ999, затем АА000-01 и т.д. (формат строки разбора)
+    letters = ''.join(
+        CODE_LETTERS[i // 1000 // len(CODE_LETTERS) ** power
+                     % len(CODE_LETTERS)]
+        for power in (1, 0)
+    )
+    index = f'{letters}{i % 1000:03}'
+    suffix = i // (1000 * len(CODE_LETTERS) ** 2)
+    return f'{index}-{suffix:02}' if suffix else index
+
+
+def _numbers():
+    # 123456.789: 900 тысяч групп по 1000 номеров
+    for i in itertools.count():
+        yield f'{100000 + i // 1000:06}.{i % 1000:03}'
+
+
+def _device(type_name, type_pks, index, decimal_number, number_pks):
+    code, number = decimal_number or (None, None)
+    return Device(
+        type_id=type_pks[type_name],
+        index=index,
+        decimal_num_id=number_pks[number] if number else None,
+        full_designation=compose_full_designation(type_name, index,
+                                                  code, number),
+    )
+
+
+def _levels(device_pks, depth):
+    # Размеры уровней пропорциональны 1, 3, 9, ...
+    weights = [3 ** level for level in range(depth)]
+    total = sum(weights)
+    levels = []
+    start = 0
+    for level, weight in enumerate(weights):
+        end = len(device_pks) if level == depth - 1 \
+            else start + max(1, len(device_pks) * weight // total)
+        levels.append(device_pks[start:end])
+        start = end
+    return [level for level in levels if level]
+
+
+def _part_of_links(rng, device_pks, depth, through):
+    levels = _levels(device_pks, depth)
+    for parents, children in zip(levels, levels[1:]):
+        for child_id in children:
+            count = 2 if len(parents) > 1 and rng.random() < 0.1 else 1
+            for parent_id in rng.sample(parents, count):
+                yield through(from_device_id=child_id, to_device_id=parent_id)
+
+
+def _theme_links(rng, device_pks, theme_pks, through):
+    if not theme_pks:
+        return
+    for device_id in device_pks:
+        count = min(rng.choice((0, 1, 1, 2)), len(theme_pks))
+        for theme_id in rng.sample(theme_pks, count):
+            yield through(device_id=device_id, theme_id=theme_id)
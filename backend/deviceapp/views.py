@@ -1,22 +1,345 @@
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.viewsets import ReadOnlyModelViewSet
-from rest_framework import filters
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.urls import replace_query_param
 
-from .models import Device
-from .serializers import DeviceSerializer, SimpleDeviceSerializer
+from . import api_cache
+from .allocator import (
+    AllocationError,
+    NoFreeDecimalNumber,
+    reserve_decimal_number,
+)
+from .export import EXPORT_FORMATS, export_response
+from .fast_serializers import (
+    FULL,
+    device_values,
+    iter_device_chunks,
+    map_rows,
+)
+from .filters import (
+    DeviceCatalogueFilter,
+    DeviceHierarchyFilter,
+    DeviceSearchFilter,
+)
+from .hierarchy import COMPONENTS, MAX_DEPTH, WHERE_USED, build_tree
+from .models import Device, DeviceTombstone
+from .pagination import (
+    DeviceCursorPagination,
+    decode_changes_cursor,
+    encode_changes_cursor,
+)
+from .serializers import (
+    DecimalNumberSerializer,
+    DeviceSerializer,
+    SimpleDeviceSerializer,
+    apply_eager_loading,
+)
 
 
 class DeviceModelViewSet(ReadOnlyModelViewSet):
     queryset = Device.objects.all()
-    filter_backends = [filters.SearchFilter]
-    search_fields = [
-        'type__name',
-        'index',
-        'decimal_num__number',
-        'decimal_num__org_code__code',
+    pagination_class = DeviceCursorPagination
+    filter_backends = [
+        DeviceSearchFilter,
+        DeviceCatalogueFilter,
+        DeviceHierarchyFilter,
     ]
+    search_fields = ['full_designation']
+    stream_chunk_size = 2000
+    changes_page_size = 1000
+    changes_max_page_size = 5000
 
-    def get_serializer_class(self):
+    def get_serializer_mode(self):
         if self.request.query_params.get('simple') == '1':
+            return 'simple'
+        return 'full'
+
+    def get_serializer_class(self):
+        if self.get_serializer_mode() == 'simple':
             return SimpleDeviceSerializer
         return DeviceSerializer
 
+    def get_queryset(self):
+        queryset = super(DeviceModelViewSet, self).get_queryset()
+        return apply_eager_loading(queryset, self.get_serializer_class())
+
+    @action(detail=True, url_path='tree')
+    def tree(self, request, pk=None):
+        """Состав изделия: дерево входящих в него изделий."""
+        return self.hierarchy_response(COMPONENTS)
+
+    @action(detail=True, url_path='where-used')
+    def where_used(self, request, pk=None):
+        """Применяемость изделия: дерево изделий, в которые оно входит."""
+        return self.hierarchy_response(WHERE_USED)
+
+    @action(detail=False,
+            url_path=r'export/(?P<file_format>%s)' % '|'.join(EXPORT_FORMATS))
+    def export(self, request, file_format=None):
+        """
+        Потоковая выгрузка отфильтрованного реестра (поиск и фильтры как
+        у списка) в CSV, JSON Lines или XLSX.
+        """
+        queryset = self.filter_queryset(
+            super(DeviceModelViewSet, self).get_queryset()
+        ).order_by('id')
+        return export_response(queryset, file_format,
+                               self.stream_chunk_size)
+
+    @action(detail=False, url_path='changes')
+    def changes(self, request):
+        """
+        Изменения реестра после момента since (ISO 8601): новые и
+        измененные изделия (changed) и id удаленных (deleted), не более
+        limit записей на странице. Пока выдача не закончилась, next
+        содержит ссылку на следующую страницу; последняя страница вместо
+        нее возвращает until, которое передается как since при следующем
+        опросе.
+        """
+        limit = self.get_changes_limit()
+        token = request.query_params.get('cursor')
+        if token:
+            position = decode_changes_cursor(token)
+            since, until = position['since'], position['until']
+        else:
+            since = self.get_since()
+            # Изменения последних DEVICE_SYNC_LAG секунд вернутся повторно
+            # при следующем опросе: их транзакции могли еще не завершиться
+            until = max(
+                since,
+                timezone.now() - timedelta(seconds=settings.DEVICE_SYNC_LAG),
+            )
+            position = {}
+
+        changed = Device.objects.filter(updated_at__gt=since)
+        changed_rows, deleted_ids = [], []
+        next_position = None
+
+        if 'deleted_after' not in position:
+            # Страница по ключу (updated_at, id): изделие, измененное во
+            # время выдачи, переместится в ее конец и не будет пропущено
+            page = changed.order_by('updated_at', 'id')
+            if 'updated_at' in position:
+                page = page.filter(
+                    Q(updated_at__gt=position['updated_at']) |
+                    Q(updated_at=position['updated_at'],
+                      id__gt=position['id'])
+                )
+            keys = list(page.values_list('updated_at', 'id')[:limit + 1])
+            if len(keys) > limit:
+                keys = keys[:limit]
+                next_position = {'updated_at': keys[-1][0],
+                                 'id': keys[-1][1]}
+            changed_rows = map_rows(
+                list(device_values(
+                    Device.objects
+                    .filter(pk__in=[pk for _, pk in keys])
+                    .order_by('updated_at', 'id')
+                )),
+                FULL,
+            )
+
+        if next_position is None:
+            deleted = DeviceTombstone.objects \
+                .filter(deleted_at__gt=since,
+                        device_id__gt=position.get('deleted_after', 0)) \
+                .exclude(device_id__in=changed.values('pk')) \
+                .order_by('device_id') \
+                .values_list('device_id', flat=True) \
+                .distinct()
+            deleted_ids = list(deleted[:limit + 1])
+            if len(deleted_ids) > limit:
+                deleted_ids = deleted_ids[:limit]
+                next_position = {'deleted_after': deleted_ids[-1]}
+
+        data = {
+            'since': since,
+            'next': None,
+            'changed': changed_rows,
+            'deleted': deleted_ids,
+        }
+        if next_position is None:
+            data['until'] = until
+        else:
+            data['next'] = replace_query_param(
+                request.build_absolute_uri(), 'cursor',
+                encode_changes_cursor(
+                    {'since': since, 'until': until, **next_position}
+                ),
+            )
+        return Response(data)
+
+    def get_changes_limit(self):
+        value = self.request.query_params.get('limit',
+                                              self.changes_page_size)
+        try:
+            limit = int(value)
+        except ValueError:
+            raise ValidationError({'limit': 'Ожидается целое число'})
+        if not 1 <= limit <= self.changes_max_page_size:
+            raise ValidationError({
+                'limit': f'Допустимое значение: от 1 до '
+                         f'{self.changes_max_page_size}'
+            })
+        return limit
+
+    def get_since(self):
+        value = self.request.query_params.get('since')
+        if not value:
+            raise ValidationError({'since': 'Обязательный параметр'})
+        try:
+            since = parse_datetime(value)
+        except ValueError:
+            since = None
+        if since is None:
+            raise ValidationError(
+                {'since': 'Ожидается дата и время в формате ISO 8601'}
+            )
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since)
+
+        retention = timedelta(days=settings.DEVICE_TOMBSTONE_RETENTION_DAYS)
+        if since < timezone.now() - retention:
+            raise ValidationError({
+                'since': 'Отметки об удалении за этот период не сохранились, '
+                         'требуется полная синхронизация'
+            })
+        return since
+
+    def hierarchy_response(self, direction):
+        device = get_object_or_404(Device.objects.only('id'),
+                                   pk=self.kwargs[self.lookup_field])
+        try:
+            depth = int(self.request.query_params.get('depth', MAX_DEPTH))
+        except ValueError:
+            raise ValidationError({'depth': 'Ожидается целое число'})
+        if not 1 <= depth <= MAX_DEPTH:
+            raise ValidationError(
+                {'depth': f'Допустимая глубина: от 1 до {MAX_DEPTH}'}
+            )
+        return Response(build_tree(device, direction, depth))
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get('stream') == 'ndjson':
+            return self.stream_list()
+        return self.cached_response(
+            api_cache.list_key(request.build_absolute_uri()),
+            self.fast_list,
+        )
+
+    def fast_list(self):
+        """
+        Список через быструю сериализацию (fast_serializers): страница
+        выбирается через values() без создания экземпляров моделей.
+        """
+        mode = self.get_serializer_mode()
+        queryset = self.filter_queryset(
+            super(DeviceModelViewSet, self).get_queryset()
+        )
+        rows = device_values(queryset, mode)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(
+                map_rows(page, mode, queryset.db)
+            )
+        return Response(map_rows(list(rows), mode, queryset.db))
+
+    def retrieve(self, request, *args, **kwargs):
+        pk = self.kwargs[self.lookup_field]
+        if not pk.isdigit():
+            return super(DeviceModelViewSet, self).retrieve(request, *args,
+                                                            **kwargs)
+        return self.cached_response(
+            api_cache.object_key(int(pk), self.get_serializer_mode()),
+            lambda: super(DeviceModelViewSet, self).retrieve(request, *args,
+                                                             **kwargs),
+        )
+
+    def cached_response(self, key, get_response):
+        """
+        Отдает данные ответа из кэша, а при промахе строит ответ через
+        get_response и кэширует его. Если клиент прислал ETag текущей
+        версии в If-None-Match, возвращается 304 без обращения к БД.
+        """
+        entry = api_cache.get_entry(key)
+        if entry is None:
+            response = get_response()
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            entry = (api_cache.set_entry(key, response.data), response.data)
+        etag, data = entry
+
+        if_none_match = {
+            tag.removeprefix('W/')
+            for tag in parse_etags(
+                self.request.META.get('HTTP_IF_NONE_MATCH', '')
+            )
+        }
+        if etag in if_none_match or '*' in if_none_match:
+            return Response(status=status.HTTP_304_NOT_MODIFIED,
+                            headers={'ETag': etag})
+        return Response(data, headers={'ETag': etag})
+
+    def stream_list(self):
+        """
+        Отдает весь отфильтрованный реестр в формате NDJSON (одна запись
+        на строку). Записи читаются с сервера БД пакетами и сразу
+        отправляются клиенту, не накапливаясь в памяти процесса.
+        """
+        queryset = self.filter_queryset(
+            super(DeviceModelViewSet, self).get_queryset()
+        ).order_by('id')
+        response = StreamingHttpResponse(
+            self._iter_ndjson(queryset),
+            content_type='application/x-ndjson; charset=utf-8',
+        )
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    def _iter_ndjson(self, queryset):
+        for rows in iter_device_chunks(queryset,
+                                       self.get_serializer_mode(),
+                                       self.stream_chunk_size):
+            yield ''.join(
+                json.dumps(row, cls=JSONEncoder, ensure_ascii=False) + '\n'
+                for row in rows
+            ).encode('utf-8')
+
+
+class DecimalNumberAllocateView(APIView):
+    """
+    Резервирует следующий свободный децимальный номер организации.
+    Параметры: org_code - код организации, prefix - начало цифровой части.
+    """
+    permission_classes = [IsAdminUser]
+
+    def post(self, request):
+        try:
+            decimal_num = reserve_decimal_number(
+                request.data.get('org_code', ''),
+                request.data.get('prefix', ''),
+                user=request.user,
+            )
+        except NoFreeDecimalNumber as e:
+            return Response({'detail': str(e)},
+                            status=status.HTTP_409_CONFLICT)
+        except AllocationError as e:
+            return Response({'detail': str(e)},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return Response(DecimalNumberSerializer(decimal_num).data,
+                        status=status.HTTP_201_CREATED)
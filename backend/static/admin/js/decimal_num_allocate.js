@@ -0,0 +1,76 @@
+'use strict';
+
+window.addEventListener('load', (event) => {
+    const urlElement = document.getElementById('url_allocate_decimal_num');
+    const select = document.getElementById('id_decimal_num');
+    if (!urlElement || !select) {
+        return;
+    }
+    const allocateUrl = JSON.parse(urlElement.text);
+    const wrapper = select.closest('.related-widget-wrapper') || select;
+
+    // Добавление поля префикса и кнопки выделения номера
+    wrapper.insertAdjacentHTML(
+        'afterend',
+        `<div class="allocate-decimal-num" style="margin-top: 8px;">
+            <input type="text" id="allocate-query" placeholder="АБВГ.4612">
+            <a href="#" class="button" id="allocate-btn">Выделить номер</a>
+            <span class="allocate-error errornote" style="display: none;"></span>
+         </div>`
+    );
+
+    const errorElement = document.querySelector('.allocate-error');
+
+    // Событие выделения следующего свободного номера
+    document.getElementById('allocate-btn')
+        .addEventListener('click', async (event) => {
+            event.preventDefault();
+            errorElement.style.display = 'none';
+
+            const result = await allocateDecimalNum(
+                allocateUrl,
+                document.getElementById('allocate-query').value,
+            );
+            if (result.error) {
+                errorElement.textContent = result.error;
+                errorElement.style.display = 'inline-block';
+                return;
+            }
+            selectOption(select, result.id, result.text);
+        });
+});
+
+/**
+ * Резервирует на сервере следующий свободный децимальный номер
+ * @param url Эндпоинт выделения номера
+ * @param query Код организации и префикс номера, например АБВГ.4612
+ * @returns {Promise<Object>} Выделенный номер {id, text} или {error}
+ */
+async function allocateDecimalNum(url, query) {
+    const formData = new FormData();
+    formData.append('query', query);
+    const response = await fetch(url, {
+        body: formData,
+        method: 'post',
+        headers: {
+            'X-CSRFToken': document
+                .querySelector('[name=csrfmiddlewaretoken]').value,
+        },
+    });
+    return await response.json();
+}
+
+/**
+ * Добавляет номер в список выбора и выбирает его
+ * @param select Элемент выбора децимального номера
+ * @param id Идентификатор номера
+ * @param text Отображаемое значение номера
+ */
+function selectOption(select, id, text) {
+    select.append(new Option(text, id, true, true));
+    if (window.django && django.jQuery) {
+        django.jQuery(select).trigger('change');
+    } else {
+        select.dispatchEvent(new Event('change'));
+    }
+}
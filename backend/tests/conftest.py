@@ -0,0 +1,42 @@
+import pytest
+
+from django.core.cache import cache
+
+from deviceapp.models import OrgCode, DecimalNumber, DeviceType, Device
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # Кэш ответов API не должен переживать тест
+    cache.clear()
+
+
+@pytest.fixture
+def device_type():
+    return DeviceType.objects.create(name='Блок')
+
+
+@pytest.fixture
+def org_code():
+    return OrgCode.objects.create(code='АБВГ')
+
+
+@pytest.fixture
+def make_decimal_num(org_code):
+    def make(number):
+        return DecimalNumber.objects.create(org_code=org_code, number=number)
+    return make
+
+
+@pytest.fixture
+def make_devices(device_type, make_decimal_num):
+    def make(count, start=0):
+        return [
+            Device.objects.create(
+                type=device_type,
+                index=f'АА{i:03}',
+                decimal_num=make_decimal_num(f'123456.{i:03}'),
+            )
+            for i in range(start, start + count)
+        ]
+    return make
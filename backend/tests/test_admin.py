@@ -1,10 +1,14 @@
 import pytest
 
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from deviceapp.admin import (
     DeviceAdminDeviceParseForm,
     DeviceAdminDeviceParsedDataForm,
 )
+from deviceapp.models import Device, Theme
 
 
 class TestAdminIndexView:
@@ -121,3 +125,247 @@ class TestDeviceAdminDeviceParsedDataForm:
 
         form = DeviceAdminDeviceParsedDataForm(data=form_data)
         assert form.is_valid() == expected_valid
+
+
+class TestDeviceAdminImport:
+    @pytest.mark.django_db
+    def test_import_file(self, admin_client):
+        url = reverse('admin:device_import')
+        file = SimpleUploadedFile(
+            'devices.txt',
+            'Блок АА000 АБВГ.123456.789\nневерная строка\n'.encode('utf-8'),
+        )
+
+        response = admin_client.post(url, {'file': file})
+
+        assert response.status_code == 200
+        assert response.context['report'].created == 1
+        assert len(response.context['report'].errors) == 1
+        assert Device.objects.count() == 1
+
+
+class TestDeviceAdminAssignThemeAction:
+    @pytest.fixture
+    def themes(self):
+        return [Theme.objects.create(name=f'Тема {i}') for i in range(2)]
+
+    def post_action(self, client, data):
+        return client.post(reverse('admin:deviceapp_device_changelist'), {
+            'action': 'action_assign_theme',
+            'apply': '1',
+            **data,
+        })
+
+    @pytest.mark.django_db
+    def test_confirmation_page(self, admin_client, make_devices, themes):
+        devices = make_devices(3)
+        response = admin_client.post(
+            reverse('admin:deviceapp_device_changelist'),
+            {
+                'action': 'action_assign_theme',
+                '_selected_action': [device.pk for device in devices],
+            },
+        )
+        assert response.status_code == 200
+        assert response.context['device_count'] == 3
+
+    @pytest.mark.django_db
+    def test_assign_and_remove(self, admin_client, make_devices, themes,
+                               django_assert_max_num_queries):
+        devices = make_devices(5)
+        devices[0].theme.add(themes[0])
+        selected = [device.pk for device in devices[:4]]
+
+        with django_assert_max_num_queries(20):
+            self.post_action(admin_client, {
+                '_selected_action': selected,
+                'themes': [theme.pk for theme in themes],
+                'operation': 'assign',
+            })
+
+        through = Device.theme.through
+        assert through.objects.count() == 8
+        assert not devices[4].theme.exists()
+
+        self.post_action(admin_client, {
+            'select_across': '1',
+            '_selected_action': selected[:1],
+            'themes': [themes[0].pk],
+            'operation': 'remove',
+        })
+
+        assert not through.objects.filter(theme=themes[0]).exists()
+        assert through.objects.filter(theme=themes[1]).count() == 4
+
+
+class TestDeviceQuerySetThemes:
+    @pytest.mark.django_db
+    def test_add_themes_counts(self, make_devices):
+        devices = make_devices(3)
+        theme = Theme.objects.create(name='Тема')
+        devices[0].theme.add(theme)
+
+        created, existing = Device.objects.all().add_themes([theme.pk])
+
+        assert (created, existing) == (2, 1)
+        assert Device.objects.filter(theme=theme).count() == 3
+
+
+class TestDeviceAdminChangelist:
+    def count_queries(self, client, devices_count):
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(
+                reverse('admin:deviceapp_device_changelist')
+            )
+        assert response.status_code == 200
+        assert len(response.context['cl'].result_list) == devices_count
+        return len(context.captured_queries)
+
+    @pytest.mark.django_db
+    def test_constant_query_count(self, admin_client, make_devices):
+        theme = Theme.objects.create(name='Тема <b>')
+        devices = make_devices(2)
+        Device.objects.all().add_themes([theme.pk])
+        devices[1].part_of.add(devices[0])
+        small = self.count_queries(admin_client, 2)
+
+        more = make_devices(20, start=2)
+        Device.objects.all().add_themes([theme.pk])
+        for device in more:
+            device.part_of.add(devices[0])
+        large = self.count_queries(admin_client, 22)
+
+        assert small == large
+
+    @pytest.mark.django_db
+    def test_columns(self, admin_client, make_devices):
+        theme = Theme.objects.create(name='Тема <b>')
+        parent, child = make_devices(2)
+        child.theme.add(theme)
+        child.part_of.add(parent)
+
+        response = admin_client.get(
+            reverse('admin:deviceapp_device_changelist')
+        )
+        content = response.content.decode()
+
+        assert 'Тема &lt;b&gt;' in content
+        assert reverse('admin:deviceapp_theme_change',
+                       args=(theme.pk,)) in content
+        rows = {obj.pk: obj for obj in response.context['cl'].result_list}
+        assert rows[child.pk].has_parents
+        assert not rows[parent.pk].has_parents
+
+    @pytest.mark.django_db
+    def test_delete_selected(self, admin_client, make_devices):
+        devices = make_devices(3)
+        response = admin_client.post(
+            reverse('admin:deviceapp_device_changelist'),
+            {
+                'action': 'delete_selected',
+                'post': 'yes',
+                '_selected_action': [device.pk for device in devices[:2]],
+            },
+        )
+        assert response.status_code == 302
+        assert list(Device.objects.all()) == devices[2:]
+
+
+class TestDecimalNumberAdminChangelist:
+    def get_changelist(self, client):
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(
+                reverse('admin:deviceapp_decimalnumber_changelist')
+            )
+        assert response.status_code == 200
+        return response, len(context.captured_queries)
+
+    @pytest.mark.django_db
+    def test_constant_query_count(self, admin_client, make_devices,
+                                  make_decimal_num):
+        make_devices(2)
+        make_decimal_num('654321.000')
+        _, small = self.get_changelist(admin_client)
+
+        make_devices(20, start=2)
+        for i in range(1, 10):
+            make_decimal_num(f'654321.{i:03}')
+        _, large = self.get_changelist(admin_client)
+
+        assert small == large
+
+    @pytest.mark.django_db
+    def test_unused_number(self, admin_client, make_devices,
+                           make_decimal_num):
+        device, = make_devices(1)
+        free_num = make_decimal_num('654321.000')
+
+        response, _ = self.get_changelist(admin_client)
+        content = response.content.decode()
+        assert reverse('admin:deviceapp_device_change',
+                       args=(device.pk,)) in content
+
+        response = admin_client.get(
+            reverse('admin:deviceapp_decimalnumber_change',
+                    args=(free_num.pk,))
+        )
+        assert response.status_code == 200
+
+
+class TestDeviceAdminChangeForm:
+    def get_change_form(self, client, device):
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(
+                reverse('admin:deviceapp_device_change', args=(device.pk,))
+            )
+        assert response.status_code == 200
+        return response, len(context.captured_queries)
+
+    @pytest.mark.django_db
+    def test_independent_of_registry_size(self, admin_client, make_devices,
+                                          make_decimal_num):
+        device, = make_devices(1)
+        response, small = self.get_change_form(admin_client, device)
+        small_size = len(response.content)
+
+        make_devices(30, start=1)
+        for i in range(30):
+            make_decimal_num(f'654321.{i:03}')
+        response, large = self.get_change_form(admin_client, device)
+
+        assert small == large
+        assert len(response.content) == small_size
+
+    @pytest.mark.django_db
+    def test_decimal_num_autocomplete(self, admin_client, make_devices,
+                                      make_decimal_num):
+        make_devices(2)
+        free = [make_decimal_num(f'4612{i:02}.001') for i in range(3)]
+        make_decimal_num('461300.001')
+
+        response = admin_client.get(reverse('admin:autocomplete'), {
+            'app_label': 'deviceapp',
+            'model_name': 'device',
+            'field_name': 'decimal_num',
+            'term': 'АБВГ.4612',
+        })
+
+        assert response.status_code == 200
+        assert [row['id'] for row in response.json()['results']] == \
+               [str(num.pk) for num in free]
+
+    @pytest.mark.django_db
+    def test_part_of_autocomplete(self, admin_client, make_devices):
+        make_devices(12)
+
+        response = admin_client.get(reverse('admin:autocomplete'), {
+            'app_label': 'deviceapp',
+            'model_name': 'device',
+            'field_name': 'part_of',
+            'term': 'АА01',
+        })
+
+        assert [row['text'] for row in response.json()['results']] == [
+            'Блок АА010 АБВГ.123456.010',
+            'Блок АА011 АБВГ.123456.011',
+        ]
@@ -0,0 +1,173 @@
+from datetime import timedelta
+
+import pytest
+
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from deviceapp.allocator import (
+    AllocationError,
+    NoFreeDecimalNumber,
+    reserve_decimal_number,
+)
+from deviceapp.models import Device, DecimalNumber
+
+
+@pytest.fixture
+def pool(make_decimal_num):
+    return [
+        make_decimal_num(number) for number in [
+            '461200.003',
+            '461200.001',
+            '461300.001',
+            '461200.002',
+        ]
+    ]
+
+
+class TestReserveDecimalNumber:
+    @pytest.mark.django_db
+    def test_reserve_next_free(self, pool, org_code):
+        pool[1].is_used = True
+        pool[1].save()
+
+        first = reserve_decimal_number('АБВГ', '4612')
+        second = reserve_decimal_number(org_code, '4612')
+
+        assert first.number == '461200.002'
+        assert second.number == '461200.003'
+        assert first.is_used and second.is_used
+
+    @pytest.mark.django_db
+    def test_no_free_number(self, pool):
+        reserve_decimal_number('АБВГ', '4613')
+        with pytest.raises(NoFreeDecimalNumber):
+            reserve_decimal_number('АБВГ', '4613')
+
+    @pytest.mark.django_db
+    @pytest.mark.parametrize('code, prefix', [
+        ('ДЕЖЗ', ''),
+        ('АБВГ', '46%'),
+    ])
+    def test_invalid_query(self, pool, code, prefix):
+        with pytest.raises(AllocationError):
+            reserve_decimal_number(code, prefix)
+
+    @pytest.mark.django_db
+    def test_reservation_owner(self, pool, admin_user):
+        decimal_num = reserve_decimal_number('АБВГ', '4612', user=admin_user)
+        assert decimal_num.reserved_by == admin_user
+        assert decimal_num.reserved_at is not None
+
+    @pytest.mark.django_db
+    def test_stale_reservation_released(self, pool, admin_user, settings):
+        settings.DECIMAL_NUMBER_RESERVATION_TTL = 60
+        first = reserve_decimal_number('АБВГ', '4613', user=admin_user)
+        with pytest.raises(NoFreeDecimalNumber):
+            reserve_decimal_number('АБВГ', '4613')
+
+        DecimalNumber.objects.filter(pk=first.pk).update(
+            reserved_at=timezone.now() - timedelta(seconds=61)
+        )
+        second = reserve_decimal_number('АБВГ', '4613')
+        assert second.pk == first.pk
+        assert second.reserved_by is None
+
+    @pytest.mark.django_db
+    def test_release_command(self, pool, admin_user, device_type):
+        stale = reserve_decimal_number('АБВГ', '4612', user=admin_user)
+        assigned = reserve_decimal_number('АБВГ', '4612', user=admin_user)
+        fresh = reserve_decimal_number('АБВГ', '4612', user=admin_user)
+        DecimalNumber.objects.filter(pk__in=[stale.pk, assigned.pk]).update(
+            reserved_at=timezone.now() - timedelta(days=1)
+        )
+        # Привязка в обход Device.save, который снимает резерв
+        device = Device.objects.create(type=device_type, index='АА001')
+        Device.objects.filter(pk=device.pk).update(decimal_num=assigned)
+
+        call_command('release_decimal_numbers', '--ttl', '3600')
+
+        assert not DecimalNumber.objects.get(pk=stale.pk).is_used
+        assert DecimalNumber.objects.get(pk=assigned.pk).is_used
+        assert DecimalNumber.objects.get(pk=fresh.pk).is_used
+
+    @pytest.mark.django_db
+    def test_reserved_number_can_be_assigned(self, pool, device_type,
+                                             admin_client, admin_user):
+        decimal_num = reserve_decimal_number('АБВГ', '4612', user=admin_user)
+        response = admin_client.post(
+            reverse('admin:deviceapp_device_add'),
+            {
+                'type': device_type.pk,
+                'index': 'АА001',
+                'decimal_num': decimal_num.pk,
+            },
+        )
+        assert response.status_code == 302
+        assert Device.objects.get().decimal_num == decimal_num
+
+        decimal_num.refresh_from_db()
+        assert decimal_num.is_used
+        assert decimal_num.reserved_by is None
+        assert decimal_num.reserved_at is None
+
+    @pytest.mark.django_db
+    def test_foreign_reservation_not_offered(self, pool, device_type,
+                                             admin_client,
+                                             django_user_model):
+        other = django_user_model.objects.create_user('other')
+        decimal_num = reserve_decimal_number('АБВГ', '4612', user=other)
+
+        response = admin_client.get(reverse('admin:deviceapp_device_add'))
+        queryset = response.context['adminform'].form \
+            .fields['decimal_num'].queryset
+        assert decimal_num not in queryset
+        assert pool[0] in queryset
+
+        response = admin_client.post(
+            reverse('admin:deviceapp_device_add'),
+            {
+                'type': device_type.pk,
+                'index': 'АА001',
+                'decimal_num': decimal_num.pk,
+            },
+        )
+        assert response.status_code == 200
+        assert not Device.objects.exists()
+
+
+class TestAllocateEndpoints:
+    @pytest.mark.django_db
+    def test_admin_allocate(self, admin_client, pool):
+        url = reverse('admin:device_allocate_decimal_num')
+
+        response = admin_client.post(url, {'query': 'АБВГ.4613'})
+        assert response.status_code == 200
+        assert response.json() == {
+            'id': pool[2].pk,
+            'text': 'АБВГ.461300.001',
+        }
+
+        response = admin_client.post(url, {'query': 'АБВГ.4613'})
+        assert response.status_code == 409
+
+        response = admin_client.post(url, {'query': 'АБВГ.46%'})
+        assert response.status_code == 400
+
+    @pytest.mark.django_db
+    def test_admin_allocate_get_not_allowed(self, admin_client):
+        url = reverse('admin:device_allocate_decimal_num')
+        assert admin_client.get(url).status_code == 405
+
+    @pytest.mark.django_db
+    def test_api_allocate(self, admin_client, client, pool):
+        url = reverse('decimal-number-allocate')
+
+        assert client.post(url, {'org_code': 'АБВГ'}).status_code == 403
+
+        response = admin_client.post(url, {'org_code': 'АБВГ',
+                                           'prefix': '4612'})
+        assert response.status_code == 201
+        assert response.json()['number'] == '461200.001'
+        assert DecimalNumber.objects.get(pk=pool[1].pk).is_used
@@ -0,0 +1,114 @@
+from io import StringIO
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from django.core.management import call_command
+from django.urls import reverse
+
+from deviceapp.models import Device, DeviceType, Theme
+
+
+@pytest.fixture
+def registry(make_devices):
+    devices = make_devices(5)
+    theme = Theme.objects.create(name='Тема 1')
+    devices[0].theme.add(theme)
+    devices[1].part_of.add(devices[0])
+    return devices
+
+
+def cursor_of(url):
+    return parse_qs(urlparse(url).query)['cursor'][0]
+
+
+@pytest.mark.django_db
+class TestAsyncDeviceViews:
+
+    @pytest.mark.parametrize('simple', ['0', '1'])
+    def test_detail_matches_sync(self, client, registry, simple):
+        for device in registry[:2]:
+            response = client.get(
+                reverse('async-device-detail', args=[device.pk]),
+                {'simple': simple},
+            )
+            assert response.status_code == 200
+            expected = client.get(
+                reverse('device-detail', args=[device.pk]),
+                {'simple': simple, 'format': 'json'},
+            )
+            assert response.content == expected.content
+
+    def test_list_pages(self, client, registry):
+        url = reverse('async-device-list')
+        results = []
+        response = client.get(url, {'page_size': 2})
+        while True:
+            data = response.json()
+            results.extend(data['results'])
+            if data['next'] is None:
+                break
+            response = client.get(data['next'])
+        assert [row['id'] for row in results] == \
+               [device.pk for device in registry]
+        assert results[0]['theme'] == [{'id': registry[0].theme.get().pk,
+                                        'name': 'Тема 1'}]
+        assert results[1]['part_of'] == [registry[0].pk]
+
+    def test_list_filters(self, client, registry):
+        other_type = DeviceType.objects.create(name='Стойка')
+        device = Device.objects.create(type=other_type, index='ВВ001')
+        url = reverse('async-device-list')
+
+        data = client.get(url, {'type': other_type.pk}).json()
+        assert [row['id'] for row in data['results']] == [device.pk]
+
+        data = client.get(url, {'search': 'ВВ001'}).json()
+        assert [row['id'] for row in data['results']] == [device.pk]
+
+    def test_sync_cursor_accepted(self, client, registry):
+        # Курсор из ссылки next синхронного API продолжает асинхронный
+        # список с той же записи
+        cursor = cursor_of(client.get(reverse('device-list'),
+                                      {'page_size': 2}).json()['next'])
+
+        data = client.get(reverse('async-device-list'),
+                          {'page_size': 2, 'cursor': cursor}).json()
+        assert [row['id'] for row in data['results']] == \
+               [device.pk for device in registry[2:4]]
+        assert cursor_of(data['next'])
+
+    def test_bad_params(self, client, registry):
+        url = reverse('async-device-list')
+        assert client.get(url, {'cursor': 'x'}).status_code == 404
+        assert client.get(url, {'type': 'x'}).status_code == 400
+
+        # Ссылка previous синхронного API - курсор обратного направления
+        sync_url = reverse('device-list')
+        second_page = client.get(sync_url, {'page_size': 2}).json()['next']
+        previous = client.get(second_page).json()['previous']
+        assert client.get(url, {'cursor': cursor_of(previous)}) \
+            .status_code == 400
+
+    def test_not_found_and_method(self, client, registry):
+        response = client.get(reverse('async-device-detail', args=[0]))
+        assert response.status_code == 404
+        response = client.post(reverse('async-device-list'))
+        assert response.status_code == 405
+
+
+@pytest.mark.django_db(transaction=True)
+def test_loadtest_command(live_server, make_devices):
+    make_devices(2)
+    out = StringIO()
+    call_command(
+        'loadtest_api',
+        live_server.url + reverse('device-list'),
+        live_server.url + reverse('async-device-list'),
+        concurrency=2,
+        requests=4,
+        stdout=out,
+    )
+    output = out.getvalue()
+    assert output.count('запросов: 4') == 2
+    assert 'ошибок' not in output
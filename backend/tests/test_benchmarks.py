@@ -0,0 +1,150 @@
+import itertools
+import os
+
+import pytest
+
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from deviceapp.models import Device, DeviceType, Theme
+from deviceapp.synthetic import clear_registry, generate_registry
+
+# Замеры на синтетическом реестре (pytest-benchmark):
+#   pytest tests/test_benchmarks.py --benchmark-autosave
+#   pytest tests/test_benchmarks.py --benchmark-compare \
+#       --benchmark-compare-fail=mean:20%
+# Размеры реестра задаются через BENCHMARK_REGISTRY_SIZES. Реестры от
+# LARGE_REGISTRY изделий отмечены маркером large и в обычный прогон не
+# входят:
+#   pytest tests/test_benchmarks.py -m large
+# Число SQL-запросов сохраняется в extra_info и не должно зависеть от
+# размера
+
+LARGE_REGISTRY = 100000
+
+SIZES = [
+    pytest.param(size, marks=pytest.mark.large)
+    if size >= LARGE_REGISTRY else size
+    for size in map(int, os.getenv('BENCHMARK_REGISTRY_SIZES',
+                                   '1000,10000,100000').split(','))
+]
+
+ROUNDS = int(os.getenv('BENCHMARK_ROUNDS', 10))
+
+
+@pytest.fixture(scope='module', params=SIZES,
+                ids=lambda size: f'{size // 1000}k')
+def registry(request, django_db_setup, django_db_blocker):
+    with django_db_blocker.unblock():
+        clear_registry()
+        generate_registry(devices=request.param)
+    yield request.param
+    with django_db_blocker.unblock():
+        clear_registry()
+
+
+def run_benchmark(benchmark, func, setup=cache.clear, max_queries=None):
+    """
+    Замеряет func без кэша ответов API (setup перед каждым прогоном).
+    Число запросов считается на отдельном прогоне.
+    """
+    setup()
+    with CaptureQueriesContext(connection) as context:
+        func()
+    queries = len(context.captured_queries)
+    benchmark.extra_info['queries'] = queries
+    if max_queries is not None:
+        assert queries <= max_queries
+    benchmark.pedantic(func, setup=setup, rounds=ROUNDS, iterations=1)
+
+
+def get_ok(client, url, params=None):
+    response = client.get(url, params or {})
+    assert response.status_code == 200
+    return response
+
+
+@pytest.mark.django_db
+class TestApiBenchmarks:
+
+    @pytest.mark.parametrize('params', [
+        {},
+        {'simple': '1'},
+        {'search': 'АА001'},
+        {'search': 'АААБ.1000'},
+    ], ids=['list', 'simple', 'search', 'decimal-prefix'])
+    def test_device_list(self, benchmark, registry, client, params):
+        url = reverse('device-list')
+        params = {'format': 'json', **params}
+        run_benchmark(benchmark, lambda: get_ok(client, url, params),
+                      max_queries=5)
+
+
+@pytest.mark.django_db
+class TestAdminBenchmarks:
+
+    @pytest.mark.parametrize('url_name, params', [
+        ('admin:deviceapp_device_changelist', {}),
+        ('admin:deviceapp_device_changelist', {'q': 'АА001'}),
+        ('admin:deviceapp_decimalnumber_changelist', {}),
+        ('admin:deviceapp_decimalnumber_changelist', {'is_used__exact': 0}),
+    ], ids=['devices', 'devices-search', 'numbers', 'free-numbers'])
+    def test_changelist(self, benchmark, registry, admin_client, url_name,
+                        params):
+        url = reverse(url_name)
+        run_benchmark(benchmark,
+                      lambda: get_ok(admin_client, url, params),
+                      max_queries=12)
+
+    def test_parse_and_save(self, benchmark, registry, admin_client):
+        numbers = itertools.count()
+
+        def parse_and_save():
+            n = next(numbers)
+            number = f'{999000 + n // 1000:06}.{n % 1000:03}'
+            get_ok(admin_client, reverse('admin:device_parse'))
+            response = admin_client.post(reverse('admin:device_parse'), {
+                'input': f'Блок ЯЯ{n:03} АААА.{number}',
+            })
+            assert response.status_code == 200
+            response = admin_client.post(
+                reverse('admin:device_save_parsed_data'),
+                {'name': 'Блок', 'index': f'ЯЯ{n:03}', 'code': 'АААА',
+                 'number': number},
+            )
+            assert 'redirect_url' in response.context
+
+        run_benchmark(benchmark, parse_and_save, max_queries=30)
+        assert Device.objects.filter(index__startswith='ЯЯ').count() == \
+               ROUNDS + 1
+
+    def test_assign_themes(self, benchmark, registry, admin_client):
+        # Тема присваивается всем изделиям одного типа (выбор по фильтру)
+        theme = Theme.objects.create(name='Тема замера')
+        device_type = DeviceType.objects.get(name='Блок')
+        url = reverse('admin:deviceapp_device_changelist') + \
+            f'?type__id__exact={device_type.pk}'
+
+        def reset():
+            cache.clear()
+            Device.theme.through.objects.filter(theme=theme).delete()
+
+        def assign():
+            response = admin_client.post(url, {
+                'action': 'action_assign_theme',
+                'apply': '1',
+                'select_across': '1',
+                '_selected_action': [0],
+                'themes': [theme.pk],
+                'operation': 'assign',
+            })
+            assert response.status_code == 302
+
+        # add_themes пишет связи пакетами: число запросов растет на один
+        # на каждые 5000 изделий
+        run_benchmark(benchmark, assign, setup=reset,
+                      max_queries=20 + registry // 5000)
+        assert Device.theme.through.objects.filter(theme=theme).count() == \
+               Device.objects.filter(type=device_type).count()
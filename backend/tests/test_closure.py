@@ -0,0 +1,132 @@
+import pytest
+
+from django.core.management import call_command
+from django.urls import reverse
+
+from deviceapp.models import Device, DeviceClosure
+
+
+def closure():
+    return set(DeviceClosure.objects.values_list('ancestor_id',
+                                                 'descendant_id',
+                                                 'depth'))
+
+
+@pytest.fixture
+def chain(make_devices):
+    # top <- middle <- bottom
+    top, middle, bottom, other = make_devices(4)
+    middle.part_of.add(top)
+    bottom.part_of.add(middle)
+    return top, middle, bottom, other
+
+
+class TestDeviceClosure:
+    @pytest.mark.django_db
+    def test_add(self, chain):
+        top, middle, bottom, _ = chain
+        assert closure() == {
+            (top.pk, middle.pk, 1),
+            (middle.pk, bottom.pk, 1),
+            (top.pk, bottom.pk, 2),
+        }
+
+    @pytest.mark.django_db
+    def test_reverse_add_and_remove(self, chain):
+        top, middle, bottom, other = chain
+
+        other.device_set.add(top)
+        assert (other.pk, bottom.pk, 3) in closure()
+
+        middle.part_of.remove(top)
+        assert closure() == {
+            (other.pk, top.pk, 1),
+            (middle.pk, bottom.pk, 1),
+        }
+
+    @pytest.mark.django_db
+    def test_clear(self, chain):
+        top, middle, bottom, _ = chain
+
+        top.device_set.clear()
+        assert closure() == {(middle.pk, bottom.pk, 1)}
+
+        bottom.part_of.clear()
+        assert closure() == set()
+
+    @pytest.mark.django_db
+    def test_shortest_depth_and_cycle(self, chain):
+        top, middle, bottom, _ = chain
+
+        bottom.part_of.add(top)
+        top.part_of.add(bottom)
+
+        assert (top.pk, bottom.pk, 1) in closure()
+        assert (bottom.pk, top.pk, 1) in closure()
+        assert not DeviceClosure.objects.filter(
+            ancestor_id=top.pk, descendant_id=top.pk
+        ).exists()
+
+    @pytest.mark.django_db
+    @pytest.mark.parametrize('bulk', [False, True])
+    def test_delete(self, chain, bulk):
+        top, middle, bottom, _ = chain
+
+        if bulk:
+            Device.objects.filter(pk=middle.pk).delete()
+        else:
+            middle.delete()
+
+        assert closure() == set()
+
+    @pytest.mark.django_db
+    def test_rebuild_command(self, chain):
+        expected = closure()
+        DeviceClosure.objects.all().delete()
+
+        call_command('rebuild_device_closure')
+
+        assert closure() == expected
+
+    @pytest.mark.django_db
+    def test_disabled(self, make_devices, settings):
+        settings.DEVICE_CLOSURE_ENABLED = False
+        top, bottom = make_devices(2)
+        bottom.part_of.add(top)
+        assert closure() == set()
+
+
+class TestHierarchyFilters:
+    def get_indexes(self, client, params):
+        response = client.get(reverse('device-list'), params)
+        assert response.status_code == 200
+        return [row['index'] for row in response.json()['results']]
+
+    @pytest.mark.django_db
+    @pytest.mark.parametrize('enabled', [True, False])
+    def test_api(self, client, settings, chain, enabled):
+        settings.DEVICE_CLOSURE_ENABLED = enabled
+        top, middle, bottom, _ = chain
+
+        assert self.get_indexes(client, {'ancestor': top.pk}) == \
+               [middle.index, bottom.index]
+        assert self.get_indexes(client, {'descendant': bottom.pk}) == \
+               [top.index, middle.index]
+
+    @pytest.mark.django_db
+    def test_api_invalid(self, client):
+        response = client.get(reverse('device-list'), {'ancestor': 'x'})
+        assert response.status_code == 400
+
+    @pytest.mark.django_db
+    def test_admin_list_filter(self, admin_client, chain):
+        top, middle, bottom, _ = chain
+
+        response = admin_client.get(
+            reverse('admin:deviceapp_device_changelist'),
+            {'assembly': top.pk},
+        )
+
+        assert response.status_code == 200
+        assert {obj.pk for obj in response.context['cl'].result_list} == \
+               {middle.pk, bottom.pk}
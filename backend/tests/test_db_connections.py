@@ -0,0 +1,72 @@
+from io import StringIO
+
+import pytest
+
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
+
+from deviceapp.db import chunked_iterator
+from deviceapp.export import iter_csv
+from deviceapp.models import Device
+
+
+@pytest.fixture
+def pooler(monkeypatch):
+    # Режим пула транзакций: серверные курсоры отключены
+    monkeypatch.setitem(connection.settings_dict,
+                        'DISABLE_SERVER_SIDE_CURSORS', True)
+
+
+@pytest.mark.django_db
+class TestChunkedIterator:
+
+    @pytest.mark.parametrize('ordering', [(), ('-id',), ('index', '-id')])
+    def test_same_rows(self, pooler, make_devices, ordering):
+        make_devices(7)
+        queryset = Device.objects \
+            .order_by(*ordering) \
+            .values_list('id', 'index')
+        expected = list(queryset)
+        rows = list(chunked_iterator(queryset, chunk_size=3))
+        if not ordering:
+            rows.sort()
+        assert rows == expected
+
+    def test_keyset_queries(self, pooler, make_devices,
+                            django_assert_num_queries):
+        make_devices(7)
+        # 3 пакета ключей, 3 пакета записей и пустой пакет ключей
+        with django_assert_num_queries(7):
+            devices = list(chunked_iterator(Device.objects.order_by('pk'),
+                                            chunk_size=3))
+        assert [device.pk for device in devices] == \
+               sorted(Device.objects.values_list('pk', flat=True))
+
+    def test_server_side_cursors(self, make_devices,
+                                 django_assert_num_queries):
+        make_devices(7)
+        with django_assert_num_queries(1):
+            assert len(list(chunked_iterator(Device.objects.all(),
+                                             chunk_size=3))) == 7
+
+    def test_pooler_export_and_refresh(self, pooler, make_devices):
+        devices = make_devices(5)
+        content = b''.join(iter_csv(Device.objects.order_by('-id'),
+                                    chunk_size=2)).decode('utf-8')
+        assert content.count('\n') == 6
+        Device.objects.update(full_designation=F('index'))
+        assert Device.objects.refresh_full_designation(batch_size=2) == 5
+        devices[0].refresh_from_db()
+        assert devices[0].full_designation == \
+               devices[0].get_full_designation()
+
+
+@pytest.mark.django_db
+def test_benchmark_command(make_devices):
+    make_devices(2)
+    out = StringIO()
+    call_command('benchmark_db_connections', requests=3, stdout=out)
+    output = out.getvalue()
+    assert output.count('3 запросов') == 3
+    assert 'ошибкой' not in output
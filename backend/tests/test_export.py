@@ -0,0 +1,139 @@
+import csv
+import io
+import json
+import zipfile
+
+import openpyxl
+import pytest
+
+from django.urls import reverse
+
+from deviceapp.export import COLUMNS
+from deviceapp.models import Device, DeviceType, Theme
+
+
+@pytest.fixture
+def registry(make_devices, device_type):
+    devices = make_devices(5)
+    theme = Theme.objects.create(name='Тема')
+    devices[0].theme.add(theme)
+    devices[1].part_of.add(devices[0])
+    Device.objects.create(type=DeviceType.objects.create(name='Ячейка'),
+                          index='ББ000')
+    return devices
+
+
+def content(response):
+    assert response.streaming
+    return b''.join(response.streaming_content)
+
+
+def read_csv(response):
+    text = content(response).decode('utf-8-sig')
+    return list(csv.reader(io.StringIO(text), delimiter=';'))
+
+
+def export_url(file_format):
+    return reverse('device-export', args=[file_format])
+
+
+class TestDeviceExportApi:
+    @pytest.mark.django_db
+    def test_csv(self, client, registry):
+        response = client.get(export_url('csv'))
+        assert response['Content-Type'].startswith('text/csv')
+        assert 'attachment' in response['Content-Disposition']
+
+        rows = read_csv(response)
+        assert tuple(rows[0]) == COLUMNS
+        assert len(rows) == 7
+        assert rows[1][1:7] == [
+            'Блок', 'АА000', 'АБВГ.123456.000', 'Блок АА000 АБВГ.123456.000',
+            'Тема', '',
+        ]
+        assert rows[2][6] == 'Блок АА000 АБВГ.123456.000'
+        assert rows[6][1:5] == ['Ячейка', 'ББ000', '', 'Ячейка ББ000']
+
+    @pytest.mark.django_db
+    @pytest.mark.parametrize('params, expected', [
+        ({'search': 'АА003'}, ['АА003']),
+        ({'theme': 'THEME'}, ['АА000']),
+        ({'ancestor': 'ROOT'}, ['АА001']),
+    ])
+    def test_filters(self, client, registry, params, expected):
+        values = {'THEME': str(Theme.objects.get().pk),
+                  'ROOT': str(registry[0].pk)}
+        params = {key: values.get(value, value)
+                  for key, value in params.items()}
+        rows = read_csv(client.get(export_url('csv'), params))
+        assert [row[2] for row in rows[1:]] == expected
+
+    @pytest.mark.django_db
+    def test_type_filter(self, client, registry):
+        device_type = DeviceType.objects.get(name='Ячейка')
+        rows = read_csv(client.get(export_url('csv'),
+                                   {'type': device_type.pk}))
+        assert [row[2] for row in rows[1:]] == ['ББ000']
+
+    @pytest.mark.django_db
+    def test_jsonl_matches_api(self, client, registry):
+        response = client.get(export_url('jsonl'))
+        rows = [json.loads(line)
+                for line in content(response).decode().splitlines()]
+        expected = client.get(reverse('device-list')).json()['results']
+        assert rows == expected
+
+    @pytest.mark.django_db
+    def test_xlsx(self, client, registry):
+        response = client.get(export_url('xlsx'), {'search': 'АА00'})
+        archive = zipfile.ZipFile(io.BytesIO(content(response)))
+        assert archive.testzip() is None
+        sheet = archive.read('xl/worksheets/sheet1.xml').decode()
+        assert sheet.count('<row>') == 6
+        assert 'Блок АА004 АБВГ.123456.004' in sheet
+
+    @pytest.mark.django_db
+    def test_xlsx_readable(self, client, registry):
+        response = client.get(export_url('xlsx'))
+        sheet = openpyxl.load_workbook(io.BytesIO(content(response))).active
+        rows = list(sheet.values)
+        assert rows[0] == COLUMNS
+        assert rows[1][:3] == (registry[0].pk, 'Блок', 'АА000')
+
+    @pytest.mark.django_db
+    def test_unknown_format(self, client):
+        response = client.get(reverse('device-list') + 'export/pdf/')
+        assert response.status_code == 404
+
+
+class TestDeviceExportAction:
+    @pytest.mark.django_db
+    @pytest.mark.parametrize('action', ['action_export_csv',
+                                        'action_export_jsonl',
+                                        'action_export_xlsx'])
+    def test_selected(self, admin_client, registry, action):
+        response = admin_client.post(
+            reverse('admin:deviceapp_device_changelist'),
+            {
+                'action': action,
+                '_selected_action': [device.pk for device in registry[:2]],
+            },
+        )
+        assert response.status_code == 200
+        assert response.streaming
+        assert len(content(response)) > 0
+
+    @pytest.mark.django_db
+    def test_select_across_respects_filters(self, admin_client, registry):
+        theme = Theme.objects.get()
+        url = reverse('admin:deviceapp_device_changelist')
+        response = admin_client.post(
+            f'{url}?theme__id__exact={theme.pk}',
+            {
+                'action': 'action_export_csv',
+                'select_across': '1',
+                '_selected_action': [registry[4].pk],
+            },
+        )
+        rows = read_csv(response)
+        assert [row[2] for row in rows[1:]] == ['АА000']
@@ -0,0 +1,84 @@
+from io import StringIO
+
+import pytest
+
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+
+from deviceapp.fast_serializers import (
+    FULL,
+    SIMPLE,
+    iter_device_chunks,
+)
+from deviceapp.models import Device, Theme
+from deviceapp.serializers import (
+    DeviceSerializer,
+    SimpleDeviceSerializer,
+    apply_eager_loading,
+)
+
+SERIALIZERS = {
+    FULL: DeviceSerializer,
+    SIMPLE: SimpleDeviceSerializer,
+}
+
+
+@pytest.fixture
+def registry(make_devices, device_type):
+    devices = make_devices(6)
+    Device.objects.create(type=device_type)
+    Device.objects.create(type=device_type, index='ББ000')
+    first, second = (Theme.objects.create(name=name)
+                     for name in ('Тема 2', 'Тема 1'))
+    devices[0].theme.add(second, first)
+    devices[1].theme.add(first)
+    devices[2].part_of.add(devices[1], devices[0])
+    devices[3].part_of.add(devices[2])
+    return devices
+
+
+def render(data):
+    return JSONRenderer().render(data)
+
+
+class TestFastSerialization:
+    @pytest.mark.django_db
+    @pytest.mark.parametrize('mode', [FULL, SIMPLE])
+    @pytest.mark.parametrize('chunk_size', [3, 100])
+    def test_identical_json(self, registry, mode, chunk_size):
+        queryset = Device.objects.order_by('id')
+        expected = SERIALIZERS[mode](
+            apply_eager_loading(queryset, SERIALIZERS[mode]), many=True,
+        ).data
+
+        rows = [row for chunk in iter_device_chunks(queryset, mode,
+                                                    chunk_size)
+                for row in chunk]
+        assert render(rows) == render(expected)
+
+    @pytest.mark.django_db
+    @pytest.mark.parametrize('simple', ['0', '1'])
+    def test_list_matches_retrieve(self, client, registry, simple):
+        response = client.get(reverse('device-list'), {'simple': simple})
+        rows = response.json()['results']
+        assert len(rows) == 8
+        for device, row in zip(Device.objects.order_by('id'), rows):
+            detail = client.get(reverse('device-detail', args=[device.pk]),
+                                {'simple': simple})
+            assert detail.content == render(row)
+
+    @pytest.mark.django_db
+    def test_chunk_query_count(self, registry, django_assert_num_queries):
+        # Строки пакета + темы + part_of
+        with django_assert_num_queries(3):
+            list(iter_device_chunks(Device.objects.all(), FULL, 100))
+
+    @pytest.mark.django_db
+    def test_benchmark_command(self, registry):
+        out = StringIO()
+        call_command('benchmark_serialization', limit=5, chunk_size=2,
+                     stdout=out)
+        output = out.getvalue()
+        assert '[full] JSON совпадает побайтно' in output
+        assert '[simple] JSON совпадает побайтно' in output
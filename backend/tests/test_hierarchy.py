@@ -0,0 +1,152 @@
+import pytest
+
+from django.urls import reverse
+
+from deviceapp.hierarchy import COMPONENTS, WHERE_USED, build_tree
+
+
+@pytest.fixture
+def assembly(make_devices):
+    # complex <- block1 <- cell1, cell2; complex <- block2 <- cell2
+    complex_, block1, block2, cell1, cell2 = make_devices(5)
+    block1.part_of.add(complex_)
+    block2.part_of.add(complex_)
+    cell1.part_of.add(block1)
+    cell2.part_of.add(block1, block2)
+    return complex_, block1, block2, cell1, cell2
+
+
+def ids(node, direction):
+    return [child['id'] for child in node.get(direction, [])]
+
+
+class TestBuildTree:
+    @pytest.mark.django_db
+    def test_components(self, assembly):
+        complex_, block1, block2, cell1, cell2 = assembly
+
+        tree = build_tree(complex_, COMPONENTS)
+
+        assert tree['designation'] == 'Блок АА000 АБВГ.123456.000'
+        assert ids(tree, COMPONENTS) == [block1.pk, block2.pk]
+        assert ids(tree[COMPONENTS][0], COMPONENTS) == [cell1.pk, cell2.pk]
+        assert ids(tree[COMPONENTS][1], COMPONENTS) == [cell2.pk]
+
+    @pytest.mark.django_db
+    def test_where_used(self, assembly):
+        complex_, block1, block2, cell1, cell2 = assembly
+
+        tree = build_tree(cell2, WHERE_USED)
+
+        assert ids(tree, WHERE_USED) == [block1.pk, block2.pk]
+        assert ids(tree[WHERE_USED][0], WHERE_USED) == [complex_.pk]
+
+    @pytest.mark.django_db
+    def test_depth_limit(self, assembly):
+        complex_, block1, *_ = assembly
+
+        tree = build_tree(complex_, COMPONENTS, max_depth=1)
+
+        assert tree[COMPONENTS][0] == {
+            'id': block1.pk,
+            'designation': block1.full_designation,
+            'truncated': True,
+        }
+
+    @pytest.mark.django_db
+    def test_cycle(self, assembly):
+        complex_, block1, *_ = assembly
+        complex_.part_of.add(block1)
+
+        tree = build_tree(complex_, COMPONENTS)
+
+        block_node = tree[COMPONENTS][0]
+        assert block_node[COMPONENTS][0] == {
+            'id': complex_.pk,
+            'designation': complex_.full_designation,
+            'cycle': True,
+        }
+
+    @pytest.mark.django_db
+    def test_shared_component_expanded_once(self, assembly):
+        complex_, block1, block2, cell1, cell2 = assembly
+
+        tree = build_tree(complex_, COMPONENTS)
+
+        assert tree[COMPONENTS][0][COMPONENTS][1] == {
+            'id': cell2.pk,
+            'designation': cell2.full_designation,
+            COMPONENTS: [],
+        }
+        assert tree[COMPONENTS][1][COMPONENTS] == [{
+            'id': cell2.pk,
+            'designation': cell2.full_designation,
+            'repeated': True,
+        }]
+
+    @pytest.mark.django_db
+    def test_shared_component_at_nearest_level(self, assembly):
+        complex_, block1, block2, cell1, cell2 = assembly
+        # cell1 входит и в block1, и непосредственно в complex
+        cell1.part_of.add(complex_)
+
+        tree = build_tree(complex_, COMPONENTS)
+
+        assert ids(tree, COMPONENTS) == [block1.pk, block2.pk, cell1.pk]
+        assert tree[COMPONENTS][0][COMPONENTS][0].get('repeated')
+        assert COMPONENTS in tree[COMPONENTS][2]
+
+    @pytest.mark.django_db
+    def test_diamond_chain_size(self, make_devices):
+        # Цепочка ромбов: число путей растет как 2^n, размер дерева -
+        # линейно
+        devices = make_devices(31)
+        top, levels = devices[0], devices[1:]
+        parents = [top]
+        for start in range(0, len(levels), 2):
+            pair = levels[start:start + 2]
+            for device in pair:
+                device.part_of.add(*parents)
+            parents = pair
+
+        def count(node):
+            return 1 + sum(count(child)
+                           for child in node.get(COMPONENTS, []))
+
+        assert count(build_tree(top, COMPONENTS)) == 1 + 2 * 29
+
+    @pytest.mark.django_db
+    def test_query_count(self, assembly, django_assert_max_num_queries):
+        with django_assert_max_num_queries(6):
+            build_tree(assembly[0], COMPONENTS)
+
+
+class TestHierarchyEndpoints:
+    @pytest.mark.django_db
+    def test_tree(self, client, assembly):
+        response = client.get(
+            reverse('device-tree', args=(assembly[0].pk,)), {'depth': 2}
+        )
+        assert response.status_code == 200
+        assert len(response.json()['components']) == 2
+
+    @pytest.mark.django_db
+    def test_where_used(self, client, assembly):
+        response = client.get(
+            reverse('device-where-used', args=(assembly[3].pk,))
+        )
+        assert response.status_code == 200
+        assert ids(response.json(), 'used_in') == [assembly[1].pk]
+
+    @pytest.mark.django_db
+    @pytest.mark.parametrize('depth', ['0', '51', 'a'])
+    def test_invalid_depth(self, client, assembly, depth):
+        response = client.get(
+            reverse('device-tree', args=(assembly[0].pk,)), {'depth': depth}
+        )
+        assert response.status_code == 400
+
+    @pytest.mark.django_db
+    def test_not_found(self, client):
+        response = client.get(reverse('device-tree', args=(1,)))
+        assert response.status_code == 404
@@ -0,0 +1,63 @@
+import pytest
+
+from django.core.management import call_command
+
+from deviceapp.importer import import_devices
+from deviceapp.models import Device, DecimalNumber, DeviceType, OrgCode
+
+
+class TestImportDevices:
+    @pytest.mark.django_db
+    def test_import(self, django_assert_max_num_queries):
+        lines = [
+            f'Блок АА{i:03} АБВГ.123456.{i:03}\n' for i in range(20)
+        ] + [
+            'Ячейка  ДЕЖЗ.654321.000\n',
+            '\n',
+        ]
+
+        with django_assert_max_num_queries(40):
+            report = import_devices(lines, batch_size=8)
+
+        assert report.total == 21
+        assert report.created == 21
+        assert report.errors == []
+        assert DeviceType.objects.count() == 2
+        assert OrgCode.objects.count() == 2
+        assert DecimalNumber.objects.filter(is_used=True).count() == 21
+        assert str(Device.objects.get(index='АА005')) == \
+               'Блок АА005 АБВГ.123456.005'
+        assert Device.objects.get(index=None).full_designation == \
+               'Ячейка ДЕЖЗ.654321.000'
+
+    @pytest.mark.django_db
+    def test_error_report(self, make_devices, make_decimal_num):
+        make_devices(1)
+        free_num = make_decimal_num('111111.111')
+        lines = [
+            'Блок АА000 АБВГ.222222.222',  # индекс уже есть
+            'Блок АА001 АБВГ.123456.000',  # номер уже присвоен
+            'Блок АА002 ДЕЖЗ.111111.111',  # номер другой организации
+            'неверная строка',
+            'Блок АА003 АБВГ.333333.333',
+            'Блок АА004 АБВГ.333333.333',  # номер повторяется в файле
+            'Блок АА005 АБВГ.111111.111',  # свободный номер из пула
+        ]
+
+        report = import_devices(lines)
+
+        assert report.created == 2
+        assert [error.line_no for error in report.errors] == [1, 2, 3, 4, 6]
+        free_num.refresh_from_db()
+        assert free_num.is_used
+        assert Device.objects.get(index='АА005').decimal_num == free_num
+
+    @pytest.mark.django_db
+    def test_command(self, tmp_path):
+        path = tmp_path / 'devices.csv'
+        path.write_text('Блок АА000 АБВГ.123456.789;примечание\n'
+                        'Блок АА001 АБВГ.123456.790\n', encoding='utf-8')
+
+        call_command('import_devices', str(path))
+
+        assert Device.objects.count() == 2
@@ -0,0 +1,105 @@
+import pytest
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from deviceapp.models import DecimalNumber
+
+# Планы запросов проверяются только на PostgreSQL. Последовательное
+# сканирование запрещается: если подходящего индекса нет, планировщик
+# все равно выберет Seq Scan, и проверка не пройдет
+
+pytestmark = [
+    pytest.mark.skipif(connection.vendor != 'postgresql',
+                       reason='EXPLAIN проверяется только на PostgreSQL'),
+    pytest.mark.django_db,
+]
+
+
+@pytest.fixture
+def registry(make_devices):
+    devices = make_devices(200)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+        cursor.execute('SET LOCAL enable_seqscan = off')
+    return devices
+
+
+def explain(sql):
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN {sql}')
+        return '\n'.join(row[0] for row in cursor.fetchall())
+
+
+def get_plans(client, url, params=None):
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url, params or {})
+    assert response.status_code == 200
+    return '\n'.join(
+        explain(query['sql']) for query in context.captured_queries
+        if query['sql'].startswith('SELECT')
+    )
+
+
+class TestAdminIndexes:
+
+    def test_device_changelist(self, admin_client, registry, device_type):
+        url = reverse('admin:deviceapp_device_changelist')
+        for params in ({}, {'type__id__exact': device_type.pk}):
+            plans = get_plans(admin_client, url, params)
+            assert 'device_type_decimal_num_idx' in plans
+            assert 'Seq Scan' not in plans
+
+    def test_device_search(self, admin_client, registry):
+        plans = get_plans(admin_client,
+                          reverse('admin:deviceapp_device_changelist'),
+                          {'q': 'аа01'})
+        assert 'deviceapp_device_index_upper' in plans
+        assert 'deviceapp_device_full_designation_upper' in plans
+        assert 'Seq Scan' not in plans
+
+    def test_decimal_number_changelist(self, admin_client, registry,
+                                       org_code):
+        url = reverse('admin:deviceapp_decimalnumber_changelist')
+        for params in ({}, {'org_code__id__exact': org_code.pk}):
+            # Индекс внешнего ключа org_code и уникальный индекс number
+            plans = get_plans(admin_client, url, params)
+            assert 'Seq Scan' not in plans
+
+        # Свободные номера могут читаться и по частичному индексу
+        plans = get_plans(admin_client, url, {'is_used__exact': 0})
+        assert 'Seq Scan' not in plans
+
+        plans = get_plans(admin_client, url, {'q': '1234'})
+        assert 'deviceapp_decimalnumber_number_upper' in plans
+
+    def test_free_numbers(self, registry, org_code):
+        queryset = DecimalNumber.objects \
+            .filter(org_code=org_code, is_used=False,
+                    number__startswith='123456') \
+            .order_by('number')
+        assert 'decimalnumber_free_idx' in queryset.explain()
+
+
+class TestApiIndexes:
+
+    @pytest.mark.parametrize('params', [
+        {},
+        {'simple': '1'},
+        {'search': 'АБВГ.123456'},
+    ])
+    def test_device_list(self, client, registry, params):
+        plans = get_plans(client, reverse('device-list'), params)
+        assert 'Index' in plans
+        assert 'Seq Scan' not in plans
+
+    def test_search(self, client, registry):
+        plans = get_plans(client, reverse('device-list'), {'search': 'аа01'})
+        assert 'deviceapp_device_full_designation_trgm' in plans
+        assert 'Seq Scan' not in plans
+
+    def test_filtered_list(self, client, registry, device_type):
+        plans = get_plans(client, reverse('device-list'),
+                          {'type': device_type.pk})
+        assert 'Seq Scan' not in plans
@@ -1,5 +1,7 @@
 import pytest
 
+from django.core.management import call_command
+
 from deviceapp.models import (
     Theme,
     OrgCode,
@@ -23,3 +25,244 @@ class TestTheme:
         assert theme.name == name
 
 
+class TestDeviceDecimalNumTracking:
+    @pytest.mark.django_db
+    def test_bulk_load_without_extra_queries(self, make_devices,
+                                             django_assert_num_queries):
+        make_devices(30)
+
+        with django_assert_num_queries(1):
+            devices = list(Device.objects.all())
+        assert len(devices) == 30
+
+        with django_assert_num_queries(1):
+            list(Device.objects.only('id', 'index'))
+
+    @pytest.mark.django_db
+    def test_create_marks_number_used(self, device_type, make_decimal_num):
+        num = make_decimal_num('123456.789')
+        Device.objects.create(type=device_type, decimal_num=num)
+        num.refresh_from_db()
+        assert num.is_used
+
+    @pytest.mark.django_db
+    def test_reassign_releases_previous_number(self, device_type,
+                                               make_decimal_num):
+        old_num = make_decimal_num('123456.001')
+        new_num = make_decimal_num('123456.002')
+        Device.objects.create(type=device_type, decimal_num=old_num)
+
+        device = Device.objects.get()
+        device.decimal_num = new_num
+        device.save()
+
+        old_num.refresh_from_db()
+        new_num.refresh_from_db()
+        assert not old_num.is_used
+        assert new_num.is_used
+
+    @pytest.mark.django_db
+    def test_clear_number_releases_it(self, device_type, make_decimal_num):
+        num = make_decimal_num('123456.001')
+        Device.objects.create(type=device_type, decimal_num=num)
+
+        device = Device.objects.get()
+        device.decimal_num = None
+        device.save()
+
+        num.refresh_from_db()
+        assert not num.is_used
+
+    @pytest.mark.django_db
+    def test_deferred_number_assignment(self, device_type, make_decimal_num):
+        old_num = make_decimal_num('123456.001')
+        new_num = make_decimal_num('123456.002')
+        Device.objects.create(type=device_type, decimal_num=old_num)
+
+        device = Device.objects.only('id', 'type').get()
+        device.decimal_num_id = new_num.pk
+        device.save()
+
+        old_num.refresh_from_db()
+        new_num.refresh_from_db()
+        assert not old_num.is_used
+        assert new_num.is_used
+
+    @pytest.mark.django_db
+    def test_deferred_number_untouched(self, device_type, make_decimal_num):
+        num = make_decimal_num('123456.001')
+        Device.objects.create(type=device_type, decimal_num=num)
+
+        device = Device.objects.only('id', 'type', 'index').get()
+        device.index = 'АА001'
+        device.save()
+
+        num.refresh_from_db()
+        assert num.is_used
+        assert Device.objects.get().decimal_num == num
+
+
+class TestDecimalNumberSwitchUse:
+    @pytest.mark.django_db
+    def test_switch_use(self, make_decimal_num):
+        used = make_decimal_num('123456.001')
+        unused = make_decimal_num('123456.002')
+        unused.is_used = True
+        unused.save()
+
+        updated = DecimalNumber.objects.switch_use(
+            used_ids=[used.pk, None],
+            unused_ids=[unused.pk],
+        )
+
+        assert updated == 2
+        used.refresh_from_db()
+        unused.refresh_from_db()
+        assert used.is_used
+        assert not unused.is_used
+
+    @pytest.mark.django_db
+    def test_switch_use_skips_unchanged_rows(self, make_decimal_num):
+        num = make_decimal_num('123456.001')
+        assert DecimalNumber.objects.switch_use(unused_ids=[num.pk]) == 0
+
+
+class TestDeviceReassignDecimalNumbers:
+    @pytest.mark.django_db
+    def test_swap_and_release(self, make_devices, make_decimal_num):
+        first, second, third = make_devices(3)
+        free_num = make_decimal_num('654321.000')
+        released_num_id = third.decimal_num_id
+
+        changed = Device.objects.reassign_decimal_numbers({
+            first.pk: second.decimal_num_id,
+            second.pk: first.decimal_num_id,
+            third.pk: free_num.pk,
+        })
+
+        assert changed == 3
+        assert Device.objects.get(pk=first.pk).decimal_num_id == \
+               second.decimal_num_id
+        assert Device.objects.get(pk=second.pk).decimal_num_id == \
+               first.decimal_num_id
+        assert Device.objects.get(pk=third.pk).decimal_num_id == free_num.pk
+        assert DecimalNumber.objects.get(pk=free_num.pk).is_used
+        assert not DecimalNumber.objects.get(pk=released_num_id).is_used
+
+    @pytest.mark.django_db
+    def test_constant_query_count(self, make_devices,
+                                  django_assert_max_num_queries):
+        devices = make_devices(40)
+        numbers = [device.decimal_num_id for device in devices]
+        assignments = {
+            device.pk: numbers[(i + 1) % len(numbers)]
+            for i, device in enumerate(devices)
+        }
+
+        with django_assert_max_num_queries(8):
+            Device.objects.reassign_decimal_numbers(assignments)
+
+        assert all(DecimalNumber.objects.values_list('is_used', flat=True))
+
+
+class TestDeviceFullDesignation:
+    @pytest.mark.django_db
+    def test_designation_on_save(self, device_type, make_decimal_num):
+        device = Device.objects.create(
+            type=device_type,
+            index='АА001',
+            decimal_num=make_decimal_num('123456.789'),
+        )
+        assert device.full_designation == 'Блок АА001 АБВГ.123456.789'
+        assert str(Device.objects.get()) == 'Блок АА001 АБВГ.123456.789'
+
+    @pytest.mark.django_db
+    def test_designation_without_index_and_number(self, device_type):
+        device = Device.objects.create(type=device_type)
+        assert device.full_designation == 'Блок'
+
+    @pytest.mark.django_db
+    def test_related_changes_propagate(self, make_devices, device_type,
+                                       org_code):
+        make_devices(2)
+
+        device_type.name = 'Ячейка'
+        device_type.save()
+        org_code.code = 'ДЕЖЗ'
+        org_code.save()
+
+        assert list(
+            Device.objects.order_by('pk')
+            .values_list('full_designation', flat=True)
+        ) == [
+            'Ячейка АА000 ДЕЖЗ.123456.000',
+            'Ячейка АА001 ДЕЖЗ.123456.001',
+        ]
+
+    @pytest.mark.django_db
+    def test_deleted_number_propagates(self, make_devices):
+        device, = make_devices(1)
+        device.decimal_num.delete()
+        assert Device.objects.get().full_designation == 'Блок АА000'
+
+    @pytest.mark.django_db
+    def test_queryset_deleted_numbers_propagate(self, make_devices):
+        make_devices(3)
+        DecimalNumber.objects.exclude(number='123456.002').delete()
+        assert list(
+            Device.objects.order_by('pk')
+            .values_list('full_designation', flat=True)
+        ) == [
+            'Блок АА000',
+            'Блок АА001',
+            'Блок АА002 АБВГ.123456.002',
+        ]
+
+    @pytest.mark.django_db
+    def test_backfill_command(self, make_devices):
+        make_devices(3)
+        Device.objects.update(full_designation='')
+
+        call_command('backfill_full_designation', batch_size=2)
+
+        assert not Device.objects.filter(full_designation='').exists()
+        assert str(Device.objects.get(index='АА002')) == \
+               'Блок АА002 АБВГ.123456.002'
+
+
+class TestDeviceDelete:
+    @pytest.mark.django_db
+    def test_delete_releases_number(self, make_devices):
+        device, = make_devices(1)
+        num_id = device.decimal_num_id
+
+        device.delete()
+
+        assert not DecimalNumber.objects.get(pk=num_id).is_used
+
+    @pytest.mark.django_db
+    def test_delete_without_number(self, device_type):
+        device = Device.objects.create(type=device_type)
+        device.delete()
+        assert not Device.objects.exists()
+
+    @pytest.mark.django_db
+    def test_bulk_delete(self, make_devices, device_type,
+                         django_assert_max_num_queries):
+        devices = make_devices(20)
+        Device.objects.create(type=device_type)
+        theme = Theme.objects.create(name='Тема')
+        Device.objects.all().add_themes([theme.pk])
+        for device in devices[1:]:
+            device.part_of.add(devices[0])
+        kept, = make_devices(1, start=20)
+
+        with django_assert_max_num_queries(19):
+            Device.objects.exclude(pk=kept.pk).delete()
+
+        assert list(Device.objects.all()) == [kept]
+        assert list(
+            DecimalNumber.objects.filter(is_used=True)
+        ) == [kept.decimal_num]
+        assert not Device.theme.through.objects.exists()
+        assert not Device.part_of.through.objects.exists()
@@ -0,0 +1,146 @@
+import json
+import logging
+from io import StringIO
+
+import pytest
+
+from asgiref.sync import (
+    async_to_sync,
+    iscoroutinefunction,
+    sync_to_async,
+)
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.urls import reverse
+
+from deviceapp.middleware import (
+    PerformanceMiddleware,
+    QueryRecorder,
+    sql_shape,
+)
+from deviceapp.models import Device
+
+
+@pytest.fixture
+def perf_middleware(settings, tmp_path, monkeypatch):
+    settings.MIDDLEWARE = [
+        'deviceapp.middleware.PerformanceMiddleware',
+        *settings.MIDDLEWARE,
+    ]
+    # Журнал пишется во временный каталог, а не в var/log/perf.log
+    settings.PERF_LOG_FILE = tmp_path / 'perf.log'
+    handler = logging.FileHandler(settings.PERF_LOG_FILE, encoding='utf-8')
+    monkeypatch.setattr(logging.getLogger('deviceapp.perf'), 'handlers',
+                        [handler])
+    yield
+    handler.close()
+
+
+def perf_records(caplog):
+    return [json.loads(record.getMessage()) for record in caplog.records
+            if record.name == 'deviceapp.perf']
+
+
+def test_sql_shape():
+    assert sql_shape('SELECT 1 WHERE id IN (%s, %s, %s) AND x = %s') == \
+           'SELECT 1 WHERE id IN (...) AND x = %s'
+    assert sql_shape('WHERE id IN (%s)') == 'WHERE id IN (...)'
+
+
+@pytest.mark.django_db
+def test_query_recorder(make_devices):
+    devices = make_devices(3)
+    recorder = QueryRecorder()
+    with connection.execute_wrapper(recorder):
+        for device in devices:
+            Device.objects.get(pk=device.pk)
+        list(Device.objects.filter(pk__in=[device.pk for device in devices]))
+    assert recorder.count == 4
+    assert recorder.duration > 0
+    repeated = recorder.repeated(3)
+    assert len(repeated) == 1
+    assert repeated[0]['count'] == 3
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures('perf_middleware')
+class TestPerformanceMiddleware:
+
+    def test_api_metrics(self, client, make_devices, caplog):
+        make_devices(3)
+        with caplog.at_level('INFO', logger='deviceapp.perf'):
+            response = client.get(reverse('device-list'), {'format': 'json'})
+
+        assert response['Server-Timing'].startswith('db;desc="')
+        assert 'render;dur=' in response['Server-Timing']
+        [record] = perf_records(caplog)
+        assert record['view'] == 'device-list'
+        assert record['status'] == 200
+        assert record['queries'] >= 1
+        assert record['size'] == len(response.content)
+        assert record['n_plus_one'] == []
+
+    def test_n_plus_one(self, rf, make_devices, caplog):
+        devices = make_devices(6)
+
+        def view(request):
+            # Обозначение каждого изделия читается отдельным запросом
+            names = [str(Device.objects.get(pk=device.pk))
+                     for device in devices]
+            return HttpResponse(', '.join(names))
+
+        with caplog.at_level('INFO', logger='deviceapp.perf'):
+            response = PerformanceMiddleware(view)(rf.get('/devices/'))
+
+        assert response['Server-Timing'].startswith('db;desc="6 SQL"')
+        [record] = perf_records(caplog)
+        assert caplog.records[-1].levelname == 'WARNING'
+        assert record['view'] is None
+        assert record['path'] == '/devices/'
+        assert [item['count'] for item in record['n_plus_one']] == [6]
+
+    def test_async_chain(self, rf, make_devices, caplog):
+        make_devices(3)
+
+        async def view(request):
+            count = await sync_to_async(Device.objects.count)()
+            return HttpResponse(str(count))
+
+        middleware = PerformanceMiddleware(view)
+        assert iscoroutinefunction(middleware)
+        with caplog.at_level('INFO', logger='deviceapp.perf'):
+            response = async_to_sync(middleware)(rf.get('/devices/'))
+
+        assert response.content == b'3'
+        assert response['Server-Timing'].startswith('db;desc="1 SQL"')
+        [record] = perf_records(caplog)
+        assert record['queries'] == 1
+
+    def test_report(self, client, make_devices, settings):
+        make_devices(2)
+        for _ in range(3):
+            client.get(reverse('device-list'), {'format': 'json'})
+        client.get(reverse('admin:index'))
+        with open(settings.PERF_LOG_FILE, 'a', encoding='utf-8') as file:
+            file.write('not json\n')
+
+        out = StringIO()
+        call_command('perf_report', sort='queries', stdout=out)
+        output = out.getvalue()
+        assert 'GET device-list' in output
+        assert 'GET admin:index' in output
+
+    def test_report_period(self, client, settings):
+        client.get(reverse('device-list'), {'format': 'json'})
+        with open(settings.PERF_LOG_FILE, encoding='utf-8') as file:
+            [record] = [json.loads(line) for line in file]
+        assert record['pid'] > 0
+
+        out = StringIO()
+        call_command('perf_report', '--since', record['time'], stdout=out)
+        assert 'GET device-list' in out.getvalue()
+
+        out = StringIO()
+        call_command('perf_report', '--until', record['time'], stdout=out)
+        assert out.getvalue() == 'В журнале нет записей\n'
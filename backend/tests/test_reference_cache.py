@@ -0,0 +1,107 @@
+import threading
+
+import pytest
+
+from django.db import transaction
+
+from deviceapp.forms import DeviceAdminAssignThemeActionForm, OrgCodeForm
+from deviceapp.models import OrgCode, Theme
+from deviceapp.reference_cache import ReferenceCache, org_codes, themes
+
+
+@pytest.fixture
+def committed_themes(django_capture_on_commit_callbacks):
+    # Копия справочника сохраняется только после фиксации изменений
+    with django_capture_on_commit_callbacks(execute=True):
+        return [Theme.objects.create(name=name)
+                for name in ('Тема Б', 'Тема А')]
+
+
+class TestReferenceCache:
+    @pytest.mark.django_db
+    def test_lookups_without_queries(self, committed_themes,
+                                     django_assert_num_queries):
+        with django_assert_num_queries(1):
+            themes.all()
+        with django_assert_num_queries(0):
+            assert [theme.name for theme in themes.all()] == ['Тема А',
+                                                              'Тема Б']
+            assert themes.get('Тема Б').pk == committed_themes[0].pk
+            assert themes.get_by_pk(committed_themes[1].pk).name == 'Тема А'
+            assert themes.get('Нет такой') is None
+            assert themes.pk_map() == {theme.name: theme.pk
+                                       for theme in committed_themes}
+
+    @pytest.mark.django_db
+    def test_instances_not_shared(self, committed_themes):
+        theme = themes.get('Тема А')
+        theme.name = 'Изменено'
+        assert themes.get('Тема А') is not theme
+        assert themes.get('Тема А').name == 'Тема А'
+
+    @pytest.mark.django_db
+    def test_invalidated_in_other_process(self, committed_themes,
+                                          django_capture_on_commit_callbacks,
+                                          django_assert_num_queries):
+        # Отдельный экземпляр с тем же счетчиком версии - копия
+        # справочника в другом воркере
+        other_process = ReferenceCache(Theme, 'name')
+        other_process.all()
+
+        with django_capture_on_commit_callbacks(execute=True):
+            theme = committed_themes[0]
+            theme.name = 'Тема В'
+            theme.save()
+
+        with django_assert_num_queries(1):
+            assert other_process.get('Тема В').pk == theme.pk
+            assert other_process.get('Тема Б') is None
+
+    @pytest.mark.django_db
+    def test_rolled_back_rows_not_cached(self, committed_themes):
+        themes.all()
+        with pytest.raises(RuntimeError):
+            with transaction.atomic():
+                Theme.objects.create(name='Тема В')
+                assert themes.get('Тема В') is not None
+                raise RuntimeError
+
+        assert themes.get('Тема В') is None
+
+    @pytest.mark.django_db
+    def test_pending_transaction_is_thread_local(self, committed_themes):
+        # Незафиксированное изменение в одном потоке не мешает другим
+        # потокам сохранять копию справочника
+        other_thread = []
+        with transaction.atomic():
+            Theme.objects.create(name='Тема В')
+            thread = threading.Thread(target=lambda: other_thread.append(
+                getattr(themes._local, 'pending', False)
+            ))
+            thread.start()
+            thread.join()
+            assert themes._local.pending
+        assert other_thread == [False]
+
+
+class TestReferenceCacheForms:
+    @pytest.mark.django_db
+    def test_assign_theme_form(self, committed_themes,
+                               django_assert_num_queries):
+        themes.all()
+        with django_assert_num_queries(0):
+            form = DeviceAdminAssignThemeActionForm()
+        assert [name for _, name in form.fields['themes'].choices] == [
+            'Тема А', 'Тема Б'
+        ]
+
+    @pytest.mark.django_db
+    def test_org_code_form_reuses_existing(self,
+                                           django_capture_on_commit_callbacks):
+        with django_capture_on_commit_callbacks(execute=True):
+            org_code = OrgCode.objects.create(code='АБВГ')
+
+        form = OrgCodeForm({'code': 'АБВГ'})
+        assert form.is_valid()
+        assert form.instance.pk == org_code.pk
+        assert org_codes.get('ДЕЖЗ') is None
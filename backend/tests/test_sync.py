@@ -0,0 +1,142 @@
+from datetime import timedelta
+
+import pytest
+
+from django.urls import reverse
+from django.utils import timezone
+
+from deviceapp.models import Device, DeviceTombstone, Theme
+
+
+@pytest.fixture
+def past():
+    return timezone.now() - timedelta(hours=1)
+
+
+@pytest.fixture
+def synced_devices(make_devices, past):
+    devices = make_devices(3)
+    Device.objects.update(updated_at=past)
+    DeviceTombstone.objects.all().delete()
+    return devices
+
+
+def get_changes(client, since):
+    response = client.get(reverse('device-changes'),
+                          {'since': since.isoformat()})
+    assert response.status_code == 200
+    return response.json()
+
+
+def changed_indexes(data):
+    return [row['index'] for row in data['changed']]
+
+
+class TestDeviceChanges:
+    @pytest.mark.django_db
+    def test_only_changed_rows(self, client, synced_devices, past):
+        device = synced_devices[1]
+        device.index = 'ББ001'
+        device.save(update_fields=['index'])
+
+        data = get_changes(client, past + timedelta(minutes=1))
+        assert changed_indexes(data) == ['ББ001']
+        assert data['deleted'] == []
+
+    @pytest.mark.django_db
+    def test_deleted_as_tombstones(self, client, synced_devices, past):
+        first, second, third = synced_devices
+        deleted_ids = [first.pk, second.pk]
+        first.delete()
+        Device.objects.filter(pk=second.pk).delete()
+
+        data = get_changes(client, past + timedelta(minutes=1))
+        assert data['changed'] == []
+        assert data['deleted'] == deleted_ids
+
+    @pytest.mark.django_db
+    def test_reference_change_touches_devices(self, client, synced_devices,
+                                              past, device_type):
+        device_type.name = 'Ячейка'
+        device_type.save()
+
+        data = get_changes(client, past + timedelta(minutes=1))
+        assert changed_indexes(data) == ['АА000', 'АА001', 'АА002']
+        assert data['changed'][0]['full_designation'] \
+            .startswith('Ячейка')
+
+    @pytest.mark.django_db
+    def test_bulk_paths_touch_devices(self, client, synced_devices, past):
+        first, second, third = synced_devices
+        theme = Theme.objects.create(name='Тема')
+        Device.objects.filter(pk=first.pk).add_themes([theme.pk])
+        second.part_of.add(third)
+
+        data = get_changes(client, past + timedelta(minutes=1))
+        assert changed_indexes(data) == ['АА000', 'АА001']
+
+    @pytest.mark.django_db
+    def test_parent_delete_touches_children(self, client, make_devices,
+                                            past):
+        parent, child = make_devices(2)
+        child.part_of.add(parent)
+        Device.objects.update(updated_at=past)
+
+        parent.delete()
+        data = get_changes(client, past + timedelta(minutes=1))
+        assert changed_indexes(data) == ['АА001']
+        assert data['changed'][0]['part_of'] == []
+
+    @pytest.mark.django_db
+    @pytest.mark.parametrize('params', [{}, {'since': 'вчера'}])
+    def test_invalid_since(self, client, params):
+        response = client.get(reverse('device-changes'), params)
+        assert response.status_code == 400
+
+    @pytest.mark.django_db
+    def test_since_beyond_retention(self, client, settings):
+        settings.DEVICE_TOMBSTONE_RETENTION_DAYS = 1
+        since = timezone.now() - timedelta(days=2)
+        response = client.get(reverse('device-changes'),
+                              {'since': since.isoformat()})
+        assert response.status_code == 400
+
+    @pytest.mark.django_db
+    def test_paged_changes(self, client, make_devices, past):
+        removed = make_devices(4, start=10)
+        first, second, third = make_devices(3)
+        Device.objects.update(updated_at=past)
+        DeviceTombstone.objects.all().delete()
+        for device in (third, first, second):
+            device.save()
+        removed_ids = [device.pk for device in removed]
+        for device in removed:
+            device.delete()
+
+        response = client.get(reverse('device-changes'),
+                              {'since': past.isoformat(), 'limit': 2})
+        assert response.status_code == 200
+        pages = [response.json()]
+        while pages[-1]['next']:
+            assert 'until' not in pages[-1]
+            pages.append(client.get(pages[-1]['next']).json())
+
+        assert [changed_indexes(page) for page in pages] == [
+            ['АА002', 'АА000'], ['АА001'], [],
+        ]
+        assert [page['deleted'] for page in pages] == [
+            [], removed_ids[:2], removed_ids[2:],
+        ]
+        assert pages[-1]['until'] is not None
+        assert {page['since'] for page in pages} == {pages[0]['since']}
+
+    @pytest.mark.django_db
+    @pytest.mark.parametrize('params', [
+        {'limit': 0},
+        {'limit': 'все'},
+        {'cursor': 'не токен'},
+    ])
+    def test_invalid_page_params(self, client, past, params):
+        response = client.get(reverse('device-changes'),
+                              {'since': past.isoformat(), **params})
+        assert response.status_code == 400
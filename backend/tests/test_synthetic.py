@@ -0,0 +1,59 @@
+from io import StringIO
+
+import pytest
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from deviceapp.models import (
+    DecimalNumber,
+    Device,
+    DeviceClosure,
+    DeviceType,
+    OrgCode,
+    Theme,
+)
+from deviceapp.synthetic import generate_registry
+
+
+@pytest.mark.django_db
+class TestGenerateRegistry:
+
+    def test_registry(self):
+        result = generate_registry(devices=200, org_codes=3, device_types=10,
+                                   themes=5, depth=3, free_numbers=0.5)
+
+        assert Device.objects.count() == result.devices == 200
+        assert OrgCode.objects.count() == 3
+        assert DeviceType.objects.count() == 10
+        assert Theme.objects.count() == 5
+        # 10 изделий без номера и 100 свободных номеров
+        assert Device.objects.filter(decimal_num=None).count() == 10
+        assert DecimalNumber.objects.filter(is_used=False).count() == 100
+        assert DecimalNumber.objects.count() == result.decimal_numbers == 290
+        assert Device.objects.filter(index=None).count() == 20
+
+        for device in Device.objects.all()[:50]:
+            assert device.full_designation == device.get_full_designation()
+
+        top_level = Device.objects.filter(part_of=None).count()
+        assert 0 < top_level < 200
+        assert Device.part_of.through.objects.count() == result.part_of
+        assert DeviceClosure.objects.filter(depth=2).exists()
+        assert Device.theme.through.objects.count() == result.theme_links
+
+    def test_same_seed(self):
+        first = generate_registry(devices=50, seed=1)
+        designations = list(Device.objects.order_by('pk')
+                            .values_list('full_designation', flat=True))
+        call_command('generate_registry', devices=50, seed=1, clear=True,
+                     stdout=StringIO())
+        assert list(Device.objects.order_by('pk')
+                    .values_list('full_designation', flat=True)) == \
+               designations
+        assert Device.part_of.through.objects.count() == first.part_of
+
+    def test_command_requires_empty_registry(self, make_devices):
+        make_devices(1)
+        with pytest.raises(CommandError):
+            call_command('generate_registry', devices=10, stdout=StringIO())
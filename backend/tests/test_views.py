@@ -0,0 +1,226 @@
+import json
+
+import pytest
+
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from deviceapp import api_cache
+from deviceapp.models import Device, Theme
+
+
+class TestDeviceListPagination:
+    @pytest.mark.django_db
+    def test_cursor_pages(self, client, make_devices):
+        make_devices(5)
+        url = reverse('device-list')
+
+        response = client.get(url, {'page_size': 2})
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data['results']) == 2
+        assert data['previous'] is None
+
+        ids = [row['id'] for row in data['results']]
+        while data['next']:
+            data = client.get(data['next']).json()
+            ids.extend(row['id'] for row in data['results'])
+
+        assert ids == sorted(ids)
+        assert len(ids) == 5
+
+
+class TestDeviceListStream:
+    @pytest.mark.django_db
+    def test_ndjson_stream(self, client, make_devices):
+        make_devices(5)
+        url = reverse('device-list')
+
+        response = client.get(url, {'stream': 'ndjson', 'simple': '1'})
+        assert response.status_code == 200
+        assert response.streaming
+        assert response['Content-Type'].startswith('application/x-ndjson')
+
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        rows = [json.loads(line) for line in lines]
+        assert len(rows) == 5
+        assert rows[0] == {
+            'type': 'Блок',
+            'index': 'АА000',
+            'decimal_num': 'АБВГ.123456.000',
+        }
+
+    @pytest.mark.django_db
+    def test_ndjson_stream_search(self, client, make_devices):
+        make_devices(5)
+        url = reverse('device-list')
+
+        response = client.get(url, {'stream': 'ndjson', 'search': 'АА003'})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        assert [json.loads(line)['index'] for line in lines] == ['АА003']
+
+
+class TestDeviceListQueryCount:
+    def count_queries(self, client, params):
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(reverse('device-list'), params)
+        assert response.status_code == 200
+        return len(context.captured_queries)
+
+    @pytest.fixture
+    def devices(self, make_devices):
+        devices = make_devices(12)
+        theme = Theme.objects.create(name='Тема')
+        for device in devices:
+            device.theme.add(theme)
+            device.part_of.add(devices[0])
+        return devices
+
+    @pytest.mark.django_db
+    @pytest.mark.parametrize('simple', ['0', '1'])
+    def test_constant_query_count(self, client, devices, simple):
+        small = self.count_queries(client, {'page_size': 2, 'simple': simple})
+        large = self.count_queries(client, {'page_size': 12, 'simple': simple})
+        assert small == large
+
+    @pytest.mark.django_db
+    def test_full_representation(self, client, devices):
+        response = client.get(reverse('device-list'), {'page_size': 1})
+        row = response.json()['results'][0]
+        assert row['theme'] == [{'id': row['theme'][0]['id'],
+                                 'name': 'Тема'}]
+        assert row['decimal_num']['org_code']['code'] == 'АБВГ'
+
+
+class TestDeviceSearch:
+    @pytest.mark.django_db
+    @pytest.mark.parametrize(
+        'search, expected', [
+            ('АА003', ['АА003']),
+            ('Блок АА00', ['АА000', 'АА001', 'АА002', 'АА003']),
+            ('АБВГ.123456.001', ['АА001']),
+            ('АБВГ.12345', ['АА000', 'АА001', 'АА002', 'АА003']),
+            ('ДЕЖЗ.123456', []),
+        ]
+    )
+    def test_search(self, client, make_devices, search, expected):
+        make_devices(4)
+        response = client.get(reverse('device-list'), {'search': search})
+        assert [row['index'] for row in response.json()['results']] == \
+               expected
+
+
+class TestDeviceResponseCache:
+    @pytest.mark.django_db
+    def test_list_cached_with_etag(self, client, make_devices,
+                                   django_assert_num_queries):
+        make_devices(3)
+        url = reverse('device-list')
+
+        response = client.get(url, {'simple': '1'})
+        etag = response['ETag']
+        with django_assert_num_queries(0):
+            cached = client.get(url, {'simple': '1'})
+            not_modified = client.get(url, {'simple': '1'},
+                                      HTTP_IF_NONE_MATCH=etag)
+        assert cached.json() == response.json()
+        assert cached['ETag'] == etag
+        assert not_modified.status_code == 304
+        assert not_modified['ETag'] == etag
+
+    @pytest.mark.django_db
+    def test_cache_disabled(self, client, make_devices, settings):
+        settings.API_CACHE_ENABLED = False
+        device = make_devices(1)[0]
+        url = reverse('device-detail', args=[device.pk])
+
+        etag = client.get(url)['ETag']
+        # update() не сбрасывает кэш: ответ должен быть собран заново
+        Device.objects.filter(pk=device.pk).update(index='ББ001')
+
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response.json()['index'] == 'ББ001'
+        not_modified = client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        assert not_modified.status_code == 304
+
+    def test_lost_generation_not_reused(self):
+        key = api_cache.object_key(1, 'full')
+        cache.delete(api_cache.OBJECT_GENERATION_KEY)
+        assert api_cache.object_key(1, 'full') != key
+
+    @pytest.mark.django_db
+    def test_modes_cached_separately(self, client, make_devices):
+        device = make_devices(1)[0]
+        url = reverse('device-detail', args=[device.pk])
+
+        full = client.get(url).json()
+        simple = client.get(url, {'simple': '1'}).json()
+        assert full['decimal_num']['number'] == '123456.000'
+        assert simple['decimal_num'] == 'АБВГ.123456.000'
+
+    @pytest.mark.django_db
+    def test_device_save_invalidates(self, client, make_devices,
+                                     django_assert_num_queries):
+        device, other = make_devices(2)
+        url = reverse('device-detail', args=[device.pk])
+        other_url = reverse('device-detail', args=[other.pk])
+        etag = client.get(url)['ETag']
+        client.get(other_url)
+
+        device.index = 'ББ001'
+        device.save()
+
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response.json()['index'] == 'ББ001'
+        with django_assert_num_queries(0):
+            client.get(other_url)
+
+    @pytest.mark.django_db
+    def test_reference_save_invalidates(self, client, make_devices,
+                                        device_type):
+        device = make_devices(1)[0]
+        url = reverse('device-detail', args=[device.pk])
+        list_url = reverse('device-list')
+        client.get(url)
+        client.get(list_url)
+
+        device_type.name = 'Ячейка'
+        device_type.save()
+
+        assert client.get(url).json()['type']['name'] == 'Ячейка'
+        assert client.get(list_url).json()['results'][0][
+            'full_designation'].startswith('Ячейка')
+
+    @pytest.mark.django_db
+    def test_bulk_theme_assignment_invalidates(self, client, make_devices):
+        device = make_devices(1)[0]
+        theme = Theme.objects.create(name='Тема')
+        url = reverse('device-detail', args=[device.pk])
+        client.get(url)
+
+        Device.objects.filter(pk=device.pk).add_themes([theme.pk])
+        assert client.get(url).json()['theme'] == [
+            {'id': theme.pk, 'name': 'Тема'}
+        ]
+
+        theme.device_set.clear()
+        assert client.get(url).json()['theme'] == []
+
+    @pytest.mark.django_db
+    def test_parent_delete_invalidates_children(self, client, make_devices):
+        parent, child = make_devices(2)
+        child.part_of.add(parent)
+        url = reverse('device-detail', args=[child.pk])
+        assert client.get(url).json()['part_of'] == [parent.pk]
+
+        parent.delete()
+        assert client.get(url).json()['part_of'] == []
+
+    @pytest.mark.django_db
+    def test_not_found_not_cached(self, client):
+        url = reverse('device-detail', args=[100])
+        assert client.get(url).status_code == 404